@@ -4,13 +4,43 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+# Crop areas used to be stored as pixels of the 300 DPI setup preview
+LEGACY_CROP_DPI = 300
+POINTS_PER_INCH = 72.0
+
 @dataclass
 class CropArea:
-    """Defines a rectangular area for cropping"""
-    x: int  # Top-left x coordinate
-    y: int  # Top-left y coordinate  
-    width: int  # Width of the crop area
-    height: int  # Height of the crop area
+    """Defines a rectangular area for cropping, in PDF points from the page's top-left corner"""
+    x: float  # Top-left x coordinate
+    y: float  # Top-left y coordinate  
+    width: float  # Width of the crop area
+    height: float  # Height of the crop area
+    units: str = "pt"
+
+    @classmethod
+    def from_pixels(cls, x: float, y: float, width: float, height: float, dpi: int) -> "CropArea":
+        """Build a crop area from pixel coordinates of a page rendered at `dpi`"""
+        scale = POINTS_PER_INCH / dpi
+        return cls(x=x * scale, y=y * scale, width=width * scale, height=height * scale)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CropArea":
+        """Load a crop area, migrating legacy pixel coordinates (no `units` key) to points"""
+        if data.get("units", "px") == "pt":
+            return cls(x=float(data["x"]), y=float(data["y"]),
+                       width=float(data["width"]), height=float(data["height"]))
+        return cls.from_pixels(float(data["x"]), float(data["y"]),
+                               float(data["width"]), float(data["height"]), LEGACY_CROP_DPI)
+
+    def to_pixels(self, dpi: int) -> Tuple[int, int, int, int]:
+        """Return the (left, top, right, bottom) pixel box on a page rendered at `dpi`"""
+        scale = dpi / POINTS_PER_INCH
+        return (
+            round(self.x * scale),
+            round(self.y * scale),
+            round((self.x + self.width) * scale),
+            round((self.y + self.height) * scale),
+        )
 
 @dataclass
 class CompanyTemplate:
@@ -20,9 +50,32 @@ class CompanyTemplate:
     name_crop_area: CropArea
     employee_emails: Dict[str, str]  # name -> email mapping
     ocr_confidence_threshold: float = 80.0
+    render_dpi: Optional[int] = None  # Fixed render resolution; picked per crop area when unset
+    min_crop_height_px: int = 40  # Smallest crop height (in pixels) that is still legible
+    vision_batch_size: Optional[int] = None  # Crops per vision request; service default when unset
+    global_assignment: bool = False  # Re-decide matches for the whole document so pages don't share an employee
+    max_pages_per_employee: int = 1  # Pages one employee may take in global assignment
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CompanyTemplate":
+        """Build a template from a stored or frontend-provided config dict"""
+        return cls(
+            company_id=data.get('company_id', 'main'),
+            company_name=data['company_name'],
+            name_crop_area=CropArea.from_dict(data['name_crop_area']),
+            employee_emails=data.get('employee_emails', {}),
+            ocr_confidence_threshold=data.get('ocr_confidence_threshold', 80.0),
+            render_dpi=data.get('render_dpi'),
+            min_crop_height_px=data.get('min_crop_height_px', 40),
+            vision_batch_size=data.get('vision_batch_size'),
+            global_assignment=data.get('global_assignment', False),
+            max_pages_per_employee=data.get('max_pages_per_employee', 1),
+            created_at=data.get('created_at'),
+            updated_at=data.get('updated_at')
+        )
+
 class ConfigManager:
     """Manages company configuration - no persistent storage for security"""
     
@@ -70,16 +123,12 @@ class ConfigManager:
             with open(self.config_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             
-            crop_area = CropArea(**data['name_crop_area'])
-            template = CompanyTemplate(
-                company_id=data.get('company_id', 'main'),
-                company_name=data['company_name'],
-                name_crop_area=crop_area,
-                employee_emails=data['employee_emails'],
-                ocr_confidence_threshold=data.get('ocr_confidence_threshold', 80.0),
-                created_at=data.get('created_at'),
-                updated_at=data.get('updated_at')
-            )
+            template = CompanyTemplate.from_dict(data)
+            
+            # Rewrite configs saved with legacy pixel crop coordinates
+            if data['name_crop_area'].get('units') != template.name_crop_area.units:
+                print(f"🔄 [DEV] Migrating crop area of {template.company_name} to page points")
+                self.save_template(template)
             
             return template
             
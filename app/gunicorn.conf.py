@@ -12,7 +12,8 @@ worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 100
 
-# Timeout settings
+# Timeout settings - large previews should go through the background job
+# endpoint (/api/process/{company_id}/preview/jobs) rather than a request
 timeout = 120
 keepalive = 2
 graceful_timeout = 30
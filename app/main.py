@@ -8,7 +8,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from dotenv import load_dotenv
 
-from routes import router
+from routes import router, ai_vision, job_workers, MAX_REQUEST_SIZE
+from services.pdf_service import shutdown_render_pool
+from services.upload_limit import BodySizeLimit
 
 # Load environment variables
 load_dotenv()
@@ -90,6 +92,9 @@ app.add_middleware(
     max_age=86400,  # 24 hours
 )
 
+# Cut off oversized uploads while they stream in, before they are spooled
+app.add_middleware(BodySizeLimit, max_body_size=MAX_REQUEST_SIZE)
+
 # Security Headers Middleware
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
@@ -194,6 +199,8 @@ else:
 # Startup event
 @app.on_event("startup")
 async def startup_event():
+    await ai_vision.start()
+    await job_workers.start()
     logger.info("🚀 Monthly Paycheck SaaS v3.0 - AI Vision Started!")
     logger.info("📋 Features: OpenRouter + Gemini Vision for Hebrew name extraction")
     logger.info("🔧 Clean architecture with separated routes and services")
@@ -204,4 +211,12 @@ async def startup_event():
         if hasattr(route, 'path') and hasattr(route, 'methods'):
             logger.info(f"  {list(route.methods)} {route.path}")
         elif hasattr(route, 'path'):
-            logger.info(f"  {route.path}") 
\ No newline at end of file
+            logger.info(f"  {route.path}") 
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_workers.stop()
+    await ai_vision.close()
+    shutdown_render_pool()
+    logger.info("👋 Monthly Paycheck SaaS stopped")
@@ -1,24 +1,29 @@
 import os
+import asyncio
 import tempfile
 import uuid
 import json
+import shutil
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from fastapi import APIRouter, File, UploadFile, Request, HTTPException, Form, Depends, Header
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field, validator
-from pdf2image import convert_from_path
 
 from config import CompanyTemplate, CropArea, config_manager
 from dataclasses import asdict
 from services.ai_vision import AIVisionService
-from services.pdf_service import PDFService
+from services.pdf_service import PDFInfo, PDFService, PDFSource
+from pypdf.errors import PdfReadError
 from services.email_service import EmailService
 from services.auth_service import AuthService
+from services.job_queue import DONE, JobQueue, JobWorkerPool, job_status
+from services.template_registry import CompiledTemplate, TemplateError, TemplateRegistry
+from services.roster_import import RosterImportError, import_roster
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -42,6 +47,21 @@ class ProcessPayslipRequest(BaseModel):
 # File size limits (configurable via env)
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE_MB", "10")) * 1024 * 1024  # Default 10MB
 
+# Whole request bodies are capped while they stream in (see services/upload_limit.py);
+# the allowance on top of the file covers the other form fields, e.g. a company config
+MAX_REQUEST_SIZE = MAX_FILE_SIZE + int(os.getenv("MAX_FORM_FIELDS_MB", "8")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Processing limits checked before any page is rendered
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "500"))
+MAX_RENDER_MEGAPIXELS = float(os.getenv("MAX_RENDER_MEGAPIXELS", "500"))
+
+# Seconds between keep-alive comments on a quiet preview stream
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+# Resolution of the setup preview the crop area is drawn on
+PREVIEW_DPI = int(os.getenv("PREVIEW_DPI", "150"))
+
 # Note: Templates removed - now serving React app
 
 # Create router
@@ -55,7 +75,11 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "version": "3.0.0",
-        "environment": os.getenv("ENVIRONMENT", "development")
+        "environment": os.getenv("ENVIRONMENT", "development"),
+        "name_cache": ai_vision.name_cache.stats(),
+        "vision_limiter": ai_vision.limiter.stats(),
+        "vision_tiers": ai_vision.tier_report(),
+        "jobs": job_queue.stats()
     }
 
 # Test route for debugging (with /api prefix like working routes)
@@ -107,8 +131,14 @@ async def serve_react_via_router():
 
 # Request size validation middleware
 async def validate_file_size(file: UploadFile = File(...)):
-    """Validate uploaded file size and type"""
-    if file.size and file.size > MAX_FILE_SIZE:
+    """Validate uploaded file size and type.
+
+    The request body as a whole is already capped while it is read
+    (BodySizeLimit); this checks the file part itself. The upload is left
+    in its spooled buffer (memory or temp file) and rewound, so routes can
+    hand `file.file` straight to the PDF service.
+    """
+    if file.size > MAX_FILE_SIZE:
         raise HTTPException(
             status_code=413, 
             detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
@@ -120,8 +150,44 @@ async def validate_file_size(file: UploadFile = File(...)):
             detail="Only PDF files are allowed"
         )
     
+    await file.seek(0)
     return file
 
+def inspect_upload(pdf_path: PDFSource, template: CompanyTemplate = None) -> PDFInfo:
+    """Inspect an uploaded PDF and reject it before any rendering or AI work starts.
+
+    With a template, the document is also checked against the page and
+    render-cost limits for processing its name area.
+    """
+    try:
+        pdf_info = pdf_service.inspect(pdf_path)
+    except (OSError, PdfReadError) as e:
+        logger.warning(f"⚠️ Unreadable PDF upload: {e}")
+        raise HTTPException(status_code=400, detail="Could not read PDF file")
+    
+    if pdf_info.needs_password:
+        raise HTTPException(status_code=400, detail="PDF is password protected")
+    if pdf_info.page_count == 0:
+        raise HTTPException(status_code=400, detail="PDF has no pages")
+    
+    if template:
+        if pdf_info.page_count > MAX_PDF_PAGES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"PDF has too many pages ({pdf_info.page_count}). Maximum: {MAX_PDF_PAGES}"
+            )
+        
+        megapixels = pdf_info.render_megapixels(ai_vision.render_dpi(template), template.name_crop_area)
+        if megapixels > MAX_RENDER_MEGAPIXELS:
+            raise HTTPException(status_code=413, detail="PDF is too large to process")
+        
+        logger.info(
+            f"📄 PDF has {pdf_info.page_count} pages, ~{megapixels:.1f} MP to render, "
+            f"text layer: {'yes' if pdf_info.has_text_layer else 'no'}"
+        )
+    
+    return pdf_info
+
 # Directory constants
 UPLOAD_DIR = "uploads"
 PREVIEW_DIR = "previews"
@@ -132,6 +198,40 @@ PROCESSING_DIR = os.path.join(UPLOAD_DIR, "processing") # New directory for two-
 for directory in [UPLOAD_DIR, PREVIEW_DIR, SAMPLES_DIR, PROCESSING_DIR]:
     os.makedirs(directory, exist_ok=True)
 
+# Background preview jobs - the queue lives next to the files the jobs work on
+job_queue = JobQueue.from_env(PROCESSING_DIR)
+
+# Company configs registered once and then referred to by handle
+template_registry = TemplateRegistry.from_env(
+    PROCESSING_DIR, matcher_factory=ai_vision.roster_matcher, dpi_factory=ai_vision.render_dpi
+)
+
+def resolve_template(company_config: Optional[str] = None, template_handle: Optional[str] = None,
+                     config_data: Optional[Dict] = None) -> CompiledTemplate:
+    """The compiled template a request refers to, by handle or by full config.
+
+    A full config is registered on the way, so its handle comes back in the
+    response. An unknown or expired handle is a 409: the client should
+    register the config again and retry.
+    """
+    if template_handle:
+        compiled = template_registry.get(template_handle)
+        if compiled is None:
+            raise HTTPException(status_code=409, detail="Unknown template handle, register the company config again")
+        return compiled
+
+    if config_data is None:
+        if not company_config:
+            raise HTTPException(status_code=400, detail="company_config or template_handle is required")
+        try:
+            config_data = json.loads(company_config)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid company configuration")
+    try:
+        return template_registry.register(config_data)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Authentication middleware and dependencies
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependency to verify JWT token and get current user"""
@@ -226,39 +326,28 @@ async def upload_sample(file: UploadFile = Depends(validate_file_size), company_
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Please upload a PDF file")
     
-    # Process PDF in memory - no file saving for security
+    # Process PDF straight from the upload buffer - no file saving for security
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Save to temporary file only for processing
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_pdf:
-            temp_pdf.write(content)
-            temp_pdf_path = temp_pdf.name
+        inspect_upload(file.file)
         
         # Convert first page to image for preview
-        images = convert_from_path(temp_pdf_path, dpi=300, first_page=1, last_page=1)
-        preview_image = images[0]
+        preview_image = pdf_service.render_page(file.file, 1, dpi=PREVIEW_DPI)
         
         # Save preview image temporarily
         preview_path = os.path.join(PREVIEW_DIR, f"{company_id}_preview.png")
         preview_image.save(preview_path)
         
-        # Delete the temporary PDF immediately
-        os.unlink(temp_pdf_path)
-        
         return JSONResponse({
             "success": True,
             "message": "Sample processed successfully (not stored for security)",
             "preview_url": f"/api/preview/{company_id}_preview.png",
+            "preview_dpi": PREVIEW_DPI,
             "company_id": company_id
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up temporary file if it exists
-        if 'temp_pdf_path' in locals() and os.path.exists(temp_pdf_path):
-            os.unlink(temp_pdf_path)
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
 @router.get("/api/preview/{filename}")
@@ -281,13 +370,17 @@ async def save_crop_area(request: Request):
     if not all([company_id, company_name, crop_area]):
         raise HTTPException(status_code=400, detail="Missing required data")
     
-    # Create crop area object
-    crop = CropArea(
-        x=int(crop_area["x"]),
-        y=int(crop_area["y"]),
-        width=int(crop_area["width"]),
-        height=int(crop_area["height"])
-    )
+    # Create crop area object - the frontend sends pixels of the setup preview
+    if crop_area.get("units") == "pt":
+        crop = CropArea.from_dict(crop_area)
+    else:
+        crop = CropArea.from_pixels(
+            x=float(crop_area["x"]),
+            y=float(crop_area["y"]),
+            width=float(crop_area["width"]),
+            height=float(crop_area["height"]),
+            dpi=int(data.get("preview_dpi") or PREVIEW_DPI)
+        )
     
     # Create template with empty employee list
     template = CompanyTemplate(
@@ -313,7 +406,7 @@ async def upload_employees(
     file: UploadFile = File(...), 
     company_config: str = Form(...)  # Existing company config from frontend
 ):
-    """Upload employee list CSV - returns updated config for frontend storage"""
+    """Upload employee list CSV - returns the config with the validated roster, its handle and import counts"""
     
     if not file.filename.lower().endswith('.csv'):
         raise HTTPException(status_code=400, detail="Please upload a CSV file")
@@ -321,95 +414,87 @@ async def upload_employees(
     try:
         # Parse existing company config from frontend
         config_data = json.loads(company_config)
-        
-        # Read CSV content
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        
-        # Parse employee data
-        employee_emails = {}
-        lines = csv_content.strip().split('\n')
-        
-        for line_num, line in enumerate(lines[1:], 2):  # Skip header
-            if line.strip():
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    name = parts[0].strip()
-                    email = parts[1].strip()
-                    if name and email:
-                        employee_emails[name] = email
-        
-        # Update config with employee emails
-        config_data['employee_emails'] = employee_emails
-        config_data['updated_at'] = datetime.now().isoformat()
-        
-        # Save to server only in development mode
-        if os.getenv("ENVIRONMENT", "development") == "development":
-            crop_area = CropArea(**config_data['name_crop_area'])
-            template = CompanyTemplate(
-                company_id=config_data['company_id'],
-                company_name=config_data['company_name'],
-                name_crop_area=crop_area,
-                employee_emails=employee_emails,
-                ocr_confidence_threshold=config_data.get('ocr_confidence_threshold', 80.0),
-                created_at=config_data.get('created_at'),
-                updated_at=config_data['updated_at']
-            )
-            config_manager.save_template(template)
-        
-        return JSONResponse({
-            "success": True,
-            "message": f"Uploaded {len(employee_emails)} employees successfully",
-            "template": config_data  # Return updated config for frontend storage
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid company configuration")
+
+    # Stream the CSV straight from the upload buffer
+    try:
+        roster = await asyncio.to_thread(import_roster, file.file)
+    except RosterImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not roster.employee_emails:
+        raise HTTPException(status_code=400, detail={
+            "message": "No valid employees found in the CSV", **roster.summary()
         })
-            
+
+    # Update config with employee emails
+    config_data['employee_emails'] = roster.employee_emails
+    config_data['updated_at'] = datetime.now().isoformat()
+
+    try:
+        # Migrate legacy pixel crop areas in the config the frontend stores
+        template = CompanyTemplate.from_dict(config_data)
+        config_data['name_crop_area'] = asdict(template.name_crop_area)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Invalid company configuration: {e}")
+
+    # Compile it now - the roster's match index is built here rather than on the first preview
+    compiled = await asyncio.to_thread(resolve_template, config_data=config_data)
+    
+    # Save to server only in development mode
+    if os.getenv("ENVIRONMENT", "development") == "development":
+        config_manager.save_template(compiled.template)
+    
+    return JSONResponse({
+        "success": True,
+        "message": f"Uploaded {len(roster.employee_emails)} employees successfully",
+        "template_handle": compiled.handle,
+        # Frontend stores this - the roster exactly as imported here
+        "template": config_data,
+        **roster.summary()
+    })
+
+@router.post("/api/templates")
+async def register_template(request: Request, user_info: Dict = Depends(get_current_user)):
+    """Compile a company config once and return its handle for later requests"""
+    data = await request.json()
+    config_data = data.get("company_config", data) if isinstance(data, dict) else data
+    compiled = await asyncio.to_thread(resolve_template, config_data=config_data)
+    return {
+        "success": True,
+        "template_handle": compiled.handle,
+        "company": compiled.template.company_name,
+        "employee_count": len(compiled.template.employee_emails),
+        "render_dpi": compiled.render_dpi
+    }
 
 @router.post("/api/setup/test-template")
 async def test_template(
     file: UploadFile = Depends(validate_file_size),
-    company_config: str = Form(...)  # Company config from frontend
+    company_config: Optional[str] = Form(None),  # Company config from frontend
+    template_handle: Optional[str] = Form(None)  # ...or the handle it was registered under
 ):
     """Test the template with uploaded sample PDF - no persistent storage"""
+    compiled = await asyncio.to_thread(resolve_template, company_config, template_handle)
+    template = compiled.template
     
     try:
-        # Parse company config from frontend
-        config_data = json.loads(company_config)
-        crop_area = CropArea(**config_data['name_crop_area'])
-        template = CompanyTemplate(
-            company_id=config_data['company_id'],
-            company_name=config_data['company_name'],
-            name_crop_area=crop_area,
-            employee_emails=config_data['employee_emails'],
-            ocr_confidence_threshold=config_data.get('ocr_confidence_threshold', 80.0)
-        )
-        
-        # Process PDF in memory - no file saving
-        content = await file.read()
-        
-        # Save to temporary file only for processing
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_pdf:
-            temp_pdf.write(content)
-            temp_pdf_path = temp_pdf.name
+        # Process PDF straight from the upload buffer - no file saving
+        pdf_info = inspect_upload(file.file, template)
         
         # Process with AI vision
-        results = await ai_vision.process_payslip_pdf(temp_pdf_path, template)
-        
-        # Delete the temporary PDF immediately
-        os.unlink(temp_pdf_path)
+        results = await ai_vision.process_payslip_pdf(file.file, template, pdf_info, compiled.matcher)
         
         return JSONResponse({
             "success": True,
             "message": "Template test completed (PDF not stored for security)",
+            "template_handle": compiled.handle,
             "results": results
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up temporary file if it exists
-        if 'temp_pdf_path' in locals() and os.path.exists(temp_pdf_path):
-            os.unlink(temp_pdf_path)
         raise HTTPException(status_code=500, detail=f"Error testing template: {str(e)}")
 
 @router.get("/api/companies/{company_id}")
@@ -423,31 +508,22 @@ async def get_company(company_id: str):
     else:
         return {"company": None, "message": "Company config managed by frontend"}
 
-@router.post("/api/process/{company_id}/preview")
-async def process_payslip_preview(
-    company_id: str, 
-    file: UploadFile = Depends(validate_file_size),
-    user_info: Dict = Depends(check_rate_limit_dependency("ai_calls")),
-    company_config: str = Form(...)  # Company config as JSON string from frontend
-):
-    """Step 1: Analyzes the payslip PDF and returns a preview of matches."""
-    logger.info(f"[{company_id}] - PREVIEW_START: Received request for file {file.filename}")
-    
-    # Parse company config from frontend
+def prepare_preview(company_id: str, file: UploadFile, company_config: Optional[str],
+                    template_handle: Optional[str] = None):
+    """Resolve the template, check the upload and save it for the send step.
+
+    Returns (compiled template, pdf_info, process_id, pdf_path). Raises
+    HTTPException before any processing starts, so streaming clients get a
+    plain error too. Blocking (SQLite, PDF parsing, file copy) - run it in
+    a thread.
+    """
     try:
-        config_data = json.loads(company_config)
-        crop_area = CropArea(**config_data['name_crop_area'])
-        template = CompanyTemplate(
-            company_id=config_data['company_id'],
-            company_name=config_data['company_name'],
-            name_crop_area=crop_area,
-            employee_emails=config_data['employee_emails'],
-            ocr_confidence_threshold=config_data.get('ocr_confidence_threshold', 80.0)
-        )
-        logger.info(f"[{company_id}] - PREVIEW_LOG: Company template parsed from frontend.")
-    except Exception as e:
-        logger.error(f"[{company_id}] - PREVIEW_FAIL: Invalid company config: {e}")
-        raise HTTPException(status_code=400, detail="Invalid company configuration")
+        compiled = resolve_template(company_config, template_handle)
+        logger.info(f"[{company_id}] - PREVIEW_LOG: Using company template {compiled.handle[:8]}.")
+    except HTTPException as e:
+        logger.error(f"[{company_id}] - PREVIEW_FAIL: {e.detail}")
+        raise
+    template = compiled.template
 
     if not file.filename.lower().endswith('.pdf'):
         logger.error(f"[{company_id}] - PREVIEW_FAIL: Invalid file type {file.filename}")
@@ -455,36 +531,79 @@ async def process_payslip_preview(
 
     process_id = str(uuid.uuid4())
     pdf_path = os.path.join(PROCESSING_DIR, f"{process_id}.pdf")
-    results_path = os.path.join(PROCESSING_DIR, f"{process_id}.json")
     logger.info(f"[{company_id}] - PREVIEW_LOG: Generated process ID {process_id}")
 
     try:
-        # Save the uploaded PDF
-        logger.info(f"[{company_id}] - PREVIEW_LOG: Saving uploaded PDF to {pdf_path}")
+        pdf_info = inspect_upload(file.file, template)
+    except HTTPException as e:
+        logger.error(f"[{company_id}] - PREVIEW_FAIL: {e.detail}")
+        raise
+
+    # Save the uploaded PDF (kept for the send step), copied over from the upload buffer
+    logger.info(f"[{company_id}] - PREVIEW_LOG: Saving uploaded PDF to {pdf_path}")
+    try:
         with open(pdf_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        logger.info(f"[{company_id}] - PREVIEW_LOG: Successfully saved PDF.")
+            file.file.seek(0)
+            shutil.copyfileobj(file.file, buffer, UPLOAD_CHUNK_SIZE)
+    except OSError as e:
+        logger.error(f"[{company_id}] - PREVIEW_ERROR: Could not save PDF: {e}")
+        cleanup_preview(process_id)
+        raise HTTPException(status_code=500, detail="Error saving the uploaded PDF")
+    logger.info(f"[{company_id}] - PREVIEW_LOG: Successfully saved PDF.")
+
+    return compiled, pdf_info, process_id, pdf_path
+
+def finish_preview(company_id: str, process_id: str, results: List[Dict], user_info: Dict):
+    """Cache the results for the send step and count the run against the AI quota"""
+    results_path = os.path.join(PROCESSING_DIR, f"{process_id}.json")
+    logger.info(f"[{company_id}] - PREVIEW_LOG: Caching results to {results_path}")
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    logger.info(f"[{company_id}] - PREVIEW_LOG: Results cached successfully.")
+
+    # Increment AI usage counter after successful processing - runs answered
+    # entirely from the text layer or the name cache cost nothing
+    if any(result.get("source") == "vision" for result in results):
+        auth_service.increment_usage(user_info["google_user_id"], "ai_calls")
+        logger.info(f"[{company_id}] - PREVIEW_LOG: AI usage counter incremented.")
+    else:
+        logger.info(f"[{company_id}] - PREVIEW_LOG: No AI calls made, usage counter unchanged.")
+
+def cleanup_preview(process_id: str):
+    """Remove a failed run's saved PDF and cached results"""
+    for suffix in (".pdf", ".json"):
+        path = os.path.join(PROCESSING_DIR, f"{process_id}{suffix}")
+        if os.path.exists(path):
+            os.remove(path)
+
+@router.post("/api/process/{company_id}/preview")
+async def process_payslip_preview(
+    company_id: str, 
+    file: UploadFile = Depends(validate_file_size),
+    user_info: Dict = Depends(check_rate_limit_dependency("ai_calls")),
+    company_config: Optional[str] = Form(None),  # Company config as JSON string from frontend
+    template_handle: Optional[str] = Form(None)  # ...or the handle it was registered under
+):
+    """Step 1: Analyzes the payslip PDF and returns a preview of matches."""
+    logger.info(f"[{company_id}] - PREVIEW_START: Received request for file {file.filename}")
+    compiled, pdf_info, process_id, pdf_path = await asyncio.to_thread(
+        prepare_preview, company_id, file, company_config, template_handle
+    )
+    template = compiled.template
 
+    try:
         # Process with AI vision to get results for preview
         logger.info(f"[{company_id}] - PREVIEW_LOG: Starting AI Vision processing...")
-        results = await ai_vision.process_payslip_pdf(pdf_path, template)
+        results = await ai_vision.process_payslip_pdf(pdf_path, template, pdf_info, compiled.matcher)
         logger.info(f"[{company_id}] - PREVIEW_LOG: AI Vision processing complete.")
 
-        # Cache the results to a JSON file
-        logger.info(f"[{company_id}] - PREVIEW_LOG: Caching results to {results_path}")
-        with open(results_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-        logger.info(f"[{company_id}] - PREVIEW_LOG: Results cached successfully.")
-
-        # Increment AI usage counter after successful processing
-        auth_service.increment_usage(user_info["google_user_id"], "ai_calls")
-        logger.info(f"[{company_id}] - PREVIEW_LOG: AI usage counter incremented.")
+        finish_preview(company_id, process_id, results, user_info)
 
         logger.info(f"[{company_id}] - PREVIEW_SUCCESS: Preview generation complete.")
         return {
             "success": True,
             "process_id": process_id,
+            "template_handle": compiled.handle,
             "preview": results,
             "filename": file.filename,
             "company": template.company_name
@@ -492,12 +611,185 @@ async def process_payslip_preview(
     except Exception as e:
         logger.error(f"[{company_id}] - PREVIEW_ERROR: An exception occurred: {str(e)}", exc_info=True)
         # Clean up files on error
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-        if os.path.exists(results_path):
-            os.remove(results_path)
+        cleanup_preview(process_id)
         raise HTTPException(status_code=500, detail=f"Error during preview processing: {str(e)}")
 
+def sse_event(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/api/process/{company_id}/preview/stream")
+async def process_payslip_preview_stream(
+    company_id: str, 
+    file: UploadFile = Depends(validate_file_size),
+    user_info: Dict = Depends(check_rate_limit_dependency("ai_calls")),
+    company_config: Optional[str] = Form(None),  # Company config as JSON string from frontend
+    template_handle: Optional[str] = Form(None)  # ...or the handle it was registered under
+):
+    """Step 1, streamed: the same preview as Server-Sent Events.
+
+    Emits a `page` event per page as soon as it is matched (in completion
+    order), a `summary` event with the `process_id` once all pages are in,
+    or an `error` event if processing fails part way. Comment lines keep
+    the connection alive while pages are slow to come back.
+    """
+    logger.info(f"[{company_id}] - PREVIEW_STREAM_START: Received request for file {file.filename}")
+    compiled, pdf_info, process_id, pdf_path = await asyncio.to_thread(
+        prepare_preview, company_id, file, company_config, template_handle
+    )
+    template = compiled.template
+
+    async def events():
+        results = []
+        pages = ai_vision.iter_payslip_results(pdf_path, template, pdf_info, compiled.matcher)
+        next_page = None
+        finished = False
+        try:
+            yield sse_event("start", {
+                "process_id": process_id,
+                "template_handle": compiled.handle,
+                "page_count": pdf_info.page_count
+            })
+            while True:
+                if next_page is None:
+                    next_page = asyncio.ensure_future(pages.__anext__())
+                done, _ = await asyncio.wait({next_page}, timeout=SSE_KEEPALIVE_SECONDS)
+                if not done:
+                    yield ": keepalive\n\n"
+                    continue
+                try:
+                    result = next_page.result()
+                except StopAsyncIteration:
+                    break
+                next_page = None
+                results.append(result)
+                yield sse_event("page", result)
+
+            results.sort(key=lambda x: x["page"])
+            if template.global_assignment:
+                results = ai_vision.finalize_results(results, template, compiled.matcher)
+                # Page events were per-page guesses; this replaces them with the document-wide decision
+                yield sse_event("assignment", {"preview": results})
+            finish_preview(company_id, process_id, results, user_info)
+            finished = True
+            logger.info(f"[{company_id}] - PREVIEW_STREAM_SUCCESS: Streamed {len(results)} pages.")
+            yield sse_event("summary", {
+                "success": True,
+                "process_id": process_id,
+                "page_count": len(results),
+                "matched": sum(1 for result in results if result.get("found_match")),
+                "filename": file.filename,
+                "company": template.company_name
+            })
+        except Exception as e:
+            logger.error(f"[{company_id}] - PREVIEW_STREAM_ERROR: An exception occurred: {str(e)}", exc_info=True)
+            yield sse_event("error", {"detail": f"Error during preview processing: {str(e)}"})
+        finally:
+            # Client went away (or we failed) - stop the pipeline and its AI calls
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+                await asyncio.gather(next_page, return_exceptions=True)
+            await pages.aclose()
+            # Nothing will ever send this upload - don't leave the payroll PDF behind
+            if not finished:
+                logger.info(f"[{company_id}] - PREVIEW_STREAM_LOG: Stream ended early, removing {process_id}.")
+                cleanup_preview(process_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Don't let nginx and friends buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def run_preview_job(job: Dict, progress) -> int:
+    """Job handler: the same preview as the preview endpoint, reporting progress per page"""
+    payload = job["payload"]
+    company_id = payload["company_id"]
+    process_id = job["id"]
+    pdf_path = os.path.join(PROCESSING_DIR, f"{process_id}.pdf")
+
+    try:
+        compiled = await asyncio.to_thread(template_registry.register, payload["company_config"])
+        template = compiled.template
+        pdf_info = await asyncio.to_thread(pdf_service.inspect, pdf_path)
+        results = []
+        async for result in ai_vision.iter_payslip_results(pdf_path, template, pdf_info, compiled.matcher):
+            results.append(result)
+            progress(len(results))
+        results.sort(key=lambda x: x["page"])
+        results = ai_vision.finalize_results(results, template, compiled.matcher)
+        finish_preview(company_id, process_id, results, {"google_user_id": job["owner"]})
+    except Exception:
+        cleanup_preview(process_id)
+        raise
+    return len(results)
+
+job_workers = JobWorkerPool(job_queue, {"preview": run_preview_job}, workers=int(os.getenv("JOB_WORKERS", "1")))
+
+@router.post("/api/process/{company_id}/preview/jobs", status_code=202)
+async def enqueue_payslip_preview(
+    company_id: str, 
+    file: UploadFile = Depends(validate_file_size),
+    user_info: Dict = Depends(check_rate_limit_dependency("ai_calls")),
+    company_config: Optional[str] = Form(None),  # Company config as JSON string from frontend
+    template_handle: Optional[str] = Form(None)  # ...or the handle it was registered under
+):
+    """Step 1, in the background: queue the preview and return a job id to poll at once"""
+    logger.info(f"[{company_id}] - PREVIEW_JOB_START: Received request for file {file.filename}")
+    compiled, pdf_info, process_id, pdf_path = await asyncio.to_thread(
+        prepare_preview, company_id, file, company_config, template_handle
+    )
+    template = compiled.template
+
+    try:
+        # Drop finished jobs (and their files) past the retention period
+        for expired_id in await asyncio.to_thread(job_queue.purge):
+            cleanup_preview(expired_id)
+
+        await asyncio.to_thread(
+            job_queue.enqueue,
+            "preview",
+            user_info["google_user_id"],
+            {"company_id": company_id, "company_config": compiled.config, "filename": file.filename},
+            pdf_info.page_count,
+            process_id,
+        )
+    except Exception as e:
+        logger.error(f"[{company_id}] - PREVIEW_JOB_ERROR: Could not queue job: {e}", exc_info=True)
+        cleanup_preview(process_id)
+        raise HTTPException(status_code=500, detail="Error queueing preview job")
+
+    return {
+        "success": True,
+        "job_id": process_id,
+        "process_id": process_id,
+        "template_handle": compiled.handle,
+        "status_url": f"/api/jobs/{process_id}",
+        "pages_total": pdf_info.page_count,
+        "company": template.company_name
+    }
+
+@router.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str, user_info: Dict = Depends(get_current_user)):
+    """Progress of a background preview job, with the results once it is done"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job or job["owner"] != user_info["google_user_id"]:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+
+    status = job_status(job)
+    status["process_id"] = job_id
+    status["filename"] = job["payload"].get("filename")
+    if job["status"] == DONE:
+        results_path = os.path.join(PROCESSING_DIR, f"{job_id}.json")
+        try:
+            with open(results_path, "r", encoding="utf-8") as f:
+                status["preview"] = json.load(f)
+        except OSError:
+            raise HTTPException(status_code=404, detail="Job results expired.")
+    return status
+
 
 @router.post("/api/process/{company_id}/send")
 async def process_payslip_send(
@@ -508,26 +800,15 @@ async def process_payslip_send(
     """Step 2: Sends emails based on a completed preview process."""
     data = await request.json()
     process_id = data.get("process_id")
-    company_config = data.get("company_config")
 
     if not process_id:
         raise HTTPException(status_code=400, detail="process_id is required")
-    
-    if not company_config:
-        raise HTTPException(status_code=400, detail="company_config is required")
 
-    # Parse company config from frontend
-    try:
-        crop_area = CropArea(**company_config['name_crop_area'])
-        template = CompanyTemplate(
-            company_id=company_config['company_id'],
-            company_name=company_config['company_name'],
-            name_crop_area=crop_area,
-            employee_emails=company_config['employee_emails'],
-            ocr_confidence_threshold=company_config.get('ocr_confidence_threshold', 80.0)
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid company configuration: {e}")
+    # Full company config from frontend, or the handle it was registered under
+    compiled = await asyncio.to_thread(
+        resolve_template, template_handle=data.get("template_handle"), config_data=data.get("company_config")
+    )
+    template = compiled.template
 
     pdf_path = os.path.join(PROCESSING_DIR, f"{process_id}.pdf")
     results_path = os.path.join(PROCESSING_DIR, f"{process_id}.json")
@@ -541,34 +822,31 @@ async def process_payslip_send(
             results = json.load(f)
 
         email_results = []
+        matched_results = {result["page"]: result for result in results if result.get("found_match")}
         # Use a temporary directory for extracted single-page PDFs
         with tempfile.TemporaryDirectory() as temp_dir:
-            for result in results:
-                if result.get("found_match"):
-                    employee_name = result["employee_name"]
-                    employee_email = result["employee_email"]
-                    page_number = result["page"]
-
-                    # Extract the specific page
-                    page_filename = f"{company_id}_{employee_name}_page_{page_number}.pdf"
-                    page_path = os.path.join(temp_dir, page_filename)
-                    pdf_service.extract_page(pdf_path, page_number, page_path)
-
-                    # Send the email
-                    success, detail = await email_service.send_payslip_email(
-                        to_email=employee_email,
-                        employee_name=employee_name,
-                        payslip_pdf_path=page_path,
-                        payslip_filename=page_filename
-                    )
-
-                    email_results.append({
-                        "employee_name": employee_name,
-                        "employee_email": employee_email,
-                        "page": page_number,
-                        "email_sent": success,
-                        "email_detail": str(detail) # Ensure detail is a string
-                    })
+            # Split all matched pages in a single pass over the source PDF
+            for page_number, page_path in pdf_service.split_pages(pdf_path, sorted(matched_results), temp_dir):
+                result = matched_results[page_number]
+                employee_name = result["employee_name"]
+                employee_email = result["employee_email"]
+                page_filename = f"{company_id}_{employee_name}_page_{page_number}.pdf"
+
+                # Send the email
+                success, detail = await email_service.send_payslip_email(
+                    to_email=employee_email,
+                    employee_name=employee_name,
+                    payslip_pdf_path=page_path,
+                    payslip_filename=page_filename
+                )
+
+                email_results.append({
+                    "employee_name": employee_name,
+                    "employee_email": employee_email,
+                    "page": page_number,
+                    "email_sent": success,
+                    "email_detail": str(detail) # Ensure detail is a string
+                })
 
         # Increment email usage counter after successful sending
         successful_emails = sum(1 for result in email_results if result.get("email_sent"))
@@ -1,25 +1,119 @@
 import os
-import base64
+import json
+import time
+import asyncio
 import logging
-from typing import List, Dict, Optional
-from io import BytesIO
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Tuple
 
 import httpx
-from PIL import Image
-from pdf2image import convert_from_path
+from dataclasses import dataclass
+from PIL import Image, ImageOps
 from dotenv import load_dotenv
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
 
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from config import CompanyTemplate, CropArea
+from services.pdf_service import PDFInfo, PDFService, PDFSource
+from services.hebrew_text import is_usable_name, normalize_hebrew, reverse_visual
+from services.name_cache import NameCache
+from services.crop_encoding import get_profile, to_data_url
+from services.crop_dedupe import CropClusters
+from services.page_filter import BlankPageFilter
+from services.roster_matcher import MatcherCache, RosterMatcher
+from services.page_assignment import assign_pages
+from services.resilience import AdaptiveLimiter, LatencyTracker, RetryPolicy, hedged
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Bump when the extraction prompts change so cached names are not reused
+PROMPT_VERSION = "1"
+# Placeholder names returned when extraction fails - never cached
+UNREADABLE_NAMES = ("שגיאה", "לא זוהה")
+
+# HTTP/2 needs the optional h2 package; without it the client speaks HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+@dataclass
+class TierStats:
+    """Pages a vision tier looked at, how many it settled, and the time it spent"""
+    pages: int = 0
+    accepted: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "pages": self.pages,
+            "accepted": self.accepted,
+            "escalated": self.pages - self.accepted,
+            "avg_ms_per_page": round(self.seconds * 1000 / self.pages, 1) if self.pages else None,
+        }
+
+class VisionBackend(ABC):
+    """One tier of name extraction from crops - tiers run cheapest first"""
+    name = "base"
+
+    @abstractmethod
+    async def extract_names(self, images: List[Image.Image]) -> List[Tuple[str, float]]:
+        """Return (name, confidence 0-100) for every crop"""
+
+class TesseractBackend(VisionBackend):
+    """Local OCR with Tesseract's Hebrew model - free, and good enough for clean printed names"""
+    name = "tesseract"
+
+    def __init__(self, lang: str = "heb"):
+        import pytesseract  # Optional dependency - only needed for the local tier
+        if lang not in pytesseract.get_languages(config=""):
+            raise ImportError(f"Tesseract language pack '{lang}' is not installed")
+        self.pytesseract = pytesseract
+        self.lang = lang
+
+    async def extract_names(self, images: List[Image.Image]) -> List[Tuple[str, float]]:
+        return await asyncio.gather(*(asyncio.to_thread(self._ocr, image) for image in images))
+
+    def _ocr(self, image: Image.Image) -> Tuple[str, float]:
+        # A single line of text (--psm 7); confidence is the mean over recognised words
+        data = self.pytesseract.image_to_data(
+            ImageOps.grayscale(image), lang=self.lang, config="--psm 7",
+            output_type=self.pytesseract.Output.DICT
+        )
+        words = [
+            (text.strip(), float(conf))
+            for text, conf in zip(data["text"], data["conf"])
+            if text.strip() and float(conf) >= 0
+        ]
+        if not words:
+            return "", 0.0
+        name = normalize_hebrew(" ".join(text for text, _ in words))
+        return name, sum(conf for _, conf in words) / len(words)
+
+class OpenRouterBackend(VisionBackend):
+    """The remote vision model - batched, retried and rate limited by the owning service"""
+    name = "openrouter"
+
+    def __init__(self, service: "AIVisionService"):
+        self.service = service
+
+    async def extract_names(self, images: List[Image.Image]) -> List[Tuple[str, float]]:
+        if len(images) == 1:
+            names = [await self.service._extract_name_with_ai(images[0])]
+        else:
+            try:
+                names = await self.service._extract_names_batch(images)
+            except ValueError as e:
+                # Only an answer we couldn't read - HTTP errors and timeouts (already retried)
+                # surface as page errors rather than multiplying the load on a struggling upstream
+                logger.warning(f"⚠️ Batch of {len(images)} crops unreadable ({e}), falling back to one request per crop")
+                names = await asyncio.gather(*(self.service._extract_name_with_ai(image) for image in images))
+        return [(name, 0.0 if name in UNREADABLE_NAMES else 100.0) for name in names]
+
 class AIVisionService:
     """AI Vision service using OpenRouter API with Gemini model"""
     
@@ -28,124 +122,437 @@ class AIVisionService:
         self.model = "google/gemini-2.5-flash-lite-preview-06-17"  # Using the model you specified
         self.base_url = "https://openrouter.ai/api/v1"
         self.is_dev = os.getenv("ENVIRONMENT") == "development"
+        self.pdf_service = PDFService()
+        # Maximum number of pages queued for the AI per request (bounds memory);
+        # how many calls actually run at once is up to the shared limiter
+        self.max_in_flight = max(1, int(os.getenv("VISION_MAX_IN_FLIGHT", "32")))
+        # Adapts concurrency to OpenRouter's rate limits and latency, for the whole worker
+        self.limiter = AdaptiveLimiter.from_env()
+        # Retry timeouts, 429s and 5xx with jittered backoff
+        self.retry_policy = RetryPolicy.from_env()
+        # Fire a duplicate of calls slower than the p95 latency (costs an extra call)
+        self.hedging = os.getenv("VISION_HEDGING", "false").lower() == "true"
+        self.latencies: Dict[int, LatencyTracker] = {}
+        # Crops sent per vision request; templates can override it (vision_batch_size)
+        self.batch_size = max(1, int(os.getenv("VISION_BATCH_SIZE", "1")))
+        # Read names from the PDF text layer before paying for a vision call
+        self.text_layer_fast_path = os.getenv("TEXT_LAYER_FAST_PATH", "true").lower() == "true"
+        # Rosters are normalized once and reused across pages and runs
+        self.matchers = MatcherCache()
+        # Crops with nothing on them never reach any tier (see services/page_filter.py)
+        self.blank_filter = BlankPageFilter.from_env()
+        # Send one crop per group of repeated crops in a document (see services/crop_dedupe.py)
+        self.dedupe = os.getenv("VISION_DEDUPE", "true").lower() == "true"
+        self.dedupe_distance = int(os.getenv("VISION_DEDUPE_DISTANCE", "0"))
+        # How crops are compressed before upload (see services/crop_encoding.py)
+        self.encoding = get_profile()
+        # Names already read from identical crops (see services/name_cache.py)
+        self.name_cache = NameCache.from_env()
+        # Extraction tiers: local OCR first (when installed), escalating to OpenRouter
+        self.local_backend = self._load_local_backend()
+        self.remote_backend = OpenRouterBackend(self)
+        self.tier_stats = {self.remote_backend.name: TierStats()}
+        if self.local_backend:
+            self.tier_stats[self.local_backend.name] = TierStats()
+        # Shared OpenRouter client, opened at app startup (see start())
+        self.client: Optional[httpx.AsyncClient] = None
         
         if not self.api_key:
             logger.warning("⚠️ OPENROUTER_API_KEY not found in environment variables")
     
-    async def process_payslip_pdf(self, pdf_path: str, template: CompanyTemplate) -> List[Dict]:
-        """Process a payslip PDF and extract Hebrew names using AI vision"""
-        results = []
+    def _load_local_backend(self) -> Optional[VisionBackend]:
+        """The local OCR tier, or None when it is disabled or not installed"""
+        if os.getenv("VISION_LOCAL_OCR", "true").lower() != "true":
+            return None
+        try:
+            backend = TesseractBackend(os.getenv("VISION_LOCAL_OCR_LANG", "heb"))
+            logger.info(f"🔤 Local OCR tier enabled ({backend.name})")
+            return backend
+        except (ImportError, OSError) as e:
+            logger.warning(f"⚠️ Local OCR tier enabled but unavailable ({e}), every crop goes to OpenRouter")
+            return None
+    
+    async def start(self):
+        """Open the pooled OpenRouter client (called on application startup)"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.limiter.max_limit,
+                    max_keepalive_connections=self.limiter.max_limit,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=30.0,
+            )
+            logger.info(f"🌐 OpenRouter client ready ({'HTTP/2' if HTTP2_AVAILABLE else 'HTTP/1.1'})")
+    
+    async def close(self):
+        """Close the OpenRouter client (called on application shutdown)"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("🌐 OpenRouter client closed")
+    
+    async def process_payslip_pdf(self, pdf_path: PDFSource, template: CompanyTemplate,
+                                  pdf_info: Optional[PDFInfo] = None,
+                                  matcher: Optional[RosterMatcher] = None) -> List[Dict]:
+        """Process a payslip PDF and extract Hebrew names using AI vision.
+
+        `pdf_info` (from PDFService.inspect) lets scanned documents skip the
+        text-layer stage altogether. `matcher` is the roster matcher of a
+        compiled template, if there is one.
+        """
+        matcher = matcher or self.roster_matcher(template)
+        results = [result async for result in self.iter_payslip_results(pdf_path, template, pdf_info, matcher)]
+        
+        # Sort results by page number
+        results.sort(key=lambda x: x["page"])
+        
+        return self.finalize_results(results, template, matcher)
+    
+    def finalize_results(self, results: List[Dict], template: CompanyTemplate,
+                         matcher: Optional[RosterMatcher] = None) -> List[Dict]:
+        """Document-level steps once every page is in (results sorted by page)"""
+        if template.global_assignment and template.employee_emails:
+            assign_pages(results, matcher or self.roster_matcher(template), max(1, template.max_pages_per_employee))
+        return results
+    
+    async def iter_payslip_results(self, pdf_path: PDFSource, template: CompanyTemplate,
+                                   pdf_info: Optional[PDFInfo] = None,
+                                   matcher: Optional[RosterMatcher] = None) -> AsyncIterator[Dict]:
+        """Yield each page's result as soon as it is ready (text-layer pages first, then in completion order)"""
+        sources = Counter()
+        in_flight = {}
+        matcher = matcher or self.roster_matcher(template)
         
         try:
-            # Convert PDF to images
-            images = convert_from_path(pdf_path, dpi=300)
-            logger.info(f"🔄 Processing {len(images)} pages from PDF")
-            
-            # Use a ThreadPoolExecutor for parallel processing
-            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-                future_to_page = {
-                    executor.submit(self._process_single_page, image, template.name_crop_area, page_num + 1): page_num
-                    for page_num, image in enumerate(images)
-                }
+            # Pages with a usable text layer never reach the AI - only with a roster
+            # to check the text against, since a label reads as well as a name
+            use_text_layer = (self.text_layer_fast_path and bool(template.employee_emails)
+                              and (pdf_info is None or pdf_info.has_text_layer))
+            text_names = await asyncio.to_thread(self._read_text_layer_names, pdf_path, template, matcher) if use_text_layer else {}
+            for result in self._build_page_results(
+                [(page_num, hebrew_name, None, "text_layer") for page_num, hebrew_name in text_names.items()], matcher
+            ):
+                sources["text_layer"] += 1
+                yield result
+            
+            vision_pages = None
+            if text_names:
+                total_pages = pdf_info.page_count if pdf_info else self.pdf_service.get_total_pages(pdf_path)
+                vision_pages = [page for page in range(1, total_pages + 1) if page not in text_names]
+            
+            batch_size = template.vision_batch_size or self.batch_size
+            # Keep roughly `max_in_flight` pages waiting, but always at least one batch
+            max_batches = max(1, self.max_in_flight // batch_size)
+            logger.info(f"🔄 Processing pages from PDF ({max_batches} requests of up to {batch_size} pages in flight)")
+            
+            # Pages are rendered lazily (off the event loop) and grouped into
+            # batches; each batch becomes a task as soon as it fills up, with at
+            # most `max_batches` waiting on the AI at any time. Bitmaps are
+            # released as soon as their task is done.
+            crops = self._iter_name_crops(pdf_path, template, vision_pages)
+            batch = []
+            # Pages whose crop repeats an earlier page's wait for that page's answer
+            clusters = CropClusters(self.dedupe_distance) if self.dedupe else None
+            followers = defaultdict(list)
+            answered = {}
+            
+            while True:
+                item, duplicate_of, skip_reason = await asyncio.to_thread(self._next_crop, crops, clusters)
+                if skip_reason is not None:
+                    sources["skipped"] += 1
+                    yield self._skipped_result(item[0], skip_reason)
+                    continue
+                if duplicate_of is not None:
+                    page_num, cropped_image = item
+                    cropped_image_path = self._save_debug_image(cropped_image, "debug", page_num)
+                    if duplicate_of in answered:
+                        yield self._duplicate_result(answered[duplicate_of], page_num, cropped_image_path)
+                    else:
+                        followers[duplicate_of].append((page_num, cropped_image_path))
+                    continue
+                if item is not None:
+                    batch.append(item)
+                    if len(batch) < batch_size:
+                        continue
+                
+                # Wait when the pipeline is full (or only in-flight work is left),
+                # then hand out everything that has finished so far
+                if in_flight and (len(in_flight) >= max_batches or not batch):
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in [task for task in in_flight if task.done()]:
+                    for result in self._collect_batch_results(task, in_flight.pop(task), matcher):
+                        sources[result.get("source", "vision")] += 1
+                        yield result
+                        if clusters:
+                            answered[result["page"]] = result
+                            for page_num, cropped_image_path in followers.pop(result["page"], []):
+                                yield self._duplicate_result(result, page_num, cropped_image_path)
                 
-                for future in as_completed(future_to_page):
-                    page_num = future_to_page[future]
-                    try:
-                        hebrew_name, cropped_image_path = future.result()
-                        
-                        if hebrew_name:
-                            found_match, employee_name, employee_email = self._find_best_match(
-                                hebrew_name, template.employee_emails
-                            )
-                            
-                            results.append({
-                                "page": page_num + 1,
-                                "found_match": found_match,
-                                "extracted_name": hebrew_name,
-                                "employee_name": employee_name,
-                                "employee_email": employee_email,
-                                "cropped_image_path": cropped_image_path
-                            })
-                        else:
-                            results.append({
-                                "page": page_num + 1,
-                                "found_match": False,
-                                "extracted_name": "N/A",
-                                "error": "Could not extract name from page."
-                            })
-
-                    except Exception as e:
-                        logger.error(f"Error processing page {page_num + 1}: {e}")
-                        results.append({
-                            "page": page_num + 1,
-                            "found_match": False,
-                            "error": str(e)
-                        })
-            
-            # Sort results by page number
-            results.sort(key=lambda x: x["page"])
+                if batch:
+                    page_nums = [page_num for page_num, _ in batch]
+                    in_flight[asyncio.create_task(self._process_page_batch(batch, template, matcher))] = page_nums
+                    batch = []
+                elif item is None and not in_flight:
+                    break
             
-            return results
+            if clusters and clusters.duplicates:
+                sources["duplicate"] = clusters.duplicates
+            logger.info(
+                f"✅ Processed {sum(sources.values())} pages from PDF ("
+                + ", ".join(f"{count} {source}" for source, count in sorted(sources.items())) + ")"
+            )
+            logger.info(f"📊 Vision tiers: {self.tier_report()}")
             
         except Exception as e:
             logger.error(f"❌ Error processing PDF: {e}")
             raise
-            
-    def _process_single_page(self, image: Image.Image, crop_area: CropArea, page_num: int):
-        """Process a single page: crop, save debug image, and extract name."""
+        finally:
+            # Also reached when the consumer stops early (e.g. a streaming client disconnects)
+            for task in in_flight:
+                task.cancel()
+    
+    def _next_crop(self, crops: Iterator[Tuple[int, Image.Image]], clusters: Optional[CropClusters]
+                   ) -> Tuple[Optional[Tuple[int, Image.Image]], Optional[int], Optional[str]]:
+        """Render the next crop and decide its fate (runs off the event loop).
+
+        Returns (item, page it duplicates, reason to skip it) - blank crops
+        are skipped before they can start a cluster.
+        """
+        item = next(crops, None)
+        if item is None:
+            return None, None, None
+        if self.blank_filter:
+            skip_reason = self.blank_filter.skip_reason(item[1])
+            if skip_reason:
+                return item, None, skip_reason
+        return item, clusters.assign(*item) if clusters else None, None
+    
+    @staticmethod
+    def _skipped_result(page_num: int, skip_reason: str) -> Dict:
+        """Result for a page that was never sent for extraction"""
+        return {
+            "page": page_num,
+            "found_match": False,
+            "extracted_name": "",
+            "source": "skipped",
+            "skip_reason": skip_reason
+        }
+    
+    @staticmethod
+    def _duplicate_result(result: Dict, page_num: int, cropped_image_path: Optional[str]) -> Dict:
+        """A page's result copied from the page whose crop it duplicates"""
+        return dict(result, page=page_num, cropped_image_path=cropped_image_path, duplicate_of=result["page"])
+    
+    def _read_text_layer_names(self, pdf_path: PDFSource, template: CompanyTemplate,
+                               matcher: RosterMatcher) -> Dict[int, str]:
+        """Names read straight from the PDF text layer, for pages where the text can be trusted.
+
+        Text is accepted when it holds a name that matches someone on the
+        template's roster (in either reading direction). Anything else -
+        scanned pages, labels only, garbled encodings, templates without a
+        roster - goes to vision.
+        """
+        if not template.employee_emails:
+            return {}
         
-        # Crop to name area
-        cropped_image = self._crop_image(image, crop_area)
+        try:
+            page_texts = self.pdf_service.extract_region_text(pdf_path, template.name_crop_area)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read text layer, using AI vision for all pages: {e}")
+            return {}
         
-        # Save debug image
-        cropped_image_path = self._save_debug_image(cropped_image, "debug", page_num)
+        texts = {page_num: normalize_hebrew(raw_text) for page_num, raw_text in page_texts.items()}
+        texts = {page_num: text for page_num, text in texts.items() if is_usable_name(text)}
+        # Both reading directions of every page, scored in one pass
+        candidates = [(page_num, candidate) for page_num, text in texts.items()
+                      for candidate in (text, reverse_visual(text))]
+        matches = matcher.match_many([candidate for _, candidate in candidates])
+        names = {}
+        for (page_num, candidate), match in zip(candidates, matches):
+            if match.found and page_num not in names:
+                names[page_num] = candidate
         
-        # Extract name using AI vision
-        hebrew_name = self._extract_name_with_ai(cropped_image) # This is now a sync function
+        if names:
+            logger.info(f"📝 Text layer gave names for {len(names)} pages, skipping AI vision for them")
+        return names
+    
+    def _collect_batch_results(self, future, page_nums: List[int], matcher: RosterMatcher) -> List[Dict]:
+        """Turn a finished batch task into one preview result per page"""
+        try:
+            return self._build_page_results(future.result(), matcher)
         
-        return hebrew_name, cropped_image_path
+        except Exception as e:
+            logger.error(f"Error processing pages {page_nums}: {e}")
+            return [
+                {
+                    "page": page_num,
+                    "found_match": False,
+                    "source": "vision",
+                    "error": str(e)
+                }
+                for page_num in page_nums
+            ]
+    
+    def _build_page_results(self, entries: List[Tuple[int, str, Optional[str], str]],
+                            matcher: RosterMatcher) -> List[Dict]:
+        """Match extracted names against the roster, all in one scoring pass.
+
+        `entries` are (page_num, hebrew_name, cropped_image_path, source),
+        where source records which path read the name.
+        """
+        matches = matcher.match_many([hebrew_name for _, hebrew_name, _, _ in entries])
+        results = []
+        for (page_num, hebrew_name, cropped_image_path, source), match in zip(entries, matches):
+            if not hebrew_name:
+                results.append({
+                    "page": page_num,
+                    "found_match": False,
+                    "extracted_name": "N/A",
+                    "source": source,
+                    "error": "Could not extract name from page."
+                })
+                continue
+            
+            results.append({
+                "page": page_num,
+                "found_match": match.found,
+                "extracted_name": hebrew_name,
+                "employee_name": match.employee_name,
+                "employee_email": match.employee_email,
+                "match_score": match.score,
+                # Closest roster names, for picking by hand when the match is wrong or missing
+                "candidates": [{"employee_name": name, "score": score} for name, score in match.candidates],
+                "cropped_image_path": cropped_image_path,
+                "source": source
+            })
+        return results
+    
+    def roster_matcher(self, template: CompanyTemplate) -> RosterMatcher:
+        """The template roster's matcher, built on first use"""
+        return self.matchers.get(template.employee_emails)
     
-    def _crop_image(self, image: Image.Image, crop_area) -> Image.Image:
-        """Crop image to specified area"""
+    def render_dpi(self, template: CompanyTemplate) -> int:
+        """Resolution used to rasterize the template's name area"""
+        if template.render_dpi:
+            return template.render_dpi
+        return self.pdf_service.pick_render_dpi(template.name_crop_area, template.min_crop_height_px)
+            
+    def _iter_name_crops(self, pdf_path: PDFSource, template: CompanyTemplate,
+                         page_numbers: Optional[List[int]] = None) -> Iterator[Tuple[int, Image.Image]]:
+        """Yield (page_num, name area) for every page (or `page_numbers`) in order, falling back to full-page renders"""
+        crop_area = template.name_crop_area
+        dpi = self.render_dpi(template)
+        logger.info(f"🔍 Rendering name area at {dpi} DPI")
+        
+        rendered = set()
         try:
-            logger.info(f"🔍 Original image size: {image.size}")
-            logger.info(f"🔍 Crop coordinates: ({crop_area.x}, {crop_area.y}) to ({crop_area.x + crop_area.width}, {crop_area.y + crop_area.height})")
+            for page_num, cropped_image in self.pdf_service.iter_region(
+                pdf_path, crop_area, dpi=dpi, page_numbers=page_numbers
+            ):
+                rendered.add(page_num)
+                yield page_num, cropped_image
+        except Exception as e:
+            logger.warning(f"⚠️ Region rendering failed after {len(rendered)} pages, rendering full pages instead: {e}")
+            if page_numbers is None:
+                page_numbers = range(1, self.pdf_service.get_total_pages(pdf_path) + 1)
+            remaining = [page for page in page_numbers if page not in rendered]
+            for page_num, image in self.pdf_service.iter_pages(pdf_path, dpi=dpi, page_numbers=remaining):
+                yield page_num, self._crop_image(image, crop_area, dpi)
             
+    async def _process_page_batch(self, batch: List[Tuple[int, Image.Image]], template: CompanyTemplate,
+                                  matcher: RosterMatcher) -> List[Tuple[int, str, Optional[str], str]]:
+        """Process a batch of pages: save debug images and extract the names as cheaply as possible.
+
+        Crops seen before are answered from the name cache. The rest go to
+        the local OCR tier, and only crops it can't read confidently (or
+        whose name isn't on the roster) escalate to OpenRouter, in as few
+        requests as possible. Returns (page_num, hebrew_name,
+        cropped_image_path, source) per page, where source is "cache",
+        "ocr" or "vision".
+        """
+        results = []
+        misses = []
+        for page_num, cropped_image in batch:
+            cropped_image_path = self._save_debug_image(cropped_image, "debug", page_num)
+            key = self._cache_key(cropped_image)
+            hebrew_name = self.name_cache.get(key)
+            if hebrew_name is not None:
+                results.append((page_num, hebrew_name, cropped_image_path, "cache"))
+            else:
+                misses.append((page_num, cropped_image, cropped_image_path, key))
+        
+        if misses and self.local_backend:
+            local_names = await self._run_tier(self.local_backend, [image for _, image, _, _ in misses])
+            escalated = []
+            for miss, (hebrew_name, _), accepted in zip(misses, local_names, self._accept_local(local_names, template, matcher)):
+                if accepted:
+                    self.tier_stats[self.local_backend.name].accepted += 1
+                    results.append((miss[0], hebrew_name, miss[2], "ocr"))
+                else:
+                    escalated.append(miss)
+            misses = escalated
+        
+        if not misses:
+            return results
+        
+        remote_names = await self._run_tier(self.remote_backend, [image for _, image, _, _ in misses])
+        for (page_num, _, cropped_image_path, key), (hebrew_name, _) in zip(misses, remote_names):
+            if hebrew_name not in UNREADABLE_NAMES:
+                self.name_cache.put(key, hebrew_name)
+                self.tier_stats[self.remote_backend.name].accepted += 1
+            results.append((page_num, hebrew_name, cropped_image_path, "vision"))
+        return results
+    
+    async def _run_tier(self, backend: VisionBackend, images: List[Image.Image]) -> List[Tuple[str, float]]:
+        """Run one extraction tier over some crops, recording its page count and time"""
+        started = time.monotonic()
+        names = await backend.extract_names(images)
+        stats = self.tier_stats[backend.name]
+        stats.pages += len(images)
+        stats.seconds += time.monotonic() - started
+        return names
+    
+    def _accept_local(self, local_names: List[Tuple[str, float]], template: CompanyTemplate,
+                      matcher: RosterMatcher) -> List[bool]:
+        """A local OCR read stands if it is confident and, with a roster, matches someone on it"""
+        accepted = [
+            confidence >= template.ocr_confidence_threshold and is_usable_name(hebrew_name)
+            for hebrew_name, confidence in local_names
+        ]
+        if template.employee_emails:
+            matches = matcher.match_many([hebrew_name for hebrew_name, _ in local_names])
+            accepted = [ok and match.found for ok, match in zip(accepted, matches)]
+        return accepted
+    
+    def tier_report(self) -> Dict[str, Dict]:
+        """Per-tier counts and latencies since startup"""
+        return {name: stats.as_dict() for name, stats in self.tier_stats.items()}
+    
+    def _cache_key(self, image: Image.Image) -> str:
+        """Name cache key for a crop, from its pixels plus the model, prompt version and encoding"""
+        header = f"{image.mode}:{image.width}x{image.height}\n".encode()
+        return NameCache.make_key(header + image.tobytes(), self.model, f"{PROMPT_VERSION}:{self.encoding.name}")
+    
+    def _crop_image(self, image: Image.Image, crop_area: CropArea, dpi: int) -> Image.Image:
+        """Crop a page rendered at `dpi` to the specified area"""
+        try:
             # PIL crop expects (left, top, right, bottom)
-            crop_box = (
-                crop_area.x,
-                crop_area.y,
-                crop_area.x + crop_area.width,
-                crop_area.y + crop_area.height
-            )
+            crop_box = crop_area.to_pixels(dpi)
+            logger.info(f"🔍 Original image size: {image.size}")
+            logger.info(f"🔍 Crop coordinates: {crop_box[:2]} to {crop_box[2:]}")
             
             cropped = image.crop(crop_box)
-            logger.info(f"✂️ Cropped to {crop_area.width}x{crop_area.height}")
+            logger.info(f"✂️ Cropped to {cropped.width}x{cropped.height}")
             return cropped
             
         except Exception as e:
             logger.error(f"❌ Error cropping image: {e}")
             return image
     
-    def _find_best_match(self, text: str, employee_map: Dict[str, str]):
-        """Find the best match for the extracted text from the employee list."""
-        if not text:
-            return False, "No name provided", ""
-
-        # Use process.extractOne which is correct for this library version
-        result = process.extractOne(text, employee_map.keys(), scorer=fuzz.token_set_ratio)
-        
-        # Handle cases where no match is found
-        if not result:
-            return False, "No match found", ""
-        
-        best_match, score = result # Unpack the two values
-
-        if score >= 75: # Using a threshold to avoid incorrect matches
-            return True, best_match, employee_map[best_match]
-        
-        return False, "No match found", ""
-    
     def _save_debug_image(self, image: Image.Image, company_id: str, page_num: int):
         """Save debug image for inspection (development only)"""
         # Only save debug images in development mode
@@ -173,13 +580,11 @@ class AIVisionService:
             logger.error(f"❌ Error saving debug image: {e}")
             return None
     
-    def _extract_name_with_ai(self, image: Image.Image) -> str:
-        """Extract Hebrew name from image using AI Vision (sync version)"""
+    async def _extract_name_with_ai(self, image: Image.Image) -> str:
+        """Extract Hebrew name from image using AI Vision"""
         
-        # Convert image to base64
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        # Compress the crop with the configured encoding profile
+        image_url = to_data_url(image, self.encoding)
         
         prompt_text = "Please extract the full name from this payslip image. The name is in Hebrew. Return only the name, with no extra text or labels."
         
@@ -190,7 +595,7 @@ class AIVisionService:
                     "role": "user",
                     "content": [
                         {"type": "text", "text": prompt_text},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_str}"}}
+                        {"type": "image_url", "image_url": {"url": image_url}}
                     ],
                 }
             ],
@@ -199,15 +604,7 @@ class AIVisionService:
         }
         
         try:
-            # Use httpx.Client for sync request
-            with httpx.Client() as client:
-                response = client.post(
-                    f"{self.base_url}/chat/completions", # Use base_url from the service
-                    headers={"Authorization": f"Bearer {self.api_key}"},
-                    json=payload,
-                    timeout=30.0,
-                )
-                response.raise_for_status()
+            response = await self._post_completion(payload)
             
             ai_response = response.json()
             extracted_text = ai_response["choices"][0]["message"]["content"].strip()
@@ -222,9 +619,101 @@ class AIVisionService:
             logger.error(f"Error extracting name with AI: {str(e)}")
             return "שגיאה"
     
-    def _image_to_base64(self, image: Image.Image) -> str:
-        """Convert PIL Image to base64 string"""
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        return img_str 
\ No newline at end of file
+    async def _post_completion(self, payload: Dict, image_count: int = 1) -> httpx.Response:
+        """Send a chat completion, retrying transient failures and hedging slow calls.
+
+        Latencies are tracked per number of images in the request, since a
+        batch is expected to take longer than a single crop.
+        """
+        tracker = self.latencies.setdefault(image_count, LatencyTracker())
+        
+        async def attempt():
+            hedge_after = tracker.percentile(0.95) if self.hedging else None
+            return await self._send_completion(payload, tracker, hedge_after)
+        
+        return await self.retry_policy.run(attempt)
+    
+    async def _send_completion(self, payload: Dict, tracker: LatencyTracker,
+                               hedge_after: Optional[float] = None) -> httpx.Response:
+        """One chat completion through the shared client, within the adaptive concurrency limit.
+
+        The hedge clock only starts once the call holds a limiter slot - the
+        latencies it is compared with are measured from there too - so time
+        spent queueing behind the limit never fires a duplicate. A duplicate
+        takes a slot of its own and is only sent while one is free, so
+        hedging never runs more calls than the limit, and each copy feeds
+        its own outcome back into it.
+        """
+        # Reuses pooled keep-alive connections across pages and requests
+        if self.client is None:
+            await self.start()
+        
+        async def post(slot) -> httpx.Response:
+            response = await self.client.post("/chat/completions", json=payload)
+            slot.record(response)
+            return response
+        
+        async def duplicate() -> httpx.Response:
+            async with self.limiter.slot() as hedge_call:
+                return await post(hedge_call)
+        
+        async with self.limiter.slot() as call:
+            response = await hedged(lambda: post(call), hedge_after, duplicate, self.limiter.has_capacity)
+        
+        response.raise_for_status()
+        tracker.record(time.monotonic() - call.started)
+        return response
+    
+    async def _extract_names_batch(self, images: List[Image.Image]) -> List[str]:
+        """Extract the Hebrew names from several crops in one request.
+
+        Each crop is sent as its own numbered image part and the model answers
+        with a JSON array keyed by slot. Raises ValueError when the answer
+        can't be parsed, so the caller can fall back to single-crop requests.
+        """
+        prompt_text = (
+            f"Below are {len(images)} crops from payslips, numbered 1 to {len(images)}. "
+            "Each shows one person's full name in Hebrew. "
+            'Reply with only a JSON array, one object per crop: [{"slot": 1, "name": "..."}, ...]. '
+            'Use an empty name when a crop has no readable name.'
+        )
+        
+        content = [{"type": "text", "text": prompt_text}]
+        for slot, image in enumerate(images, start=1):
+            content.append({"type": "text", "text": f"Crop {slot}:"})
+            content.append({"type": "image_url", "image_url": {"url": to_data_url(image, self.encoding)}})
+        
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": 40 * len(images) + 40,
+            "temperature": 0.1,
+        }
+        
+        response = await self._post_completion(payload, len(images))
+        
+        try:
+            answer = response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"Unexpected batch response: {response.text[:200]!r}") from e
+        names = self._parse_batch_names(answer, len(images))
+        logger.info(f"🧠 AI Vision extracted {len(images)} names in one request: {names}")
+        return [name if name else "לא זוהה" for name in names]
+    
+    def _parse_batch_names(self, answer: str, count: int) -> List[str]:
+        """Read names by slot from the model's JSON answer (tolerating a code fence around it)"""
+        answer = answer.strip()
+        if answer.startswith("```"):
+            answer = answer.strip("`").strip()
+            if answer.startswith("json"):
+                answer = answer[len("json"):]
+        
+        try:
+            entries = json.loads(answer)
+            names = {int(entry["slot"]): str(entry.get("name") or "").strip() for entry in entries}
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            raise ValueError(f"Unparseable batch answer: {answer[:200]!r}") from e
+        
+        if sorted(names) != list(range(1, count + 1)):
+            raise ValueError(f"Batch answer has slots {sorted(names)}, expected 1-{count}")
+        return [names[slot] for slot in range(1, count + 1)] 
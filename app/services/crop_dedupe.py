@@ -0,0 +1,87 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageChops
+
+from services.crop_encoding import INK_THRESHOLD, trim_to_ink
+
+logger = logging.getLogger(__name__)
+
+# dHash grid - 16x16 gives 256 bits, enough to tell most names apart
+HASH_SIZE = 16
+# Height the ink is compared at once two hashes match
+COMPARE_HEIGHT = 32
+# Largest share of ink pixels that may differ between two crops of "the same" name.
+# Names one letter apart measure around 0.06, so stay well under that.
+MAX_INK_DIFFERENCE = 0.03
+
+def dhash(image: Image.Image, size: int = HASH_SIZE) -> int:
+    """Difference hash of a crop's ink, so the same name shifted inside the crop hashes the same"""
+    gray = trim_to_ink(image if image.mode == "L" else image.convert("L"))
+    pixels = list(gray.resize((size + 1, size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            value = (value << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return value
+
+def ink_mask(image: Image.Image, height: int = COMPARE_HEIGHT) -> Image.Image:
+    """The crop's trimmed ink as a small black/white mask (ink is white)"""
+    gray = trim_to_ink(image if image.mode == "L" else image.convert("L"))
+    width = max(1, round(gray.width * height / gray.height))
+    return gray.resize((width, height), Image.BILINEAR).point(lambda value: 255 if value < INK_THRESHOLD else 0)
+
+def ink_difference(first: Image.Image, second: Image.Image) -> float:
+    """Share of ink pixels that differ between two masks from `ink_mask` (1.0 if their shapes disagree)"""
+    if abs(first.width - second.width) > 0.1 * first.width:
+        return 1.0
+    if second.size != first.size:
+        second = second.resize(first.size, Image.NEAREST)
+    mismatched = ImageChops.difference(first, second).histogram()[255]
+    ink = first.histogram()[255] + second.histogram()[255]
+    return 2 * mismatched / ink if ink else 0.0
+
+@dataclass
+class _Representative:
+    page: int
+    hash: int
+    mask: Image.Image
+
+class CropClusters:
+    """Groups a document's name crops so only one per group goes to the AI.
+
+    A crop joins an earlier crop's cluster when its pixels are identical,
+    or when their ink hashes are within `max_distance` bits and the ink
+    itself matches closely. The distance defaults to 0: names a letter
+    apart are only a bit or two apart in hash space, and a false merge
+    would send someone else's payslip.
+    """
+
+    def __init__(self, max_distance: int = 0):
+        self.max_distance = max_distance
+        self.exact: Dict[str, int] = {}
+        self.representatives: List[_Representative] = []
+        self.duplicates = 0
+
+    def assign(self, page: int, image: Image.Image) -> Optional[int]:
+        """The page whose crop `image` duplicates, or None if it starts a new cluster"""
+        digest = hashlib.blake2b(f"{image.mode}:{image.size}".encode() + image.tobytes(), digest_size=16).hexdigest()
+        if digest in self.exact:
+            self.duplicates += 1
+            return self.exact[digest]
+
+        crop_hash = dhash(image)
+        mask = ink_mask(image)
+        for representative in self.representatives:
+            if (bin(crop_hash ^ representative.hash).count("1") <= self.max_distance
+                    and ink_difference(representative.mask, mask) <= MAX_INK_DIFFERENCE):
+                self.exact[digest] = representative.page
+                self.duplicates += 1
+                return representative.page
+
+        self.exact[digest] = page
+        self.representatives.append(_Representative(page, crop_hash, mask))
+        return None
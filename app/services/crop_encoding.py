@@ -0,0 +1,93 @@
+import os
+import base64
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Pixels darker than this count as ink when trimming
+INK_THRESHOLD = 160
+# White margin kept around the ink after trimming
+TRIM_PADDING_PX = 4
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """How a name crop is prepared and compressed before it is sent to the model"""
+    name: str
+    grayscale: bool = False
+    trim: bool = False
+    target_height: Optional[int] = None  # Downscale (never upscale) to this height
+    format: str = "PNG"  # PNG, WEBP or JPEG
+    quality: int = 80  # Lossy formats only
+
+PROFILES: Dict[str, EncodingProfile] = {
+    # Full-color lossless crop, as rendered
+    "png": EncodingProfile("png"),
+    # Grayscale, trimmed, still lossless
+    "gray": EncodingProfile("gray", grayscale=True, trim=True, target_height=64),
+    # Grayscale, trimmed and downscaled lossy WebP - smallest payload
+    "compact": EncodingProfile("compact", grayscale=True, trim=True, target_height=48, format="WEBP", quality=70),
+    # Same as compact for models or proxies that reject WebP
+    "jpeg": EncodingProfile("jpeg", grayscale=True, trim=True, target_height=48, format="JPEG", quality=75),
+}
+
+MIME_TYPES = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
+
+def get_profile(name: str = None) -> EncodingProfile:
+    """Look up an encoding profile by name (VISION_ENCODING by default)"""
+    name = (name or os.getenv("VISION_ENCODING", "png")).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown vision encoding '{name}' (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+def trim_to_ink(image: Image.Image) -> Image.Image:
+    """Crop away the blank margin around the text, keeping a little padding"""
+    gray = image if image.mode == "L" else image.convert("L")
+    # Ink becomes white on black so getbbox() finds it
+    ink = gray.point(lambda value: 255 if value < INK_THRESHOLD else 0)
+    bbox = ink.getbbox()
+    if not bbox:
+        return image
+
+    left, top, right, bottom = bbox
+    return image.crop((
+        max(0, left - TRIM_PADDING_PX),
+        max(0, top - TRIM_PADDING_PX),
+        min(image.width, right + TRIM_PADDING_PX),
+        min(image.height, bottom + TRIM_PADDING_PX),
+    ))
+
+def prepare_crop(image: Image.Image, profile: EncodingProfile) -> Image.Image:
+    """Apply the profile's grayscale, trim and downscale steps"""
+    if profile.grayscale and image.mode != "L":
+        image = ImageOps.grayscale(image)
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    if profile.trim:
+        image = trim_to_ink(image)
+
+    if profile.target_height and image.height > profile.target_height:
+        width = max(1, round(image.width * profile.target_height / image.height))
+        image = image.resize((width, profile.target_height), Image.LANCZOS)
+
+    return image
+
+def encode_crop(image: Image.Image, profile: EncodingProfile) -> Tuple[bytes, str]:
+    """Prepare and compress a crop, returning (bytes, mime type)"""
+    image = prepare_crop(image, profile)
+    buffer = BytesIO()
+    if profile.format == "PNG":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image.save(buffer, format=profile.format, quality=profile.quality)
+    return buffer.getvalue(), MIME_TYPES[profile.format]
+
+def to_data_url(image: Image.Image, profile: EncodingProfile) -> str:
+    """Encode a crop as a data: URL for an image_url message part"""
+    data, mime_type = encode_crop(image, profile)
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
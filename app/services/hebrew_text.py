@@ -0,0 +1,81 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Direction marks and embedding controls some PDF producers put around RTL runs
+BIDI_CONTROLS = re.compile("[\u200e\u200f\u202a-\u202e\u2066-\u2069]")
+HEBREW_LETTER = re.compile("[\u05d0-\u05ea]")
+
+# Final letter forms only ever end a word, their regular forms rarely do
+FINAL_LETTERS = set("ךםןףץ")
+NON_FINAL_LETTERS = set("כמנפצ")
+FINAL_TO_REGULAR = str.maketrans("ךםןףץ", "כמנפצ")
+
+# Vowel points and cantillation marks (the maqaf hyphen U+05BE sits in this range too)
+NIQQUD = re.compile("[\u0591-\u05c7]")
+MAQAF = "\u05be"
+# Geresh and gershayim, in Hebrew and the ASCII quotes typed in their place
+GERESH = re.compile("[\u05f3\u05f4'\"`]")
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def _looks_reversed(words) -> bool:
+    """Guess whether Hebrew words came out in visual (left-to-right) order.
+
+    Each word votes by where its final/non-final letter forms sit: a final
+    form at the start of a word, or a regular form at the end, means the
+    characters are reversed.
+    """
+    votes = 0
+    for word in words:
+        letters = HEBREW_LETTER.findall(word)
+        if len(letters) < 2:
+            continue
+        first, last = letters[0], letters[-1]
+        if first in FINAL_LETTERS or last in NON_FINAL_LETTERS:
+            votes += 1
+        if last in FINAL_LETTERS or first in NON_FINAL_LETTERS:
+            votes -= 1
+    return votes > 0
+
+
+def normalize_hebrew(text: str) -> str:
+    """Clean text-layer output into a logical-order, single-line string"""
+    if not text:
+        return ""
+
+    text = BIDI_CONTROLS.sub("", text)
+    words = text.split()
+
+    if _looks_reversed(words):
+        logger.info("🔄 Hebrew text is in visual order, reversing")
+        return reverse_visual(" ".join(words))
+
+    return " ".join(words)
+
+
+def reverse_visual(text: str) -> str:
+    """Flip a visual-order line into logical order (or back)"""
+    return " ".join(word[::-1] for word in reversed(text.split()))
+
+
+def normalize_name(text: str) -> str:
+    """Fold a name to the form names are compared in.
+
+    Drops niqqud, geresh/gershayim and punctuation, turns final letters
+    into their regular forms and lowercases Latin letters, so that
+    "גִ'ורְג' כֹּהֵן" and "גורג כהנ" compare equal. Reading direction is
+    left alone - run `normalize_hebrew` first for text that may be reversed.
+    """
+    if not text:
+        return ""
+    text = BIDI_CONTROLS.sub("", text).replace(MAQAF, " ")
+    text = GERESH.sub("", NIQQUD.sub("", text))
+    text = text.translate(FINAL_TO_REGULAR).lower()
+    return " ".join(NON_WORD.sub(" ", text).split())
+
+
+def is_usable_name(text: str) -> bool:
+    """Text is worth matching if it holds at least a couple of letters"""
+    return sum(1 for char in text if char.isalpha()) >= 2
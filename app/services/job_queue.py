@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states, in order
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class JobQueue:
+    """Preview jobs in a local SQLite database shared by every worker process.
+
+    Jobs are claimed inside an IMMEDIATE transaction, so two workers never
+    take the same one and at most `max_running` run at once across the whole
+    server. A running job whose heartbeat goes quiet for `stale_seconds`
+    (its worker died) is handed to the next worker that asks, up to
+    `max_attempts` runs in total. Writes for a job carry the attempt it was
+    claimed with, so a worker that lost its job can't overwrite the retry.
+    """
+
+    def __init__(self, db_path: str, max_running: int = 2, stale_seconds: float = 300,
+                 retention_seconds: float = 24 * 3600, max_attempts: int = 3):
+        self.db_path = db_path
+        self.max_running = max_running
+        self.stale_seconds = stale_seconds
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    pages_total INTEGER NOT NULL DEFAULT 0,
+                    pages_done INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @classmethod
+    def from_env(cls, default_dir: str) -> "JobQueue":
+        """Build the queue from JOB_* settings (database under `default_dir` unless JOB_DB_PATH is set)"""
+        return cls(
+            db_path=os.getenv("JOB_DB_PATH") or os.path.join(default_dir, "jobs.sqlite3"),
+            max_running=int(os.getenv("JOB_MAX_RUNNING", "2")),
+            stale_seconds=float(os.getenv("JOB_STALE_SECONDS", "300")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            retention_seconds=float(os.getenv("JOB_RETENTION_HOURS", "24")) * 3600,
+        )
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode - transactions are opened explicitly where they matter
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def enqueue(self, kind: str, owner: str, payload: Dict, pages_total: int = 0,
+                job_id: Optional[str] = None) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, owner, payload, status, pages_total, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, owner, json.dumps(payload, ensure_ascii=False), QUEUED, pages_total, time.time()),
+            )
+        logger.info(f"📥 Queued {kind} job {job_id} ({pages_total} pages)")
+        return job_id
+
+    def claim(self) -> Optional[Dict]:
+        """Take the oldest queued (or abandoned) job, unless the running limit is reached"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                stale_before = now - self.stale_seconds
+                # Abandoned too many times - most likely the job itself kills its worker
+                given_up = db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                    (FAILED, f"Gave up after {self.max_attempts} attempts", now,
+                     RUNNING, stale_before, self.max_attempts),
+                ).rowcount
+                running = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND heartbeat_at >= ?", (RUNNING, stale_before)
+                ).fetchone()[0]
+                row = None
+                if running < self.max_running:
+                    row = db.execute(
+                        "SELECT * FROM jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) "
+                        "ORDER BY created_at LIMIT 1",
+                        (QUEUED, RUNNING, stale_before),
+                    ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, pages_done = 0, "
+                        "attempts = attempts + 1 WHERE id = ?",
+                        (RUNNING, now, now, row["id"]),
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+        if given_up:
+            logger.warning(f"⚠️ Gave up on {given_up} abandoned jobs after {self.max_attempts} attempts")
+        if row is None:
+            return None
+        job = self._to_dict(row)
+        job.update(status=RUNNING, started_at=now, pages_done=0, attempts=row["attempts"] + 1)
+        return job
+
+    def update_progress(self, job_id: str, attempt: int, pages_done: int) -> bool:
+        """Record progress and the job's heartbeat; False if this attempt no longer owns the job"""
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET pages_done = ?, heartbeat_at = ? WHERE id = ? AND attempts = ? AND status = ?",
+                (pages_done, time.time(), job_id, attempt, RUNNING),
+            ).rowcount > 0
+
+    def finish(self, job_id: str, attempt: int, pages_done: int) -> bool:
+        return self._close(job_id, attempt, DONE, pages_done, None)
+
+    def fail(self, job_id: str, attempt: int, error: str) -> bool:
+        return self._close(job_id, attempt, FAILED, None, error)
+
+    def _close(self, job_id: str, attempt: int, status: str, pages_done: Optional[int],
+               error: Optional[str]) -> bool:
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET status = ?, pages_done = COALESCE(?, pages_done), error = ?, finished_at = ? "
+                "WHERE id = ? AND attempts = ? AND status = ?",
+                (status, pages_done, error, time.time(), job_id, attempt, RUNNING),
+            ).rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def purge(self) -> List[str]:
+        """Forget finished jobs past the retention period, returning their ids"""
+        cutoff = time.time() - self.retention_seconds
+        with self._connect() as db:
+            ids = [row["id"] for row in db.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)
+            )]
+            db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+        return ids
+
+    def stats(self) -> Dict:
+        with self._connect() as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+def job_status(job: Dict) -> Dict:
+    """Public view of a job: progress, elapsed time and a naive ETA from the page rate so far"""
+    now = time.time()
+    status = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "pages_total": job["pages_total"],
+        "pages_done": job["pages_done"],
+        "elapsed_seconds": None,
+        "eta_seconds": None,
+    }
+    if job["started_at"]:
+        elapsed = (job["finished_at"] or now) - job["started_at"]
+        status["elapsed_seconds"] = round(elapsed, 1)
+        remaining = job["pages_total"] - job["pages_done"]
+        if job["status"] == RUNNING and job["pages_done"] and remaining > 0:
+            status["eta_seconds"] = round(elapsed / job["pages_done"] * remaining, 1)
+    if job["error"]:
+        status["error"] = job["error"]
+    return status
+
+JobHandler = Callable[[Dict, Callable[[int], None]], Awaitable[int]]
+
+class JobWorkerPool:
+    """Async workers in this process that pull jobs from the queue and run them.
+
+    A handler receives the job and a `progress(pages_done)` callback and
+    returns the number of pages it processed. The callback only notes the
+    count; a timer writes it together with the heartbeat every
+    `progress_interval` seconds, off the event loop, so a job stuck on a
+    slow page still shows as alive and isn't claimed a second time.
+    """
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler], workers: int = 1,
+                 poll_interval: float = 1.0, progress_interval: float = 1.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.tasks = []
+
+    async def start(self):
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(self._work(number)) for number in range(self.workers)]
+        logger.info(f"👷 Started {self.workers} job workers (max {self.queue.max_running} running server-wide)")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _work(self, number: int):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Job worker {number} could not claim a job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.run_job(job)
+
+    async def run_job(self, job: Dict):
+        job_id, attempt = job["id"], job["attempts"]
+        logger.info(f"🏗️ Running {job['kind']} job {job_id} (attempt {attempt})")
+        pages_done = 0
+
+        def progress(count: int):
+            nonlocal pages_done
+            pages_done = count
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                try:
+                    alive = await asyncio.to_thread(self.queue.update_progress, job_id, attempt, pages_done)
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️ Could not record progress for job {job_id}: {e}")
+                    continue
+                if not alive:
+                    logger.warning(f"⚠️ Job {job_id} attempt {attempt} was taken over by another worker")
+                    return
+
+        beat = asyncio.create_task(heartbeat())
+        try:
+            pages_done = await self.handlers[job["kind"]](job, progress)
+        except asyncio.CancelledError:
+            # Shutting down - leave it running; the heartbeat goes stale and another worker retries it
+            raise
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} failed: {e}", exc_info=True)
+            await asyncio.to_thread(self.queue.fail, job_id, attempt, str(e))
+            return
+        finally:
+            beat.cancel()
+            await asyncio.gather(beat, return_exceptions=True)
+        if await asyncio.to_thread(self.queue.finish, job_id, attempt, pages_done):
+            logger.info(f"✅ Job {job_id} done ({pages_done} pages)")
+        else:
+            logger.warning(f"⚠️ Job {job_id} attempt {attempt} finished after another worker took it over")
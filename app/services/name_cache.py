@@ -0,0 +1,157 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class NameCache:
+    """Names already extracted from crops, keyed by a hash of the crop's raw pixels.
+
+    The key also covers the model, the prompt version and the upload
+    encoding profile (see AIVisionService._cache_key), so changing any of
+    them never reuses an old answer.
+
+    Lookups hit an in-memory LRU first and then, when a directory is
+    configured, an on-disk tier that survives restarts. Disk entries expire
+    after `ttl_seconds` and the oldest are evicted once the tier grows past
+    `max_disk_bytes`. The memory tier is guarded by a lock, so the cache
+    can be shared with worker threads.
+    """
+
+    # Run the disk eviction pass once every this many writes
+    EVICT_EVERY = 64
+
+    def __init__(self, max_entries: int = 10000, disk_dir: Optional[str] = None,
+                 ttl_seconds: float = 30 * 24 * 3600, max_disk_bytes: int = 50 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self.memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._writes = 0
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._evict_disk()
+            logger.info(f"🗄️ Name cache on disk at {self.disk_dir}")
+
+    @classmethod
+    def from_env(cls) -> "NameCache":
+        """Build the cache from NAME_CACHE_* settings (disk tier off unless NAME_CACHE_DIR is set)"""
+        return cls(
+            max_entries=int(os.getenv("NAME_CACHE_SIZE", "10000")),
+            disk_dir=os.getenv("NAME_CACHE_DIR") or None,
+            ttl_seconds=float(os.getenv("NAME_CACHE_TTL_HOURS", "720")) * 3600,
+            max_disk_bytes=int(os.getenv("NAME_CACHE_MAX_MB", "50")) * 1024 * 1024,
+        )
+
+    @staticmethod
+    def make_key(image_bytes: bytes, model: str, prompt_version: str) -> str:
+        """Cache key for a crop's pixel data - a new model or prompt never reuses old answers"""
+        digest = hashlib.sha256()
+        digest.update(f"{model}\n{prompt_version}\n".encode())
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            name = self.memory.get(key)
+            if name is not None:
+                self.memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return name
+
+        name = self._read_disk(key)
+        if name is not None:
+            self._remember(key, name)
+        with self._lock:
+            if name is not None:
+                self.hits["disk"] += 1
+            else:
+                self.misses += 1
+        return name
+
+    def put(self, key: str, name: str):
+        self._remember(key, name)
+        if self.disk_dir:
+            self._write_disk(key, name)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters since startup"""
+        hits = self.hits["memory"] + self.hits["disk"]
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.hits["memory"],
+            "disk_hits": self.hits["disk"],
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self.memory),
+            "disk": bool(self.disk_dir),
+        }
+
+    def _remember(self, key: str, name: str):
+        with self._lock:
+            self.memory[key] = name
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.txt"
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, name: str):
+        path = self._disk_path(key)
+        try:
+            # Write-then-rename so readers in other workers never see half a file
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            temp_path.write_text(name, encoding="utf-8")
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write name cache entry: {e}")
+            return
+
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Drop expired entries, then the oldest ones until the tier fits `max_disk_bytes`"""
+        now = time.time()
+        entries = []
+        for path in self.disk_dir.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
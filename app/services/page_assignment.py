@@ -0,0 +1,145 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.roster_matcher import RosterMatcher
+
+logger = logging.getLogger(__name__)
+
+# An assigned score this close to the page's next-best employee is flagged for review
+AMBIGUOUS_MARGIN = 3.0
+# Cost of a page-employee pair that may not be assigned (below the match threshold)
+FORBIDDEN = 1e9
+
+def solve_assignment(cost: np.ndarray) -> np.ndarray:
+    """Minimum-cost assignment of every row to a distinct column (rows <= columns).
+
+    The Hungarian method with potentials (shortest augmenting paths),
+    O(rows^2 * columns) with the inner loop over columns vectorized.
+    Returns the column chosen for each row.
+    """
+    rows, cols = cost.shape
+    if rows > cols:
+        raise ValueError(f"Need at least as many columns as rows, got {rows}x{cols}")
+
+    # 1-based like the textbook algorithm; index 0 is the virtual start column
+    u = np.zeros(rows + 1)
+    v = np.zeros(cols + 1)
+    owner = np.zeros(cols + 1, dtype=np.int64)  # Row holding each column, 0 if free
+    way = np.zeros(cols + 1, dtype=np.int64)
+
+    for row in range(1, rows + 1):
+        owner[0] = row
+        column = 0
+        min_slack = np.full(cols + 1, np.inf)
+        used = np.zeros(cols + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = owner[column]
+            free = ~used[1:]
+            slack = cost[current - 1] - u[current] - v[1:]
+            better = free & (slack < min_slack[1:])
+            min_slack[1:][better] = slack[better]
+            way[1:][better] = column
+
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_slack[1:][free] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+
+        # Flip the augmenting path
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+
+    assignment = np.empty(rows, dtype=np.int64)
+    for column in range(1, cols + 1):
+        if owner[column]:
+            assignment[owner[column] - 1] = column - 1
+    return assignment
+
+def assign_pages(results: List[Dict], matcher: RosterMatcher, max_pages_per_employee: int = 1) -> List[Dict]:
+    """Re-decide page matches for the whole document at once.
+
+    Builds the page x employee score matrix over every employee some page
+    could match, and picks the assignment with the highest total score in
+    which no employee gets more than `max_pages_per_employee` pages. Pages
+    copied from a duplicate crop (`duplicate_of`) follow their original.
+    Each result gets an `assignment` flag: "ok", "reassigned" (its own
+    best match went to a better-scoring page), "unassigned" (it lost its
+    match and has no other) or "ambiguous" (a close runner-up exists).
+    """
+    pages = [r for r in results if r.get("extracted_name") and not r.get("duplicate_of") and r.get("candidates")]
+    employees = sorted({name for r in pages for name, score in _candidates(r) if score >= matcher.threshold})
+    if not pages or not employees:
+        return results
+
+    scores = matcher.score_matrix([r["extracted_name"] for r in pages], employees)
+    weights = np.where(scores >= matcher.threshold, scores, -FORBIDDEN)
+
+    # One column per employee page slot, plus a "no match" column per page
+    slots = np.repeat(np.arange(len(employees)), max_pages_per_employee)
+    cost = np.hstack([-weights[:, slots], np.zeros((len(pages), len(pages)))])
+    chosen = solve_assignment(cost)
+
+    assigned: Dict[int, Optional[str]] = {}
+    for row, column in enumerate(chosen):
+        if column < len(slots) and weights[row, slots[column]] > 0:
+            assigned[pages[row]["page"]] = employees[slots[column]]
+        else:
+            assigned[pages[row]["page"]] = None
+
+    # Pages that wanted the same employee, for pointing the admin at the conflict
+    wanted: Dict[str, List[int]] = {}
+    for result in pages:
+        if result.get("found_match"):
+            wanted.setdefault(result["employee_name"], []).append(result["page"])
+
+    by_page = {result["page"]: result for result in results}
+    for row, result in enumerate(pages):
+        _apply(result, assigned[result["page"]], scores[row], employees, matcher, wanted)
+    for result in results:
+        original = by_page.get(result.get("duplicate_of"))
+        if original and "assignment" in original:
+            for key in ("found_match", "employee_name", "employee_email", "match_score", "assignment", "conflict_pages"):
+                if key in original:
+                    result[key] = original[key]
+
+    flagged = sum(1 for result in results if result.get("assignment", "ok") != "ok")
+    logger.info(f"🧩 Assigned {len(pages)} pages to {len(employees)} candidate employees, {flagged} flagged for review")
+    return results
+
+def _candidates(result: Dict):
+    return [(candidate["employee_name"], candidate["score"]) for candidate in result.get("candidates", [])]
+
+def _apply(result: Dict, employee: Optional[str], row_scores: np.ndarray, employees: List[str],
+           matcher: RosterMatcher, wanted: Dict[str, List[int]]):
+    """Write one page's assignment back into its preview result"""
+    previous = result["employee_name"] if result.get("found_match") else None
+    conflicts = [page for page in wanted.get(previous, []) if page != result["page"]]
+
+    if employee is None:
+        result.update(found_match=False, employee_name="No match found", employee_email="")
+        result["assignment"] = "unassigned" if previous else "ok"
+    else:
+        score = float(row_scores[employees.index(employee)])
+        runner_up = max((float(s) for name, s in zip(employees, row_scores) if name != employee), default=0.0)
+        result.update(found_match=True, employee_name=employee,
+                      employee_email=matcher.employee_map[employee], match_score=score)
+        if previous and employee != previous:
+            result["assignment"] = "reassigned"
+        elif score - runner_up < AMBIGUOUS_MARGIN:
+            result["assignment"] = "ambiguous"
+        else:
+            result["assignment"] = "ok"
+
+    if result["assignment"] != "ok" and conflicts:
+        result["conflict_pages"] = conflicts
@@ -0,0 +1,52 @@
+import os
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from services.crop_encoding import INK_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class InkStats:
+    coverage: float  # Share of pixels dark enough to be ink, 0-1
+    stddev: float  # Grayscale standard deviation, 0-255
+
+def ink_stats(image: Image.Image) -> InkStats:
+    """Ink coverage and contrast of a crop, computed over the whole bitmap at once"""
+    pixels = np.asarray(image if image.mode == "L" else image.convert("L"), dtype=np.float32)
+    if pixels.size == 0:
+        return InkStats(0.0, 0.0)
+    return InkStats(float((pixels < INK_THRESHOLD).mean()), float(pixels.std()))
+
+class BlankPageFilter:
+    """Spots name crops with nothing to read (separator pages, blank duplex backs) before any AI call.
+
+    A crop is blank when less than `min_ink` of it is ink or its contrast
+    is below `min_stddev` - a one-word name in a wide box still clears
+    both defaults comfortably, scanner speckle does not.
+    """
+
+    def __init__(self, min_ink: float = 0.002, min_stddev: float = 6.0):
+        self.min_ink = min_ink
+        self.min_stddev = min_stddev
+
+    @classmethod
+    def from_env(cls) -> Optional["BlankPageFilter"]:
+        """Build the filter from BLANK_PAGE_* settings, or None when BLANK_PAGE_FILTER is off"""
+        if os.getenv("BLANK_PAGE_FILTER", "true").lower() != "true":
+            return None
+        return cls(
+            min_ink=float(os.getenv("BLANK_PAGE_MIN_INK_PERCENT", "0.2")) / 100,
+            min_stddev=float(os.getenv("BLANK_PAGE_MIN_STDDEV", "6")),
+        )
+
+    def skip_reason(self, image: Image.Image) -> Optional[str]:
+        """"blank" if the crop should not be sent anywhere, else None"""
+        stats = ink_stats(image)
+        if stats.coverage < self.min_ink or stats.stddev < self.min_stddev:
+            return "blank"
+        return None
@@ -1,26 +1,378 @@
+import os
+import math
 import logging
-from typing import List
+import tempfile
+import shutil
+import subprocess
+import multiprocessing
+from abc import ABC, abstractmethod
+from io import BytesIO
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from PIL import Image
-from pypdf import PdfReader, PdfWriter
+from pypdf import PasswordType, PdfReader, PdfWriter
+from pypdf.errors import PdfReadError
+from pypdf.generic import RectangleObject
 from pdf2image import convert_from_path
 
 logger = logging.getLogger(__name__)
 
+# PDF user space is measured in points (1/72 inch)
+POINTS_PER_INCH = 72.0
+# Lowest resolution the adaptive render picks
+MIN_RENDER_DPI = 100
+
+# Rendering engine: "poppler" (pdftoppm subprocess) or "pdfium" (in-process)
+PDF_RENDERER = os.getenv("PDF_RENDERER", "poppler")
+
+# Rasterization process pool (0 processes disables it)
+RENDER_PROCESSES = int(os.getenv("RENDER_PROCESSES", os.cpu_count() or 1))
+# Documents shorter than this are rendered in-process
+RENDER_POOL_MIN_PAGES = int(os.getenv("RENDER_POOL_MIN_PAGES", "16"))
+# Pages per poppler call when rendering in the pool
+RENDER_POOL_CHUNK_PAGES = int(os.getenv("RENDER_POOL_CHUNK_PAGES", "8"))
+
+# Output modes: full color, 8-bit grayscale or 1-bit black and white
+COLOR_MODES = ("RGB", "L", "1")
+
+# Wherever a `pdf_path` is taken, an open binary stream (such as an upload's
+# spooled buffer) works as well
+PDFSource = Union[str, BinaryIO]
+
+@contextmanager
+def open_pdf(source: PDFSource) -> Iterator[BinaryIO]:
+    """Open a PDF path for reading, or rewind a stream (which is left open)"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+@contextmanager
+def source_path(source: PDFSource) -> Iterator[str]:
+    """A filesystem path for `source`, for tools that can't read streams.
+
+    Streams are copied to a temporary file for the duration of the block.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as temp_pdf:
+        source.seek(0)
+        shutil.copyfileobj(source, temp_pdf)
+        temp_pdf.flush()
+        yield temp_pdf.name
+
+@dataclass
+class PageInfo:
+    """Geometry of a single page as displayed (rotation applied), in points"""
+    number: int
+    width: float
+    height: float
+    rotation: int
+    has_text: bool
+
+@dataclass
+class PDFInfo:
+    """What a PDF costs to process, read without rendering anything"""
+    page_count: int
+    encrypted: bool
+    # Encrypted with a user password we don't have - pages can't be read
+    needs_password: bool = False
+    pages: List[PageInfo] = field(default_factory=list)
+
+    @property
+    def has_text_layer(self) -> bool:
+        return any(page.has_text for page in self.pages)
+
+    def render_megapixels(self, dpi: int, crop_area=None) -> float:
+        """Estimated pixels (in millions) to rasterize every page, or only `crop_area` of each"""
+        scale = (dpi / POINTS_PER_INCH) ** 2
+        if crop_area is not None:
+            return len(self.pages) * crop_area.width * crop_area.height * scale / 1e6
+        return sum(page.width * page.height for page in self.pages) * scale / 1e6
+
+def region_to_user_space(page_box, rotation: int, crop_area) -> Tuple[float, float, float, float]:
+    """Map a rectangle on the displayed page to (left, bottom, right, top) in PDF user space.
+
+    Crop areas have their origin at the top-left of the displayed
+    (rotated) page, while PDF user space starts at the bottom-left of
+    the unrotated page, so the rectangle is mapped corner by corner.
+    """
+    left, bottom, right, top = (float(v) for v in page_box)
+    rotation = rotation % 360
+
+    def to_user_space(dx: float, dy: float):
+        if rotation == 90:
+            return left + dy, bottom + dx
+        if rotation == 180:
+            return right - dx, bottom + dy
+        if rotation == 270:
+            return right - dy, top - dx
+        return left + dx, top - dy
+
+    x1, y1 = to_user_space(crop_area.x, crop_area.y)
+    x2, y2 = to_user_space(crop_area.x + crop_area.width, crop_area.y + crop_area.height)
+
+    # Keep the window inside the page
+    return (
+        max(left, min(x1, x2)),
+        max(bottom, min(y1, y2)),
+        min(right, max(x1, x2)),
+        min(top, max(y1, y2)),
+    )
+
+def region_to_cropbox(page, crop_area) -> RectangleObject:
+    """Map a rectangle on the displayed page to a crop box for a pypdf page"""
+    return RectangleObject(region_to_user_space(page.cropbox, page.rotation, crop_area))
+
+def page_ranges(page_numbers: Iterable[int], max_pages: int) -> List[Tuple[int, int]]:
+    """Group sorted page numbers into consecutive (first, last) runs of at most `max_pages`"""
+    ranges = []
+    for page_number in page_numbers:
+        if ranges and page_number == ranges[-1][1] + 1 and page_number - ranges[-1][0] < max_pages:
+            ranges[-1] = (ranges[-1][0], page_number)
+        else:
+            ranges.append((page_number, page_number))
+    return ranges
+
+class PageRenderer(ABC):
+    """Rasterizes PDF pages - one subclass per rendering engine.
+
+    Pages are always rendered as displayed by a viewer (crop box, rotation
+    applied), so crop areas mean the same thing for every engine. Engines
+    must implement `render_range` and `extract_region_text`.
+    """
+    name = ""
+
+    def prepare_region(self, pdf_path: PDFSource, crop_area, work_dir: str) -> Tuple[str, Optional[object]]:
+        """Prepare to render only `crop_area` of every page.
+
+        Returns the PDF to render and the crop area to pass to `render_range`
+        (None when the returned PDF already contains just the region).
+        """
+        return pdf_path, crop_area
+
+    @abstractmethod
+    def render_range(self, pdf_path: PDFSource, dpi: int, first_page: int, last_page: int,
+                     crop_area=None, mode: str = "RGB") -> List[Image.Image]:
+        """Render pages `first_page`..`last_page` (1-based, inclusive)"""
+
+    @abstractmethod
+    def extract_region_text(self, pdf_path: PDFSource, crop_area) -> Dict[int, str]:
+        """Return the text-layer text inside `crop_area` for every page that has some.
+
+        Right-to-left runs come back in logical order as far as the engine
+        can tell; an empty dict means the engine found no text.
+        """
+
+class PopplerRenderer(PageRenderer):
+    """Renders through poppler's pdftoppm (one subprocess per call)"""
+    name = "poppler"
+
+    def prepare_region(self, pdf_path: PDFSource, crop_area, work_dir: str) -> Tuple[str, Optional[object]]:
+        """Write a copy of the PDF whose crop boxes are narrowed to the region"""
+        cropped_pdf_path = os.path.join(work_dir, "region.pdf")
+
+        with open_pdf(pdf_path) as infile:
+            reader = PdfReader(infile)
+            writer = PdfWriter()
+
+            for page in reader.pages:
+                page.cropbox = region_to_cropbox(page, crop_area)
+                writer.add_page(page)
+
+            with open(cropped_pdf_path, 'wb') as outfile:
+                writer.write(outfile)
+
+        return cropped_pdf_path, None
+
+    def render_range(self, pdf_path: PDFSource, dpi: int, first_page: int, last_page: int,
+                     crop_area=None, mode: str = "RGB") -> List[Image.Image]:
+        if crop_area is not None:
+            raise ValueError("Poppler renders regions through prepare_region()")
+
+        with source_path(pdf_path) as path:
+            images = convert_from_path(
+                path, dpi=dpi, use_cropbox=True, grayscale=mode != "RGB",
+                first_page=first_page, last_page=last_page
+            )
+        return [image.convert("1") for image in images] if mode == "1" else images
+
+    def extract_region_text(self, pdf_path: PDFSource, crop_area) -> Dict[int, str]:
+        """Run pdftotext once over the whole document, cropped to the region.
+
+        At 72 DPI pdftotext's pixel crop equals points; pages are separated
+        by form feeds in the output.
+        """
+        left, top = math.floor(crop_area.x), math.floor(crop_area.y)
+        width = math.ceil(crop_area.x + crop_area.width) - left
+        height = math.ceil(crop_area.y + crop_area.height) - top
+        command = [
+            "pdftotext", "-enc", "UTF-8", "-r", "72",
+            "-x", str(left), "-y", str(top), "-W", str(width), "-H", str(height),
+        ]
+
+        try:
+            with source_path(pdf_path) as path:
+                output = subprocess.run(command + [path, "-"], capture_output=True, timeout=60, check=True).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"⚠️ pdftotext failed, skipping text layer: {e}")
+            return {}
+
+        pages = output.decode("utf-8", errors="replace").split("\f")
+        return {
+            page_number: text.strip()
+            for page_number, text in enumerate(pages, start=1)
+            if text.strip()
+        }
+
+class PdfiumRenderer(PageRenderer):
+    """Renders in-process with pdfium (no subprocess or temp files)"""
+    name = "pdfium"
+
+    def __init__(self):
+        import pypdfium2  # Optional dependency - only needed for this engine
+        self.pdfium = pypdfium2
+
+    def render_range(self, pdf_path: PDFSource, dpi: int, first_page: int, last_page: int,
+                     crop_area=None, mode: str = "RGB") -> List[Image.Image]:
+        document = self.pdfium.PdfDocument(pdf_path)
+        try:
+            images = []
+            for index in range(first_page - 1, min(last_page, len(document))):
+                page = document[index]
+                crop = (0, 0, 0, 0)
+                if crop_area is not None:
+                    # pdfium crops the displayed page by (left, bottom, right, top) margins
+                    width, height = page.get_size()
+                    crop = (
+                        max(0.0, crop_area.x),
+                        max(0.0, height - crop_area.y - crop_area.height),
+                        max(0.0, width - crop_area.x - crop_area.width),
+                        max(0.0, crop_area.y),
+                    )
+                bitmap = page.render(scale=dpi / POINTS_PER_INCH, crop=crop, grayscale=mode != "RGB")
+                image = bitmap.to_pil()
+                images.append(image.convert(mode) if image.mode != mode else image)
+                page.close()
+            return images
+        finally:
+            document.close()
+
+    def extract_region_text(self, pdf_path: PDFSource, crop_area) -> Dict[int, str]:
+        document = self.pdfium.PdfDocument(pdf_path)
+        try:
+            texts = {}
+            for index in range(len(document)):
+                page = document[index]
+                text_page = page.get_textpage()
+                if text_page.count_chars() > 0:
+                    box = region_to_user_space(page.get_cropbox(), page.get_rotation(), crop_area)
+                    text = text_page.get_text_bounded(*box).strip()
+                    if text:
+                        texts[index + 1] = text
+                text_page.close()
+                page.close()
+            return texts
+        finally:
+            document.close()
+
+RENDERERS = {
+    PopplerRenderer.name: PopplerRenderer,
+    PdfiumRenderer.name: PdfiumRenderer,
+}
+
+_renderers: Dict[str, PageRenderer] = {}
+
+def get_renderer(name: str = None) -> PageRenderer:
+    """Return the (cached) renderer for `name`, falling back to poppler if unavailable"""
+    name = name or PDF_RENDERER
+    if name not in _renderers:
+        if name not in RENDERERS:
+            raise ValueError(f"Unknown PDF renderer '{name}' (choose from {', '.join(RENDERERS)})")
+        try:
+            _renderers[name] = RENDERERS[name]()
+        except ImportError as e:
+            logger.warning(f"⚠️ PDF renderer '{name}' unavailable ({e}), using poppler")
+            return get_renderer(PopplerRenderer.name)
+    return _renderers[name]
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def get_render_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the worker-wide rasterization pool, creating it on first use"""
+    global _render_pool
+    if _render_pool is None and RENDER_PROCESSES > 0:
+        # Spawned (not forked) children, since the web worker is multi-threaded
+        _render_pool = ProcessPoolExecutor(
+            max_workers=RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"🏭 Started rasterization pool with {RENDER_PROCESSES} processes")
+    return _render_pool
+
+def shutdown_render_pool():
+    """Stop the rasterization pool (called on application shutdown)"""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+        logger.info("🏭 Rasterization pool stopped")
+
+def _render_page_range(renderer_name: str, pdf_path: str, dpi: int, first_page: int, last_page: int,
+                       crop_area=None, mode: str = "RGB") -> List[Image.Image]:
+    """Render a page range - runs inside a pool process"""
+    return get_renderer(renderer_name).render_range(pdf_path, dpi, first_page, last_page, crop_area, mode)
+
 class PDFService:
     """Service for PDF manipulation"""
     
-    def __init__(self):
+    def __init__(self, renderer: str = None):
         self.default_dpi = 300
+        self.renderer = get_renderer(renderer)
     
-    def get_total_pages(self, pdf_path: str) -> int:
+    def get_total_pages(self, pdf_path: PDFSource) -> int:
         """Get total number of pages in a PDF"""
-        with open(pdf_path, 'rb') as f:
+        with open_pdf(pdf_path) as f:
             reader = PdfReader(f)
             return len(reader.pages)
 
-    def extract_page(self, pdf_path: str, page_number: int, output_path: str):
+    def inspect(self, pdf_path: PDFSource) -> PDFInfo:
+        """Read page count, page geometry, encryption and text-layer presence.
+
+        pypdf parses lazily, so this only touches the page tree and page
+        dictionaries - content streams are never decoded and nothing is
+        rendered. A page "has text" when its resources declare fonts.
+        """
+        with open_pdf(pdf_path) as f:
+            reader = PdfReader(f)
+
+            if reader.is_encrypted and reader.decrypt("") == PasswordType.NOT_DECRYPTED:
+                logger.warning("🔒 PDF is password protected")
+                return PDFInfo(page_count=0, encrypted=True, needs_password=True)
+
+            pages = []
+            for number, page in enumerate(reader.pages, start=1):
+                box = page.cropbox
+                width, height = float(box.width), float(box.height)
+                rotation = page.rotation % 360
+                if rotation in (90, 270):
+                    width, height = height, width
+
+                resources = page.get("/Resources")
+                has_text = bool(resources) and "/Font" in resources.get_object()
+                pages.append(PageInfo(number, width, height, rotation, has_text))
+
+            return PDFInfo(page_count=len(pages), encrypted=reader.is_encrypted, pages=pages)
+
+    def extract_page(self, pdf_path: PDFSource, page_number: int, output_path: str):
         """Extract a single page from a PDF and save it"""
-        with open(pdf_path, 'rb') as infile:
+        with open_pdf(pdf_path) as infile:
             reader = PdfReader(infile)
             writer = PdfWriter()
             
@@ -30,22 +382,129 @@ class PDFService:
             with open(output_path, 'wb') as outfile:
                 writer.write(outfile)
                 
-    def convert_to_image(self, pdf_path: str, page_number: int, dpi: int = 300):
-        """Convert PDF to list of PIL Images"""
+    def split_pages(self, pdf_path: PDFSource, page_numbers: Iterable[int],
+                    output_dir: str = None) -> Iterator[Tuple[int, Union[str, bytes]]]:
+        """Split the requested pages (1-based) into single-page PDFs, parsing the source once.
+
+        Yields (page_number, path) when `output_dir` is given - files are named
+        page_<n>.pdf - and (page_number, pdf_bytes) otherwise.
+        """
+        with open_pdf(pdf_path) as infile:
+            reader = PdfReader(infile)
+            
+            for page_number in page_numbers:
+                writer = PdfWriter()
+                writer.add_page(reader.pages[page_number - 1])
+                
+                if output_dir:
+                    output_path = os.path.join(output_dir, f"page_{page_number}.pdf")
+                    with open(output_path, 'wb') as outfile:
+                        writer.write(outfile)
+                    yield page_number, output_path
+                else:
+                    buffer = BytesIO()
+                    writer.write(buffer)
+                    yield page_number, buffer.getvalue()
+                
+    def convert_to_image(self, pdf_path: PDFSource, page_number: int, dpi: int = 300) -> Image.Image:
+        """Convert a single PDF page (1-based) to a PIL Image"""
         try:
-            dpi = dpi or self.default_dpi
-            images = convert_from_path(pdf_path, dpi=dpi)
-            logger.info(f"✅ Converted PDF to {len(images)} images at {dpi} DPI")
-            return images
+            image = self.render_page(pdf_path, page_number, dpi)
+            logger.info(f"✅ Converted page {page_number} to image at {dpi or self.default_dpi} DPI")
+            return image
         except Exception as e:
             logger.error(f"❌ Error converting PDF: {e}")
             raise
     
-    def get_page_count(self, pdf_path: str) -> int:
+    def render_page(self, pdf_path: PDFSource, page_number: int, dpi: int = None, mode: str = "RGB") -> Image.Image:
+        """Render a single page (1-based)"""
+        dpi = dpi or self.default_dpi
+        return self.renderer.render_range(pdf_path, dpi, page_number, page_number, mode=mode)[0]
+
+    def extract_region_text(self, pdf_path: PDFSource, crop_area) -> Dict[int, str]:
+        """Text-layer text inside the crop area, by page number (pages without text are omitted)"""
+        return self.renderer.extract_region_text(pdf_path, crop_area)
+
+    def iter_region(self, pdf_path: PDFSource, crop_area, dpi: int = None, chunk_size: int = 4,
+                    mode: str = "RGB", page_numbers: Iterable[int] = None) -> Iterator[Tuple[int, Image.Image]]:
+        """Rasterize only the crop area of every page (or of `page_numbers`), lazily.
+
+        The crop area is given in points from the page's top-left corner and
+        the renderer never rasterizes the rest of the page. Yields
+        (page_number, image) in page order. Pages are rendered `chunk_size`
+        at a time, so only one chunk of images is alive at once regardless of
+        the page count. Long documents are rendered in the process pool
+        instead (see `_iter_pooled_ranges`).
+        """
+        dpi = dpi or self.default_dpi
+        total_pages = self.get_total_pages(pdf_path)
+        pages = sorted(page_numbers) if page_numbers is not None else range(1, total_pages + 1)
+        if not pages:
+            return
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            render_path, render_crop = self.renderer.prepare_region(pdf_path, crop_area, temp_dir)
+
+            logger.info(f"✂️ Rendering name region of {len(pages)} pages at {dpi} DPI ({self.renderer.name})")
+            # Pool processes need a file they can open themselves
+            pooled = isinstance(render_path, str) and len(pages) >= RENDER_POOL_MIN_PAGES
+            pool = get_render_pool() if pooled else None
+            if pool is not None:
+                ranges = page_ranges(pages, RENDER_POOL_CHUNK_PAGES)
+                yield from self._iter_pooled_ranges(pool, render_path, dpi, ranges, render_crop, mode)
+                return
+
+            for first_page, last_page in page_ranges(pages, chunk_size):
+                images = self.renderer.render_range(render_path, dpi, first_page, last_page, render_crop, mode)
+                yield from zip(range(first_page, last_page + 1), images)
+
+    def _iter_pooled_ranges(self, pool: ProcessPoolExecutor, pdf_path: str, dpi: int, ranges: List[Tuple[int, int]],
+                            crop_area=None, mode: str = "RGB") -> Iterator[Tuple[int, Image.Image]]:
+        """Render page ranges in the process pool and yield (page_number, image) in order.
+
+        At most two ranges per pool process are queued ahead of the consumer,
+        so a slow consumer holds back rendering instead of piling up bitmaps.
+        """
+        ranges = deque(ranges)
+        max_pending = 2 * RENDER_PROCESSES
+        pending = deque()
+
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < max_pending:
+                    first_page, last_page = ranges.popleft()
+                    future = pool.submit(
+                        _render_page_range, self.renderer.name, pdf_path, dpi,
+                        first_page, last_page, crop_area, mode
+                    )
+                    pending.append((first_page, future))
+                first_page, future = pending.popleft()
+                yield from enumerate(future.result(), start=first_page)
+        finally:
+            # Don't leave ranges rendering a file that is about to be deleted
+            for _, future in pending:
+                future.cancel()
+
+    def iter_pages(self, pdf_path: PDFSource, dpi: int = None, page_numbers: Iterable[int] = None,
+                   mode: str = "RGB") -> Iterator[Tuple[int, Image.Image]]:
+        """Lazily rasterize full pages one at a time, yielding (page_number, image)"""
+        if page_numbers is None:
+            page_numbers = range(1, self.get_total_pages(pdf_path) + 1)
+        for page_number in page_numbers:
+            yield page_number, self.render_page(pdf_path, page_number, dpi, mode)
+
+    def pick_render_dpi(self, crop_area, min_height_px: int, max_dpi: int = None) -> int:
+        """Pick the lowest DPI at which the crop area is at least `min_height_px` tall"""
+        max_dpi = max_dpi or self.default_dpi
+        dpi = math.ceil(min_height_px * POINTS_PER_INCH / max(crop_area.height, 1.0))
+        # Round up to a multiple of 25 so renders land on familiar resolutions
+        dpi = math.ceil(dpi / 25) * 25
+        return max(MIN_RENDER_DPI, min(dpi, max_dpi))
+
+    def get_page_count(self, pdf_path: PDFSource) -> int:
         """Get number of pages in PDF"""
         try:
-            images = self.convert_to_images(pdf_path)
-            return len(images)
-        except Exception as e:
+            return self.inspect(pdf_path).page_count
+        except (OSError, PdfReadError) as e:
             logger.error(f"❌ Error getting page count: {e}")
             return 0 
\ No newline at end of file
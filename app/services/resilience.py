@@ -0,0 +1,244 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Upstream statuses that mean "slow down" rather than "this request is wrong"
+OVERLOAD_STATUSES = {429, 500, 502, 503, 504}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for calls to one upstream, shared by a whole worker.
+
+    Every successful call with steady latency raises the limit by about one
+    slot per window of calls. Latency climbing well above the observed floor
+    trims it gently, and a 429/5xx (or a timeout) halves it - once per
+    overload event: failures of calls that were already in flight when the
+    limit was last halved don't halve it again. A Retry-After from the
+    provider pauses all new calls until it has passed.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 latency_tolerance: float = 2.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self.paused_until = 0.0
+        self.last_decrease = float("-inf")
+        self.overloads = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveLimiter":
+        """Build the limiter from VISION_CONCURRENCY_* settings"""
+        return cls(
+            initial=int(os.getenv("VISION_CONCURRENCY_INITIAL", "4")),
+            min_limit=int(os.getenv("VISION_CONCURRENCY_MIN", "1")),
+            max_limit=int(os.getenv("VISION_CONCURRENCY_MAX", "32")),
+        )
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        # Created on first use so it belongs to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one unit of concurrency for the duration of a call.
+
+        The block should call `record(response)` once the response is in;
+        an exception escaping the block counts as an overload.
+        """
+        async with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    break
+                try:
+                    await asyncio.wait_for(self.condition.wait(), timeout=pause if pause > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+
+        call = _Call(self)
+        try:
+            yield call
+        except (httpx.TimeoutException, httpx.NetworkError):
+            self._on_overload(None, call.started)
+            raise
+        finally:
+            async with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    def has_capacity(self) -> bool:
+        """Whether a new call would get a slot right away"""
+        return self.paused_until <= time.monotonic() and self.in_flight < int(self.limit)
+
+    def _on_success(self, latency: float):
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        # The floor tracks the fastest recent calls but may drift up slowly
+        self.baseline_latency = min(latency, self.baseline_latency * 1.05)
+
+        if latency > self.latency_tolerance * self.baseline_latency:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _on_overload(self, retry_after: Optional[float], started: float):
+        """Halve the limit for an overloaded call that started after the last decrease"""
+        self.overloads += 1
+        if started > self.last_decrease:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.last_decrease = time.monotonic()
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        logger.warning(
+            f"🚦 Upstream overloaded, concurrency limit now {int(self.limit)}"
+            + (f", pausing {retry_after:.1f}s" if retry_after else "")
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "overloads": self.overloads,
+            "baseline_latency_ms": round(self.baseline_latency * 1000) if self.baseline_latency else None,
+        }
+
+class _Call:
+    """One call holding a limiter slot"""
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        self.limiter = limiter
+        self.started = time.monotonic()
+
+    def record(self, response: httpx.Response):
+        """Feed the response's status, latency and Retry-After back into the limit"""
+        if response.status_code in OVERLOAD_STATUSES:
+            self.limiter._on_overload(parse_retry_after(response.headers.get("Retry-After")), self.started)
+        elif response.is_success:
+            self.limiter._on_success(time.monotonic() - self.started)
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, dropped connections and overload statuses are worth another try"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in OVERLOAD_STATUSES
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError))
+
+class RetryPolicy:
+    """Exponential backoff with full jitter between attempts"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("VISION_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("VISION_RETRY_BASE_SECONDS", "0.5")),
+        )
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number `attempt` (0-based) - anywhere up to the exponential cap"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Run `call`, retrying retryable errors until the attempts run out"""
+        for attempt in range(self.max_attempts):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == self.max_attempts - 1 or not is_retryable(e):
+                    raise
+                delay = self.delay(attempt)
+                logger.warning(f"🔁 Vision call failed ({e!r}), retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+class LatencyTracker:
+    """Rolling window of call latencies, for picking a hedge delay"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """None until enough calls have been seen to trust the estimate"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_after: Optional[float],
+                 duplicate: Optional[Callable[[], Awaitable[T]]] = None,
+                 can_hedge: Optional[Callable[[], bool]] = None) -> T:
+    """Run `call`, firing a duplicate if it hasn't finished after `hedge_after` seconds.
+
+    The duplicate is `duplicate()` if given (e.g. the same request taking
+    its own limiter slot), else another `call()`, and is skipped when
+    `can_hedge()` says there is no room for it. Whichever copy succeeds
+    first wins and the other is cancelled. Without a delay (e.g. no
+    latency estimate yet) the call simply runs once.
+    """
+    first = asyncio.ensure_future(call())
+    if hedge_after is None:
+        return await first
+
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+    if can_hedge is not None and not can_hedge():
+        return await first
+
+    logger.info(f"🏇 Vision call slower than {hedge_after:.2f}s, hedging with a duplicate")
+    pending = {first, asyncio.ensure_future((duplicate or call)())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,170 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from services.hebrew_text import normalize_hebrew, normalize_name
+
+logger = logging.getLogger(__name__)
+
+# Scores at or above this count as a match (token_set_ratio, 0-100)
+MATCH_THRESHOLD = 75
+# Candidates reported per extracted name, best first
+TOP_K = 3
+# Below this many name pairs a single thread beats spinning up the pool
+PARALLEL_MIN_PAIRS = 50_000
+# Rosters at least this large are matched through the n-gram index instead of scoring everyone
+BLOCKING_MIN_ROSTER = 1000
+# Roster names scored per extracted name when blocking
+MAX_CANDIDATES = 64
+
+@dataclass
+class RosterMatch:
+    found: bool
+    employee_name: str
+    employee_email: str
+    score: float = 0.0
+    candidates: List[Tuple[str, float]] = field(default_factory=list)
+
+def ngrams(text: str, n: int = 3) -> set:
+    """Character n-grams of each word, padded so word starts and ends count too"""
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+    return grams
+
+class NgramIndex:
+    """Inverted index from character trigrams to the roster names containing them"""
+
+    def __init__(self, choices: Sequence[str]):
+        self.size = len(choices)
+        postings: Dict[str, List[int]] = {}
+        for index, choice in enumerate(choices):
+            for gram in ngrams(choice):
+                postings.setdefault(gram, []).append(index)
+        self.postings = {gram: np.array(indices, dtype=np.int32) for gram, indices in postings.items()}
+
+    def candidates(self, query: str, limit: int) -> np.ndarray:
+        """Indices of the `limit` roster names sharing the most trigrams with `query`"""
+        hits = [self.postings[gram] for gram in ngrams(query) if gram in self.postings]
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+        counts = np.bincount(np.concatenate(hits), minlength=self.size)
+        found = np.flatnonzero(counts)
+        if len(found) > limit:
+            found = found[np.argpartition(-counts[found], limit - 1)[:limit]]
+        return found
+
+class RosterMatcher:
+    """A template's roster, normalized once and scored against many names in one go.
+
+    Names on both sides go through `normalize_name` (no niqqud, geresh or
+    final forms), and extracted names that read in visual order are
+    flipped first. Scoring uses token_set_ratio, so word order and a
+    missing middle name don't matter. Large rosters are only scored
+    against the names sharing the most trigrams with each extracted name.
+    """
+
+    def __init__(self, employee_map: Dict[str, str], threshold: float = MATCH_THRESHOLD, top_k: int = TOP_K):
+        self.employee_map = employee_map
+        self.names = list(employee_map)
+        self.choices = [normalize_name(name) for name in self.names]
+        self.threshold = threshold
+        self.top_k = top_k
+        self.index = NgramIndex(self.choices) if len(self.names) >= BLOCKING_MIN_ROSTER else None
+
+    def match(self, text: str) -> RosterMatch:
+        return self.match_many([text])[0]
+
+    def match_many(self, texts: Sequence[str]) -> List[RosterMatch]:
+        """Best match and top candidates for every text, from one score matrix"""
+        matches: List[Optional[RosterMatch]] = [None] * len(texts)
+        queries = []
+        for index, text in enumerate(texts):
+            if not text:
+                matches[index] = RosterMatch(False, "No name provided", "")
+            elif not self.names:
+                matches[index] = RosterMatch(False, "No match found", "")
+            else:
+                queries.append(index)
+
+        if not queries:
+            return matches
+
+        processed = [normalize_name(normalize_hebrew(texts[index])) for index in queries]
+        ranked = self._rank_blocked(processed) if self.index else self._rank_all(processed)
+        for index, candidates in zip(queries, ranked):
+            if not candidates:
+                matches[index] = RosterMatch(False, "No match found", "")
+                continue
+            best_name, best_score = candidates[0]
+            if best_score >= self.threshold:
+                matches[index] = RosterMatch(True, best_name, self.employee_map[best_name], best_score, candidates)
+            else:
+                matches[index] = RosterMatch(False, "No match found", "", best_score, candidates)
+        return matches
+
+    def score_matrix(self, texts: Sequence[str], names: Sequence[str]) -> np.ndarray:
+        """Scores of every text against the given roster names (texts x names)"""
+        positions = {name: position for position, name in enumerate(self.names)}
+        queries = [normalize_name(normalize_hebrew(text)) for text in texts]
+        choices = [self.choices[positions[name]] for name in names]
+        return process.cdist(queries, choices, scorer=fuzz.token_set_ratio, processor=None)
+
+    def _rank_all(self, queries: List[str]) -> List[List[Tuple[str, float]]]:
+        """Top candidates per query from one score matrix over the whole roster"""
+        workers = -1 if len(queries) * len(self.names) >= PARALLEL_MIN_PAIRS else 1
+        scores = process.cdist(queries, self.choices, scorer=fuzz.token_set_ratio, processor=None, workers=workers)
+        k = min(self.top_k, len(self.names))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        return [
+            [(self.names[col], float(scores[row, col]))
+             for col in sorted(top[row], key=lambda col: (-scores[row, col], col))]
+            for row in range(len(queries))
+        ]
+
+    def _rank_blocked(self, queries: List[str]) -> List[List[Tuple[str, float]]]:
+        """Top candidates per query, scoring only the roster names the index puts forward"""
+        ranked = []
+        for query in queries:
+            indices = np.sort(self.index.candidates(query, MAX_CANDIDATES))
+            results = process.extract(
+                query, [self.choices[i] for i in indices], scorer=fuzz.token_set_ratio,
+                processor=None, limit=self.top_k
+            )
+            ranked.append([(self.names[indices[position]], float(score)) for _, score, position in results])
+        return ranked
+
+class MatcherCache:
+    """Recently used rosters' matchers, so each roster is only preprocessed once.
+
+    Used from worker threads as well as the event loop, so the LRU is only
+    touched under a lock; matchers are built outside it.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self.matchers: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, employee_map: Dict[str, str]) -> RosterMatcher:
+        key = tuple(employee_map.items())
+        with self._lock:
+            matcher = self.matchers.get(key)
+            if matcher is not None:
+                self.matchers.move_to_end(key)
+                return matcher
+
+        matcher = RosterMatcher(employee_map)
+        with self._lock:
+            # Another thread may have built the same roster meanwhile - keep the first
+            matcher = self.matchers.setdefault(key, matcher)
+            self.matchers.move_to_end(key)
+            while len(self.matchers) > self.max_entries:
+                self.matchers.popitem(last=False)
+        return matcher
@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from config import CompanyTemplate
+from services.roster_matcher import RosterMatcher
+
+logger = logging.getLogger(__name__)
+
+class TemplateError(ValueError):
+    """A company config that can't be compiled into a template"""
+
+@dataclass
+class CompiledTemplate:
+    handle: str
+    config: Dict  # The config as registered, for storing alongside queued jobs
+    template: CompanyTemplate
+    matcher: RosterMatcher
+    render_dpi: int
+
+def template_handle(config_data: Dict) -> str:
+    """Content hash of a company config - the same config always gets the same handle"""
+    canonical = json.dumps(config_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+def compile_template(config_data: Dict) -> CompanyTemplate:
+    """Parse and check a company config, raising TemplateError with the reason"""
+    if not isinstance(config_data, dict):
+        raise TemplateError("Company config must be a JSON object")
+    try:
+        template = CompanyTemplate.from_dict(config_data)
+    except (KeyError, TypeError, ValueError) as e:
+        raise TemplateError(f"Invalid company config: {e}")
+
+    crop = template.name_crop_area
+    if crop.width <= 0 or crop.height <= 0 or crop.x < 0 or crop.y < 0:
+        raise TemplateError("Name crop area must have a positive size inside the page")
+    if not isinstance(template.employee_emails, dict) or not all(
+            isinstance(name, str) and isinstance(email, str) for name, email in template.employee_emails.items()):
+        raise TemplateError("employee_emails must map names to email addresses")
+    if int(template.max_pages_per_employee) < 1:
+        raise TemplateError("max_pages_per_employee must be at least 1")
+    return template
+
+class TemplateRegistry:
+    """Company configs registered once and afterwards referred to by their content hash.
+
+    The config JSON lives in a small SQLite database shared by every worker
+    process, so a handle registered through one worker resolves in all of
+    them. Each process keeps its most recently used templates compiled -
+    parsed, validated and with the roster matcher built - so repeat
+    previews skip both the large upload and the matcher build. Handles
+    unused for `ttl_seconds` are forgotten. Safe to call from worker
+    threads: the compiled LRU is only touched under a lock.
+    """
+
+    def __init__(self, db_path: str, matcher_factory: Callable[[CompanyTemplate], RosterMatcher],
+                 dpi_factory: Callable[[CompanyTemplate], int], ttl_seconds: float = 24 * 3600,
+                 max_compiled: int = 8):
+        self.db_path = db_path
+        self.matcher_factory = matcher_factory
+        self.dpi_factory = dpi_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_compiled = max_compiled
+        self.compiled: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS templates (
+                    handle TEXT PRIMARY KEY,
+                    config TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+
+    @classmethod
+    def from_env(cls, default_dir: str, **kwargs) -> "TemplateRegistry":
+        """Build the registry from TEMPLATE_* settings (database under `default_dir` unless TEMPLATE_DB_PATH is set)"""
+        return cls(
+            db_path=os.getenv("TEMPLATE_DB_PATH") or os.path.join(default_dir, "templates.sqlite3"),
+            ttl_seconds=float(os.getenv("TEMPLATE_TTL_HOURS", "24")) * 3600,
+            max_compiled=int(os.getenv("TEMPLATE_CACHE_SIZE", "8")),
+            **kwargs,
+        )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def register(self, config_data: Dict) -> CompiledTemplate:
+        """Compile a config (if not already) and remember it under its handle"""
+        handle = template_handle(config_data)
+        compiled = self._cached(handle) or self._compile(handle, config_data)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO templates (handle, config, created_at, used_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(handle) DO UPDATE SET used_at = excluded.used_at",
+                (handle, json.dumps(config_data, ensure_ascii=False), now, now),
+            )
+            db.execute("DELETE FROM templates WHERE used_at < ?", (now - self.ttl_seconds,))
+        self._remember(compiled)
+        return compiled
+
+    def get(self, handle: str) -> Optional[CompiledTemplate]:
+        """The compiled template for a handle, or None if it was never registered or has expired"""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT config FROM templates WHERE handle = ? AND used_at >= ?", (handle, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                with self._lock:
+                    self.compiled.pop(handle, None)
+                return None
+            db.execute("UPDATE templates SET used_at = ? WHERE handle = ?", (now, handle))
+
+        compiled = self._cached(handle) or self._compile(handle, json.loads(row[0]))
+        self._remember(compiled)
+        return compiled
+
+    def _compile(self, handle: str, config_data: Dict) -> CompiledTemplate:
+        template = compile_template(config_data)
+        compiled = CompiledTemplate(
+            handle=handle,
+            config=config_data,
+            template=template,
+            matcher=self.matcher_factory(template),
+            render_dpi=self.dpi_factory(template),
+        )
+        logger.info(f"🗂️ Compiled template {handle[:8]} for {template.company_name} "
+                    f"({len(template.employee_emails)} employees)")
+        return compiled
+
+    def _cached(self, handle: str) -> Optional[CompiledTemplate]:
+        with self._lock:
+            return self.compiled.get(handle)
+
+    def _remember(self, compiled: CompiledTemplate):
+        with self._lock:
+            self.compiled[compiled.handle] = compiled
+            self.compiled.move_to_end(compiled.handle)
+            while len(self.compiled) > self.max_compiled:
+                self.compiled.popitem(last=False)
@@ -0,0 +1,68 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BodyTooLarge(Exception):
+    """Raised from `receive` once a request body passes the limit"""
+
+class BodySizeLimit:
+    """ASGI middleware that caps request bodies while they are being read.
+
+    A declared Content-Length over the limit is refused before anything is
+    read. Otherwise the bytes are counted as they stream in and the request
+    is cut off as soon as the count passes `max_body_size`, so an oversized
+    upload is never spooled in full.
+    """
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_body_size:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    exceeded = True
+                    raise BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Once cut off, whatever the app answers (e.g. a parse error) is replaced by the 413
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded:
+            logger.warning(f"🚫 Rejected {scope['method']} {scope['path']}: body over {self.max_body_size} bytes")
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({
+            "detail": f"Request too large. Maximum size: {self.max_body_size // (1024 * 1024)}MB"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -149,9 +149,9 @@ export const CropAreaSelector: React.FC = () => {
       if (response.template) {
         saveCompanyToStorage(response.template);
         
-        // Update company in store
+        // Update company in store (the server converts preview pixels to page points)
         updateCompany(currentCompany.company_id, {
-          name_crop_area: cropArea
+          name_crop_area: response.template.name_crop_area
         });
       }
 
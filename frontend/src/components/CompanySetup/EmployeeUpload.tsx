@@ -3,17 +3,12 @@ import { ArrowLeft, ArrowRight, Users, Download, AlertCircle } from 'lucide-reac
 import { FileUpload } from '@/components/common/FileUpload';
 import { useAppStore } from '@/store';
 import { setupApi } from '@/services/api';
-
-interface ParsedEmployee {
-  name: string;
-  email: string;
-  lineNumber: number;
-}
+import { RosterRowError, UploadEmployeesResponse } from '@/types';
 
 export const EmployeeUpload: React.FC = () => {
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
-  const [parsedEmployees, setParsedEmployees] = useState<ParsedEmployee[]>([]);
-  const [parseErrors, setParseErrors] = useState<string[]>([]);
+  const [importResult, setImportResult] = useState<UploadEmployeesResponse | null>(null);
+  const [importErrors, setImportErrors] = useState<string[]>([]);
   const [isUploading, setIsUploading] = useState(false);
 
   const {
@@ -26,61 +21,19 @@ export const EmployeeUpload: React.FC = () => {
     saveCompanyToStorage
   } = useAppStore();
 
-  const parseCSV = async (file: File): Promise<void> => {
-    try {
-      const text = await file.text();
-      const lines = text.split('\n').map(line => line.trim()).filter(line => line);
-      
-      if (lines.length < 2) {
-        setParseErrors(['קובץ ה-CSV חייב להכיל לפחות שורת כותרת ושורה אחת של נתונים']);
-        setParsedEmployees([]);
-        return;
-      }
-
-      const employees: ParsedEmployee[] = [];
-      const errors: string[] = [];
-
-      // Skip header line (assume first line is header)
-      for (let i = 1; i < lines.length; i++) {
-        const line = lines[i];
-        const parts = line.split(',').map(part => part.trim());
-        
-        if (parts.length >= 2) {
-          const name = parts[0];
-          const email = parts[1];
-          
-          if (name && email) {
-            // Basic email validation
-            const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
-            if (emailRegex.test(email)) {
-              employees.push({
-                name,
-                email,
-                lineNumber: i + 1
-              });
-            } else {
-              errors.push(`שורה ${i + 1}: כתובת אימייל לא תקינה - ${email}`);
-            }
-          } else {
-            errors.push(`שורה ${i + 1}: חסרים נתונים (שם או אימייל)`);
-          }
-        } else {
-          errors.push(`שורה ${i + 1}: פורמט לא תקין - נדרשים לפחות 2 שדות מופרדים בפסיק`);
-        }
-      }
-
-      setParsedEmployees(employees);
-      setParseErrors(errors);
-      
-    } catch (error) {
-      setParseErrors(['שגיאה בקריאת קובץ ה-CSV']);
-      setParsedEmployees([]);
+  // Rows the server skipped, as shown to the user
+  const describeErrors = (errors: RosterRowError[], errorCount: number): string[] => {
+    const lines = errors.map(error => `שורה ${error.line}: ${error.message}`);
+    if (errorCount > errors.length) {
+      lines.push(`ועוד ${errorCount - errors.length} שורות שגויות...`);
     }
+    return lines;
   };
 
   const handleFileSelect = (file: File) => {
     setSelectedFile(file);
-    parseCSV(file);
+    setImportResult(null);
+    setImportErrors([]);
   };
 
   const handleUpload = async () => {
@@ -89,11 +42,6 @@ export const EmployeeUpload: React.FC = () => {
       return;
     }
 
-    if (parsedEmployees.length === 0) {
-      setError('לא נמצאו עובדים תקינים בקובץ');
-      return;
-    }
-
     try {
       setIsUploading(true);
       setLoading(true);
@@ -101,28 +49,29 @@ export const EmployeeUpload: React.FC = () => {
 
       // Pass current company config to API
       const response = await setupApi.uploadEmployees(selectedFile, currentCompany);
-      
-      // Save the returned updated template to localStorage
-      if (response.template) {
-        saveCompanyToStorage(response.template);
-        
-        // Update company in store with employee data
-        const employeeEmails = parsedEmployees.reduce((acc, emp) => {
-          acc[emp.name] = emp.email;
-          return acc;
-        }, {} as Record<string, string>);
 
-        updateCompany(currentCompany.company_id, {
-          employee_emails: employeeEmails
-        });
+      // The server parses and validates the CSV - keep exactly the roster it accepted
+      saveCompanyToStorage(response.template);
+      updateCompany(currentCompany.company_id, {
+        employee_emails: response.template.employee_emails
+      });
+      setImportResult(response);
+      setImportErrors(describeErrors(response.errors, response.error_count));
+
+      setSuccessMessage(`${response.message} (${response.elapsed_ms}ms, נשמר במחשב שלך)`);
+      // Skipped rows stay on screen until the user moves on
+      if (response.error_count === 0) {
+        setSetupStep('test');
       }
 
-      setSuccessMessage(`${response.message} (נשמר במחשב שלך)`);
-      setSetupStep('test');
-
     } catch (error: any) {
       console.error('Upload employees error:', error);
-      setError(error.response?.data?.detail || 'שגיאה בהעלאת רשימת העובדים');
+      // Rejected rosters come back with the import counts alongside the message
+      const detail = error.response?.data?.detail;
+      if (detail?.errors) {
+        setImportErrors(describeErrors(detail.errors, detail.error_count));
+      }
+      setError((typeof detail === 'string' ? detail : detail?.message) || 'שגיאה בהעלאת רשימת העובדים');
     } finally {
       setIsUploading(false);
       setLoading(false);
@@ -146,7 +95,8 @@ export const EmployeeUpload: React.FC = () => {
     setSetupStep('crop');
   };
 
-  const canUpload = selectedFile && parsedEmployees.length > 0 && !isUploading;
+  const canUpload = selectedFile && !importResult && !isUploading;
+  const importedEmployees = Object.entries(importResult?.template.employee_emails ?? {});
 
   return (
     <div className="space-y-6">
@@ -164,7 +114,7 @@ export const EmployeeUpload: React.FC = () => {
           <p>• קובץ CSV עם שורת כותרת</p>
           <p>• עמודה ראשונה: שם העובד</p>
           <p>• עמודה שנייה: כתובת אימייל</p>
-          <p>• הפרדה בפסיק (,)</p>
+          <p>• הפרדה בפסיק (,), נקודה-פסיק (;) או טאב</p>
         </div>
         <button
           onClick={downloadTemplate}
@@ -182,8 +132,8 @@ export const EmployeeUpload: React.FC = () => {
         onFileSelect={handleFileSelect}
         onRemove={() => {
           setSelectedFile(null);
-          setParsedEmployees([]);
-          setParseErrors([]);
+          setImportResult(null);
+          setImportErrors([]);
         }}
         selectedFile={selectedFile}
         isUploading={isUploading}
@@ -192,29 +142,29 @@ export const EmployeeUpload: React.FC = () => {
         helpText="קובץ CSV בלבד, עד 5MB"
       />
 
-      {/* Parse Errors */}
-      {parseErrors.length > 0 && (
+      {/* Rows skipped by the server */}
+      {importErrors.length > 0 && (
         <div className="bg-red-50 border border-red-200 rounded-lg p-4">
           <div className="flex items-center mb-2">
             <AlertCircle className="h-5 w-5 text-red-600 ml-2" />
             <h4 className="font-semibold text-red-900">שגיאות בקובץ:</h4>
           </div>
           <ul className="text-sm text-red-800 space-y-1">
-            {parseErrors.map((error, index) => (
+            {importErrors.map((error, index) => (
               <li key={index}>• {error}</li>
             ))}
           </ul>
         </div>
       )}
 
-      {/* Parsed Employees Preview */}
-      {parsedEmployees.length > 0 && (
+      {/* Imported Employees Preview */}
+      {importedEmployees.length > 0 && (
         <div className="bg-green-50 border border-green-200 rounded-lg p-4">
           <div className="flex items-center justify-between mb-3">
             <div className="flex items-center">
               <Users className="h-5 w-5 text-green-600 ml-2" />
               <h4 className="font-semibold text-green-900">
-                נמצאו {parsedEmployees.length} עובדים תקינים
+                נמצאו {importedEmployees.length} עובדים תקינים
               </h4>
             </div>
           </div>
@@ -228,16 +178,16 @@ export const EmployeeUpload: React.FC = () => {
                 </tr>
               </thead>
               <tbody>
-                {parsedEmployees.slice(0, 10).map((employee, index) => (
+                {importedEmployees.slice(0, 10).map(([name, email], index) => (
                   <tr key={index} className="border-b border-green-100">
-                    <td className="py-1 text-green-700">{employee.name}</td>
-                    <td className="py-1 text-green-700">{employee.email}</td>
+                    <td className="py-1 text-green-700">{name}</td>
+                    <td className="py-1 text-green-700">{email}</td>
                   </tr>
                 ))}
-                {parsedEmployees.length > 10 && (
+                {importedEmployees.length > 10 && (
                   <tr>
                     <td colSpan={2} className="py-1 text-green-600 text-center">
-                      ועוד {parsedEmployees.length - 10} עובדים...
+                      ועוד {importedEmployees.length - 10} עובדים...
                     </td>
                   </tr>
                 )}
@@ -259,18 +209,28 @@ export const EmployeeUpload: React.FC = () => {
           חזור
         </button>
         
-        <button
-          onClick={handleUpload}
-          disabled={!canUpload}
-          className={`inline-flex items-center px-6 py-3 rounded-lg text-lg font-semibold transition-colors ${
-            canUpload
-              ? 'bg-primary-600 hover:bg-primary-700 text-white'
-              : 'bg-gray-300 text-gray-500 cursor-not-allowed'
-          }`}
-        >
-          {isUploading ? 'מעלה...' : `העלה ${parsedEmployees.length} עובדים`}
-          <ArrowRight className="h-5 w-5 mr-2" />
-        </button>
+        {importResult ? (
+          <button
+            onClick={() => setSetupStep('test')}
+            className="inline-flex items-center px-6 py-3 rounded-lg text-lg font-semibold transition-colors bg-primary-600 hover:bg-primary-700 text-white"
+          >
+            המשך עם {importResult.imported} עובדים
+            <ArrowRight className="h-5 w-5 mr-2" />
+          </button>
+        ) : (
+          <button
+            onClick={handleUpload}
+            disabled={!canUpload}
+            className={`inline-flex items-center px-6 py-3 rounded-lg text-lg font-semibold transition-colors ${
+              canUpload
+                ? 'bg-primary-600 hover:bg-primary-700 text-white'
+                : 'bg-gray-300 text-gray-500 cursor-not-allowed'
+            }`}
+          >
+            {isUploading ? 'מעלה...' : 'העלה רשימת עובדים'}
+            <ArrowRight className="h-5 w-5 mr-2" />
+          </button>
+        )}
       </div>
     </div>
   );
@@ -109,7 +109,7 @@ export const TestTemplate: React.FC = () => {
         <h4 className="font-semibold text-blue-900 mb-2">סיכום ההגדרות:</h4>
         <div className="text-sm text-blue-800 space-y-1">
           <p>• <strong>שם החברה:</strong> {currentCompany?.company_name}</p>
-          <p>• <strong>אזור השם:</strong> {currentCompany?.name_crop_area.width}×{currentCompany?.name_crop_area.height} פיקסלים</p>
+          <p>• <strong>אזור השם:</strong> {Math.round(currentCompany?.name_crop_area.width ?? 0)}×{Math.round(currentCompany?.name_crop_area.height ?? 0)} נקודות</p>
           <p>• <strong>מספר עובדים:</strong> {Object.keys(currentCompany?.employee_emails || {}).length}</p>
         </div>
       </div>
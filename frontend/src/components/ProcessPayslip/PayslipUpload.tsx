@@ -6,7 +6,7 @@ import { authService } from '@/services/authService';
 import { CompanyConfigService } from '@/services/companyConfigService';
 import { FileUpload } from '@/components/common/FileUpload';
 import { Results } from './Results';
-import { CompanyTemplate } from '@/types';
+import { CompanyTemplate, PreviewResult } from '@/types';
 import { RefreshCw, AlertCircle } from 'lucide-react';
 
 export function PayslipUpload() {
@@ -79,14 +79,24 @@ export function PayslipUpload() {
     clearProcessing();
 
     try {
-      const response = await processingApi.uploadAndPreview(file, companyId, companyConfig);
-      setProcessId(response.process_id);
-      setPreviewResults(response.preview);
+      // Show each page as soon as it is matched instead of waiting for the whole file
+      const results: PreviewResult[] = [];
+      const summary = await processingApi.uploadAndPreviewStream(
+        file,
+        companyId,
+        companyConfig,
+        (result) => {
+          results.push(result);
+          setPreviewResults([...results].sort((a, b) => a.page - b.page));
+        },
+        (assigned) => setPreviewResults(assigned)
+      );
+      setProcessId(summary.process_id);
       
       // Refresh usage stats after successful AI processing
       await refreshUsageStats();
       
-      const matchedCount = response.preview.filter(r => r.found_match).length;
+      const matchedCount = summary.matched;
       if (matchedCount > 0) {
         setSuccessMessage(`עיבוד הושלם! נמצאו ${matchedCount} התאמות.`);
       } else {
@@ -1,4 +1,4 @@
-import { CheckCircle, XCircle, User } from 'lucide-react';
+import { CheckCircle, XCircle, MinusCircle, AlertTriangle, User } from 'lucide-react';
 import { PreviewResult } from '@/types';
 
 interface PreviewResultsTableProps {
@@ -62,11 +62,28 @@ export function PreviewResultsTable({
                   )}
                 </td>
                 <td className="px-6 py-4 whitespace-nowrap text-right">
-                  {isMatched ? (
+                  {isMatched && result.assignment && result.assignment !== 'ok' ? (
+                    <span className="flex items-center text-amber-600 justify-end">
+                      <AlertTriangle className="h-5 w-5 mr-2" />
+                      {result.assignment === 'reassigned' ? 'הותאם מחדש' : 'התאמה לא ודאית'}
+                      {result.conflict_pages?.length ? ` (עמודים ${result.conflict_pages.join(', ')})` : ''}
+                    </span>
+                  ) : isMatched ? (
                     <span className="flex items-center text-green-600 justify-end">
                       <CheckCircle className="h-5 w-5 mr-2" />
                       התאמה נמצאה
                     </span>
+                  ) : result.assignment === 'unassigned' ? (
+                    <span className="flex items-center text-amber-600 justify-end">
+                      <AlertTriangle className="h-5 w-5 mr-2" />
+                      העובד שויך לעמוד אחר
+                      {result.conflict_pages?.length ? ` (עמודים ${result.conflict_pages.join(', ')})` : ''}
+                    </span>
+                  ) : result.skip_reason ? (
+                    <span className="flex items-center text-gray-500 justify-end">
+                      <MinusCircle className="h-5 w-5 mr-2" />
+                      עמוד ריק - דולג
+                    </span>
                   ) : (
                     <span className="flex items-center text-red-600 justify-end">
                       <XCircle className="h-5 w-5 mr-2" />
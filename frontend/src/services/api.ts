@@ -7,7 +7,9 @@ import {
   UploadEmployeesResponse,
   CropArea,
   PreviewResult,
+  PreviewStreamSummary,
   EmailSendResult,
+  RegisterTemplateResponse,
 } from '@/types';
 
 // Create axios instance with base configuration
@@ -66,6 +68,44 @@ export const companyApi = {
   },
 };
 
+// Template API
+export const templateApi = {
+  // Register a company config once; later requests send just the returned handle
+  async register(companyConfig: CompanyTemplate): Promise<RegisterTemplateResponse> {
+    const response = await api.post('/templates', { company_config: companyConfig });
+    return response.data;
+  },
+};
+
+// Handles of the company configs registered so far, keyed by the config's JSON
+const templateHandles = new Map<string, string>();
+
+const isConflict = (error: unknown): boolean =>
+  (axios.isAxiosError(error) && error.response?.status === 409) ||
+  (error as { status?: number })?.status === 409;
+
+// Run a request with the config's template handle instead of the full config,
+// registering the config first - and again if the server has since forgotten it (409)
+async function withTemplateHandle<T>(
+  companyConfig: CompanyTemplate,
+  request: (handle: string) => Promise<T>
+): Promise<T> {
+  const key = JSON.stringify(companyConfig);
+  for (let attempt = 0; ; attempt++) {
+    let handle = templateHandles.get(key);
+    if (!handle) {
+      handle = (await templateApi.register(companyConfig)).template_handle;
+      templateHandles.set(key, handle);
+    }
+    try {
+      return await request(handle);
+    } catch (error) {
+      if (attempt > 0 || !isConflict(error)) throw error;
+      templateHandles.delete(key);
+    }
+  }
+}
+
 // Setup API
 export const setupApi = {
   // Upload sample PDF
@@ -121,6 +161,8 @@ export const setupApi = {
       },
     });
 
+    // The returned config is already registered - later requests can use its handle
+    templateHandles.set(JSON.stringify(response.data.template), response.data.template_handle);
     return response.data;
   },
 
@@ -151,17 +193,85 @@ export const processingApi = {
     companyId: string,
     companyConfig: CompanyTemplate
   ): Promise<{ process_id: string; preview: PreviewResult[] }> {
-    const formData = new FormData();
-    formData.append('file', file);
-    formData.append('company_config', JSON.stringify(companyConfig));
+    return withTemplateHandle(companyConfig, async (handle) => {
+      const formData = new FormData();
+      formData.append('file', file);
+      formData.append('template_handle', handle);
 
-    const response = await api.post(`/process/${companyId}/preview`, formData, {
-      headers: {
-        'Content-Type': 'multipart/form-data',
-      },
+      const response = await api.post(`/process/${companyId}/preview`, formData, {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+      });
+
+      return response.data;
     });
+  },
 
-    return response.data;
+  // Step 1, streamed: calls onPage for every page as soon as the server has it, and
+  // onAssignment with the final list when the template decides matches document-wide
+  // (fetch rather than axios, which can't read a response body incrementally)
+  async uploadAndPreviewStream(
+    file: File,
+    companyId: string,
+    companyConfig: CompanyTemplate,
+    onPage: (result: PreviewResult) => void,
+    onAssignment?: (results: PreviewResult[]) => void
+  ): Promise<PreviewStreamSummary> {
+    const response = await withTemplateHandle(companyConfig, async (handle) => {
+      const formData = new FormData();
+      formData.append('file', file);
+      formData.append('template_handle', handle);
+
+      const token = localStorage.getItem('auth_token');
+      const response = await fetch(`/api/process/${companyId}/preview/stream`, {
+        method: 'POST',
+        body: formData,
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+      });
+
+      if (!response.ok || !response.body) {
+        const error = await response.json().catch(() => ({}));
+        throw Object.assign(new Error(error.detail || `Preview failed (${response.status})`), {
+          status: response.status,
+        });
+      }
+      return response;
+    });
+
+    const reader = response.body!.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    let summary: PreviewStreamSummary | null = null;
+
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+
+      // Events are separated by a blank line; keep any partial event for the next chunk
+      const events = buffer.split('\n\n');
+      buffer = events.pop() ?? '';
+      for (const raw of events) {
+        let event = 'message';
+        let data = '';
+        for (const line of raw.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue; // keep-alive comment
+
+        const payload = JSON.parse(data);
+        if (event === 'page') onPage(payload);
+        else if (event === 'assignment') onAssignment?.(payload.preview);
+        else if (event === 'summary') summary = payload;
+        else if (event === 'error') throw new Error(payload.detail);
+      }
+    }
+
+    if (!summary) {
+      throw new Error('Preview stream ended before the summary');
+    }
+    return summary;
   },
 
   // Step 2: Send emails based on the preview - requires company config
@@ -170,11 +280,13 @@ export const processingApi = {
     companyId: string,
     companyConfig: CompanyTemplate
   ): Promise<{ email_results: EmailSendResult[] }> {
-    const response = await api.post(`/process/${companyId}/send`, {
-      process_id: processId,
-      company_config: companyConfig,
+    return withTemplateHandle(companyConfig, async (handle) => {
+      const response = await api.post(`/process/${companyId}/send`, {
+        process_id: processId,
+        template_handle: handle,
+      });
+      return response.data;
     });
-    return response.data;
   },
 };
 
@@ -3,6 +3,7 @@ export interface CropArea {
   y: number;
   width: number;
   height: number;
+  units?: 'pt'; // PDF points from the page's top-left; absent on legacy pixel configs
 }
 
 export interface CompanyTemplate {
@@ -11,6 +12,11 @@ export interface CompanyTemplate {
   name_crop_area: CropArea;
   employee_emails: Record<string, string>;
   ocr_confidence_threshold: number;
+  render_dpi?: number | null;
+  min_crop_height_px?: number;
+  vision_batch_size?: number;
+  global_assignment?: boolean;
+  max_pages_per_employee?: number;
   created_at?: string;
   updated_at?: string;
 }
@@ -37,6 +43,7 @@ export interface UploadSampleResponse {
   success: boolean;
   message: string;
   preview_url: string;
+  preview_dpi: number;
   company_id: string;
 }
 
@@ -52,10 +59,31 @@ export interface SaveCropAreaResponse {
   template: CompanyTemplate;
 }
 
+export interface RosterRowError {
+  line: number;
+  message: string;
+}
+
 export interface UploadEmployeesResponse {
   success: boolean;
   message: string;
-  template: CompanyTemplate;
+  template_handle: string;
+  template: CompanyTemplate;  // Config with the roster as the server validated it
+  rows: number;
+  imported: number;
+  duplicates: number;
+  error_count: number;
+  errors: RosterRowError[];  // The first rows that were skipped
+  encoding: string;
+  elapsed_ms: number;
+}
+
+export interface RegisterTemplateResponse {
+  success: boolean;
+  template_handle: string;
+  company: string;
+  employee_count: number;
+  render_dpi: number;
 }
 
 export type SetupStep = 'upload' | 'crop' | 'employees' | 'test' | 'complete';
@@ -66,8 +94,25 @@ export interface PreviewResult {
   extracted_name: string;
   employee_name?: string;
   employee_email?: string;
+  match_score?: number;
+  candidates?: { employee_name: string; score: number }[]; // Closest roster names, best first
   error?: string;
   cropped_image_path?: string;
+  source?: 'text_layer' | 'cache' | 'ocr' | 'vision' | 'skipped';
+  skip_reason?: 'blank'; // Set when the page was never sent for extraction
+  duplicate_of?: number; // Page whose identical name crop this page's result was copied from
+  assignment?: 'ok' | 'reassigned' | 'unassigned' | 'ambiguous'; // Set by global assignment
+  conflict_pages?: number[]; // Other pages that wanted the same employee
+}
+
+// Final event of a streamed preview
+export interface PreviewStreamSummary {
+  success: boolean;
+  process_id: string;
+  page_count: number;
+  matched: number;
+  filename: string;
+  company: string;
 }
 
 export interface EmailSendResult {
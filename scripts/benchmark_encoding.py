@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compare vision crop encoding profiles on synthetic Hebrew name crops.
+
+Reports payload size and encode time per profile. With --accuracy (needs
+OPENROUTER_API_KEY) every crop is also sent to the model and the answers are
+checked against the names that were drawn.
+
+Usage:
+    python scripts/benchmark_encoding.py
+    python scripts/benchmark_encoding.py --font /usr/share/fonts/truetype/dejavu/DejaVuSans.ttf --accuracy
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont, features
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, APP_DIR)
+
+from services.crop_encoding import PROFILES, encode_crop
+from services.roster_matcher import RosterMatcher
+
+FIRST_NAMES = ["ישראל", "דנה", "משה", "רחל", "יוסף", "מיכל", "אברהם", "נועה", "דוד", "שרה", "יעקב", "תמר"]
+LAST_NAMES = ["כהן", "לוי", "מזרחי", "פרץ", "ביטון", "אברהם", "פרידמן", "שפירא", "אזולאי", "גולדברג"]
+
+# Fonts with Hebrew glyphs in common install locations
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+
+def find_font(path: str = None) -> str:
+    for candidate in [path] + FONT_CANDIDATES:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    sys.exit("❌ No font with Hebrew glyphs found - pass one with --font")
+
+
+def make_crops(count: int, font_path: str, seed: int):
+    """Draw `count` random names as they'd look in a 300 DPI crop of a payslip"""
+    rng = random.Random(seed)
+    font = ImageFont.truetype(font_path, 42)
+    crops = []
+    for _ in range(count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        image = Image.new("RGB", (700, 120), "white")
+        draw = ImageDraw.Draw(image)
+        # Without raqm Pillow lays text out left to right, so draw it in visual order
+        text = name if features.check("raqm") else name[::-1]
+        kwargs = {"direction": "rtl"} if features.check("raqm") else {}
+        draw.text((rng.randint(20, 200), rng.randint(20, 50)), text, font=font, fill=(20, 20, 60), **kwargs)
+        # A faint table rule, like the ones around payslip fields
+        draw.line((0, 110, 700, 110), fill=(180, 180, 180), width=2)
+        crops.append((name, image))
+    return crops
+
+
+async def measure_accuracy(crops, profile_name):
+    from services.ai_vision import AIVisionService
+
+    service = AIVisionService()
+    service.encoding = PROFILES[profile_name]
+    try:
+        answers = await asyncio.gather(*(service._extract_name_with_ai(image) for _, image in crops))
+    finally:
+        await service.close()
+    matches = RosterMatcher({name: name for name, _ in crops}).match_many(answers)
+    exact = sum(answer.strip() == name for (name, _), answer in zip(crops, answers))
+    matched = sum(match.employee_name == name for (name, _), match in zip(crops, matches))
+    return exact / len(crops), matched / len(crops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vision crop encoding profiles")
+    parser.add_argument("--count", type=int, default=50, help="Number of synthetic crops")
+    parser.add_argument("--font", help="TTF font with Hebrew glyphs")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--accuracy", action="store_true", help="Also send crops to the model (costs API calls)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    crops = make_crops(args.count, find_font(args.font), args.seed)
+    print(f"🖼️ {len(crops)} synthetic crops of {crops[0][1].width}x{crops[0][1].height} px")
+
+    header = f"{'profile':<10}{'avg bytes':>11}{'vs png':>8}{'encode ms':>11}"
+    if args.accuracy:
+        header += f"{'exact':>8}{'matched':>9}"
+    print(header)
+
+    baseline = None
+    for profile_name in args.profiles.split(","):
+        profile = PROFILES[profile_name]
+        started = time.perf_counter()
+        sizes = [len(encode_crop(image, profile)[0]) for _, image in crops]
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(crops)
+
+        average = sum(sizes) / len(sizes)
+        baseline = baseline or (average if profile_name == "png" else None)
+        ratio = f"{baseline / average:.1f}x" if baseline else "-"
+        line = f"{profile_name:<10}{average:>11.0f}{ratio:>8}{elapsed_ms:>11.2f}"
+
+        if args.accuracy:
+            exact, matched = asyncio.run(measure_accuracy(crops, profile_name))
+            line += f"{exact:>8.0%}{matched:>9.0%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Compare roster matching: one fuzzywuzzy extractOne per page (the old way),
+RosterMatcher scoring the whole roster in one rapidfuzz cdist call, and
+RosterMatcher going through its trigram index (rosters of 1000+).
+
+Rosters and extracted names are synthetic Hebrew names, with some pages
+carrying OCR-style typos or niqqud. fuzzywuzzy is skipped if it isn't
+installed.
+
+Usage:
+    python scripts/benchmark_matcher.py
+    python scripts/benchmark_matcher.py --pages 300 --roster 50000 --no-baseline
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, APP_DIR)
+
+from services.hebrew_text import normalize_hebrew, normalize_name
+from services.roster_matcher import RosterMatcher
+
+LETTERS = "אבגדהוזחטיכלמנסעפצקרשת"
+
+
+FINAL_FORMS = str.maketrans("כמנפצ", "ךםןףץ")
+
+
+def make_word(rng: random.Random) -> str:
+    word = "".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 6)))
+    # Real names end in the final letter forms, which is also how reversed text is spotted
+    return word[:-1] + word[-1].translate(FINAL_FORMS)
+
+
+def make_name(rng: random.Random) -> str:
+    return f"{make_word(rng)} {make_word(rng)}"
+
+
+def with_typo(name: str, rng: random.Random) -> str:
+    position = rng.randrange(len(name) - 1)
+    return name[:position] + rng.choice(LETTERS) + name[position + 1:]
+
+
+def with_niqqud(name: str, rng: random.Random) -> str:
+    return "".join(char + (rng.choice("\u05b0\u05b4\u05b7\u05b8\u05bc") if char != " " else "") for char in name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark roster matching")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--roster", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-baseline", action="store_true", help="Skip the slow per-page fuzzywuzzy run")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    roster = {}
+    while len(roster) < args.roster:
+        roster[make_name(rng)] = f"employee{len(roster)}@example.com"
+    names = list(roster)
+    extracted = []
+    for name in (rng.choice(names) for _ in range(args.pages)):
+        roll = rng.random()
+        extracted.append(with_typo(name, rng) if roll < 0.3 else with_niqqud(name, rng) if roll < 0.4 else name)
+    print(f"👥 {args.pages} pages against a roster of {args.roster}")
+
+    started = time.perf_counter()
+    matcher = RosterMatcher(roster)
+    built = time.perf_counter()
+    matches = matcher.match_many(extracted)
+    finished = time.perf_counter()
+    mode = "indexed" if matcher.index else "full roster"
+    print(f"⚡ RosterMatcher ({mode}): build {(built - started) * 1000:.1f} ms, "
+          f"match {(finished - built) * 1000 / len(extracted):.3f} ms/page, {sum(m.found for m in matches)} matched")
+
+    if matcher.index:
+        started = time.perf_counter()
+        ranked = matcher._rank_all([normalize_name(normalize_hebrew(text)) for text in extracted])
+        found = sum(candidates[0][1] >= matcher.threshold for candidates in ranked)
+        print(f"🔎 Full roster scoring: {(time.perf_counter() - started) * 1000 / len(extracted):.3f} ms/page, "
+              f"{found} matched")
+
+    if args.no_baseline:
+        return
+
+    try:
+        from fuzzywuzzy import fuzz, process
+    except ImportError:
+        print("ℹ️ fuzzywuzzy not installed, skipping the per-page baseline")
+        return
+
+    started = time.perf_counter()
+    found = sum(process.extractOne(text, roster.keys(), scorer=fuzz.token_set_ratio)[1] >= 75 for text in extracted)
+    print(f"🐢 extractOne per page: {(time.perf_counter() - started) * 1000:.1f} ms, {found} matched")
+
+
+if __name__ == "__main__":
+    main()
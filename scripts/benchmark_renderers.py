@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compare PDF rendering engines on a payslip PDF.
+
+Each engine/mode combination runs in a fresh subprocess so peak memory is
+measured in isolation (poppler's pdftoppm children are included).
+
+Usage:
+    python scripts/benchmark_renderers.py payslips.pdf
+    python scripts/benchmark_renderers.py payslips.pdf --dpi 150 --crop 24,48,200,20
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, APP_DIR)
+
+
+def run_single(args):
+    """Render the document with one engine and print a JSON result line"""
+    # Keep the pool out of the measurement - this compares engines, not parallelism
+    os.environ["RENDER_PROCESSES"] = "0"
+    from config import CropArea
+    from services.pdf_service import PDFService
+
+    pdf_service = PDFService(renderer=args.engine)
+    if pdf_service.renderer.name != args.engine:
+        print(json.dumps({"engine": args.engine, "error": "engine unavailable"}))
+        return
+
+    pages = min(args.pages, pdf_service.get_total_pages(args.pdf)) if args.pages else pdf_service.get_total_pages(args.pdf)
+    crop_area = CropArea(*[float(v) for v in args.crop.split(",")]) if args.crop else None
+
+    started = time.perf_counter()
+    if crop_area:
+        rendered = 0
+        for _ in pdf_service.iter_region(args.pdf, crop_area, dpi=args.dpi, mode=args.mode):
+            rendered += 1
+            if rendered >= pages:
+                break
+    else:
+        for page_number in range(1, pages + 1):
+            pdf_service.render_page(args.pdf, page_number, dpi=args.dpi, mode=args.mode)
+    elapsed = time.perf_counter() - started
+
+    # ru_maxrss is in KB on Linux
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    print(json.dumps({
+        "engine": args.engine,
+        "mode": args.mode,
+        "pages": pages,
+        "ms_per_page": elapsed * 1000 / pages,
+        "peak_rss_mb": peak_kb / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF rendering engines")
+    parser.add_argument("pdf", help="PDF file to render")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=0, help="Limit the number of pages (0 = all)")
+    parser.add_argument("--crop", help="Render only this region: x,y,width,height in points")
+    parser.add_argument("--engines", default="poppler,pdfium")
+    parser.add_argument("--modes", default="RGB,L,1")
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="RGB", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        run_single(args)
+        return
+
+    print(f"📄 {args.pdf} at {args.dpi} DPI" + (f", region {args.crop}" if args.crop else ", full pages"))
+    print(f"{'engine':<10}{'mode':<6}{'pages':>7}{'ms/page':>11}{'peak RSS MB':>14}")
+
+    for engine in args.engines.split(","):
+        for mode in args.modes.split(","):
+            command = [sys.executable, __file__, args.pdf, "--dpi", str(args.dpi),
+                       "--pages", str(args.pages), "--engine", engine, "--mode", mode]
+            if args.crop:
+                command += ["--crop", args.crop]
+            output = subprocess.run(command, capture_output=True, text=True)
+            lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+            if not lines:
+                print(f"{engine:<10}{mode:<6} failed: {output.stderr.strip().splitlines()[-1:]}")
+                continue
+
+            result = json.loads(lines[-1])
+            if "error" in result:
+                print(f"{engine:<10}{mode:<6} {result['error']}")
+                continue
+            print(f"{engine:<10}{mode:<6}{result['pages']:>7}{result['ms_per_page']:>11.1f}{result['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
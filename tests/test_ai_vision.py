@@ -0,0 +1,425 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+from PIL import Image
+from unittest.mock import patch
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from config import CompanyTemplate, CropArea
+from services.ai_vision import AIVisionService, TierStats, VisionBackend
+from services.resilience import LatencyTracker
+from services.roster_matcher import RosterMatcher
+
+
+def _crop(page):
+    """A distinct crop per page (page number in the corner pixel, `page` bars of "ink"),
+    so neither the name cache nor duplicate detection answers for another page"""
+    image = Image.new("RGB", (100, 40), "white")
+    for bar in range(page):
+        image.paste((0, 0, 0), (10 + 8 * bar, 10, 14 + 8 * bar, 30))
+    image.putpixel((0, 0), (page, page, page))
+    return image
+
+
+def _template():
+    return CompanyTemplate(
+        company_id="test",
+        company_name="Test Ltd",
+        name_crop_area=CropArea(x=0, y=0, width=100, height=40),
+        employee_emails={"ישראל ישראלי": "israel@example.com", "דנה כהן": "dana@example.com"},
+    )
+
+
+class TestProcessPayslipPipeline:
+    """Test the streaming page pipeline with the PDF renderer and AI call stubbed out"""
+
+    def setup_method(self):
+        with patch.dict(os.environ, {"VISION_MAX_IN_FLIGHT": "2", "VISION_LOCAL_OCR": "false", "ENVIRONMENT": "test"}):
+            self.service = AIVisionService()
+
+    @pytest.mark.asyncio
+    async def test_results_are_matched_and_sorted(self):
+        names = iter(["ישראל ישראלי", "דנה כהן", "משה אחר"])
+        crops = [(page, _crop(page)) for page in range(1, 4)]
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)), \
+             patch.object(self.service, "_extract_name_with_ai", side_effect=lambda image: next(names)):
+            results = await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert [r["page"] for r in results] == [1, 2, 3]
+        assert results[0]["employee_email"] == "israel@example.com"
+        assert results[1]["employee_email"] == "dana@example.com"
+        assert results[2]["found_match"] is False
+        assert {r["source"] for r in results} == {"vision"}
+
+    @pytest.mark.asyncio
+    async def test_repeat_run_is_answered_from_cache(self):
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service, "_extract_name_with_ai", return_value="דנה כהן") as extract:
+            for _ in range(2):
+                with patch.object(self.service.pdf_service, "iter_region",
+                                  return_value=iter([(page, _crop(page)) for page in (1, 2)])):
+                    results = await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert extract.call_count == 2
+        assert [r["source"] for r in results] == ["cache", "cache"]
+        assert self.service.name_cache.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_text_layer_pages_skip_vision(self):
+        # Page 1 has the name in visual order, page 2 only a label, page 3 no text
+        page_texts = {1: "ןהכ הנד", 2: "שם העובד:"}
+        crops = [(page, _crop(page)) for page in (2, 3)]
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value=page_texts), \
+             patch.object(self.service.pdf_service, "get_total_pages", return_value=3), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)) as iter_region, \
+             patch.object(self.service, "_extract_name_with_ai", return_value="ישראל ישראלי") as extract:
+            results = await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert iter_region.call_args.kwargs["page_numbers"] == [2, 3]
+        assert extract.call_count == 2
+        assert [r["source"] for r in results] == ["text_layer", "vision", "vision"]
+        assert results[0]["employee_email"] == "dana@example.com"
+
+    @pytest.mark.asyncio
+    async def test_text_layer_is_not_trusted_without_a_roster(self):
+        # Nothing to tell the label on page 1 from a name, so every page goes to vision
+        template = _template()
+        template.employee_emails = {}
+        crops = [(page, _crop(page)) for page in (1, 2)]
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={1: "שם העובד"}) as text, \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)), \
+             patch.object(self.service, "_extract_name_with_ai", return_value="דנה כהן"):
+            results = await self.service.process_payslip_pdf("unused.pdf", template)
+
+        assert text.call_count == 0
+        assert [r["source"] for r in results] == ["vision", "vision"]
+
+    @pytest.mark.asyncio
+    async def test_in_flight_pages_are_bounded(self):
+        state = {"active": 0, "peak": 0}
+
+        async def slow_extract(image):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.02)
+            state["active"] -= 1
+            return "דנה כהן"
+
+        crops = ((page, _crop(page)) for page in range(1, 11))
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=crops), \
+             patch.object(self.service, "_extract_name_with_ai", side_effect=slow_extract):
+            results = await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert len(results) == 10
+        assert state["peak"] == 2
+
+
+    @pytest.mark.asyncio
+    async def test_results_stream_in_completion_order(self):
+        page_two_out = asyncio.Event()
+
+        async def extract(image):
+            # Page 1 can't finish until page 2 has come out - a pipeline that waits
+            # for page order times out here instead
+            if image.getpixel((0, 0))[0] == 1:
+                await asyncio.wait_for(page_two_out.wait(), timeout=5)
+            return "דנה כהן"
+
+        crops = [(page, _crop(page)) for page in (1, 2)]
+        pages = []
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)), \
+             patch.object(self.service, "_extract_name_with_ai", side_effect=extract):
+            async for result in self.service.iter_payslip_results("unused.pdf", _template()):
+                pages.append(result["page"])
+                if result["page"] == 2:
+                    page_two_out.set()
+
+        assert pages == [2, 1]
+
+
+    @pytest.mark.asyncio
+    async def test_a_compiled_matcher_is_used_as_given(self):
+        template = _template()
+        matcher = RosterMatcher(template.employee_emails)
+        crops = [(page, _crop(page)) for page in (1, 2)]
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)), \
+             patch.object(self.service, "_extract_name_with_ai", return_value="דנה כהן"), \
+             patch.object(self.service.matchers, "get") as cache_lookup:
+            results = await self.service.process_payslip_pdf("unused.pdf", template, matcher=matcher)
+
+        cache_lookup.assert_not_called()
+        assert [r["employee_email"] for r in results] == ["dana@example.com", "dana@example.com"]
+
+
+    @pytest.mark.asyncio
+    async def test_repeated_crops_share_one_vision_call(self):
+        # Page 3 repeats page 1's name box (e.g. a payslip continued on a second page)
+        crops = [(1, _crop(1)), (2, _crop(2)), (3, _crop(1))]
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)), \
+             patch.object(self.service, "_extract_name_with_ai", return_value="דנה כהן") as extract:
+            results = await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert extract.call_count == 2
+        assert [r["page"] for r in results] == [1, 2, 3]
+        assert results[2]["duplicate_of"] == 1
+        assert results[2]["employee_email"] == "dana@example.com"
+
+
+    @pytest.mark.asyncio
+    async def test_blank_crops_are_skipped_without_a_call(self):
+        crops = [(1, _crop(1)), (2, Image.new("RGB", (100, 40), "white"))]
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)), \
+             patch.object(self.service, "_extract_name_with_ai", return_value="דנה כהן") as extract:
+            results = await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert extract.call_count == 1
+        assert results[1]["source"] == "skipped"
+        assert results[1]["skip_reason"] == "blank"
+        assert results[1]["found_match"] is False
+
+
+class TestOpenRouterClient:
+    """Test the shared OpenRouter client against a mocked transport"""
+
+    @pytest.mark.asyncio
+    async def test_pages_share_one_client(self):
+        service = AIVisionService()
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": " דנה כהן "}}]})
+
+        service.client = httpx.AsyncClient(base_url=service.base_url, transport=httpx.MockTransport(handler))
+        image = Image.new("RGB", (100, 40), "white")
+        try:
+            names = await asyncio.gather(*(service._extract_name_with_ai(image) for _ in range(3)))
+        finally:
+            await service.close()
+
+        assert names == ["דנה כהן"] * 3
+        assert [request.url.path for request in requests] == ["/api/v1/chat/completions"] * 3
+        assert service.client is None
+
+    @pytest.mark.asyncio
+    async def test_waiting_for_the_limiter_does_not_hedge(self):
+        with patch.dict(os.environ, {"VISION_HEDGING": "true", "VISION_CONCURRENCY_INITIAL": "1",
+                                     "VISION_CONCURRENCY_MAX": "1"}):
+            service = AIVisionService()
+        # p95 of 0.1s; each request takes 0.02s but ten of them queue behind a limit of one
+        tracker = service.latencies.setdefault(1, LatencyTracker())
+        for _ in range(tracker.min_samples):
+            tracker.record(0.1)
+        requests = []
+
+        async def handler(request):
+            requests.append(request)
+            await asyncio.sleep(0.02)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "דנה כהן"}}]})
+
+        service.client = httpx.AsyncClient(base_url=service.base_url, transport=httpx.MockTransport(handler))
+        image = Image.new("RGB", (100, 40), "white")
+        try:
+            names = await asyncio.gather(*(service._extract_name_with_ai(image) for _ in range(10)))
+        finally:
+            await service.close()
+
+        assert names == ["דנה כהן"] * 10
+        assert len(requests) == 10
+
+    @pytest.mark.asyncio
+    async def test_hedges_stay_within_the_concurrency_limit(self):
+        with patch.dict(os.environ, {"VISION_HEDGING": "true", "VISION_CONCURRENCY_INITIAL": "2",
+                                     "VISION_CONCURRENCY_MAX": "2"}):
+            service = AIVisionService()
+        # p95 of 0.02s, so every 0.2s request is due a hedge
+        tracker = service.latencies.setdefault(1, LatencyTracker())
+        for _ in range(tracker.min_samples):
+            tracker.record(0.02)
+        in_flight = peak = requests = 0
+        # The first request hangs and its hedge comes straight back; the rest are all slow
+        delays = iter([0.2, 0.0])
+
+        async def handler(request):
+            nonlocal in_flight, peak, requests
+            requests += 1
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                await asyncio.sleep(next(delays, 0.2))
+            finally:
+                in_flight -= 1
+            return httpx.Response(200, json={"choices": [{"message": {"content": "דנה כהן"}}]})
+
+        service.client = httpx.AsyncClient(base_url=service.base_url, transport=httpx.MockTransport(handler))
+        image = Image.new("RGB", (100, 40), "white")
+        try:
+            # One call alone - a slot is free, so the hedge goes out and wins
+            assert await service._extract_name_with_ai(image) == "דנה כהן"
+            assert requests == 2
+            # Four at once fill both slots - none of them is hedged
+            requests = 0
+            names = await asyncio.gather(*(service._extract_name_with_ai(image) for _ in range(4)))
+        finally:
+            await service.close()
+
+        assert names == ["דנה כהן"] * 4
+        assert requests == 4
+        assert peak <= 2
+
+    @pytest.mark.asyncio
+    async def test_transient_errors_are_retried(self):
+        with patch.dict(os.environ, {"VISION_RETRY_BASE_SECONDS": "0.001"}):
+            service = AIVisionService()
+        statuses = iter([503, 200])
+
+        def handler(request):
+            return httpx.Response(next(statuses), json={"choices": [{"message": {"content": "דנה כהן"}}]})
+
+        service.client = httpx.AsyncClient(base_url=service.base_url, transport=httpx.MockTransport(handler))
+        try:
+            assert await service._extract_name_with_ai(Image.new("RGB", (100, 40), "white")) == "דנה כהן"
+        finally:
+            await service.close()
+        assert service.limiter.stats()["overloads"] == 1
+
+
+class TestBatchedRequests:
+    """Test packing several crops into one vision request"""
+
+    def setup_method(self):
+        with patch.dict(os.environ, {"VISION_BATCH_SIZE": "3", "VISION_LOCAL_OCR": "false", "ENVIRONMENT": "test"}):
+            self.service = AIVisionService()
+        self.requests = []
+
+    def _client(self, batch_answer):
+        def handler(request):
+            content = json.loads(request.content)["messages"][0]["content"]
+            images = [part for part in content if part["type"] == "image_url"]
+            self.requests.append(len(images))
+            answer = batch_answer(len(images)) if len(images) > 1 else "דנה כהן"
+            return httpx.Response(200, json={"choices": [{"message": {"content": answer}}]})
+
+        return httpx.AsyncClient(base_url=self.service.base_url, transport=httpx.MockTransport(handler))
+
+    async def _run(self, pages):
+        crops = [(page, _crop(page)) for page in range(1, pages + 1)]
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)):
+            try:
+                return await self.service.process_payslip_pdf("unused.pdf", _template())
+            finally:
+                await self.service.close()
+
+    @pytest.mark.asyncio
+    async def test_crops_are_sent_in_batches(self):
+        def answer(count):
+            names = ["ישראל ישראלי", "", "דנה כהן"]
+            return "```json\n" + json.dumps([{"slot": i + 1, "name": names[i]} for i in range(count)]) + "\n```"
+
+        self.service.client = self._client(answer)
+        results = await self._run(5)
+
+        assert sorted(self.requests) == [2, 3]
+        assert [r["employee_email"] for r in results if r["found_match"]] == ["israel@example.com", "dana@example.com", "israel@example.com"]
+        assert results[1]["extracted_name"] == "לא זוהה"
+
+    @pytest.mark.asyncio
+    async def test_unparseable_batch_falls_back_to_single_crops(self):
+        self.service.client = self._client(lambda count: "Sorry, I can only read one image.")
+        results = await self._run(3)
+
+        assert self.requests == [3, 1, 1, 1]
+        assert all(r["employee_email"] == "dana@example.com" for r in results)
+
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_reported_without_single_crop_requests(self):
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(400, json={"error": "bad request"})
+
+        self.service.client = httpx.AsyncClient(base_url=self.service.base_url, transport=httpx.MockTransport(handler))
+        results = await self._run(3)
+
+        assert len(self.requests) == 1
+        assert all("error" in r and not r["found_match"] for r in results)
+
+class FakeLocalBackend(VisionBackend):
+    """A local tier that answers from a fixed page -> (name, confidence) table"""
+    name = "fake-ocr"
+
+    def __init__(self, answers):
+        self.answers = answers
+
+    async def extract_names(self, images):
+        return [self.answers[image.getpixel((0, 0))[0]] for image in images]
+
+
+class TestTieredExtraction:
+    """Test the local OCR tier settling crops before anything goes to OpenRouter"""
+
+    def setup_method(self):
+        with patch.dict(os.environ, {"VISION_LOCAL_OCR": "false", "ENVIRONMENT": "test"}):
+            self.service = AIVisionService()
+
+    def _use_local(self, answers):
+        self.service.local_backend = FakeLocalBackend(answers)
+        self.service.tier_stats["fake-ocr"] = TierStats()
+
+    @pytest.mark.asyncio
+    async def test_low_confidence_and_off_roster_reads_escalate(self):
+        self._use_local({
+            1: ("ישראל ישראלי", 92.0),  # Confident and on the roster - accepted
+            2: ("דנה כהן", 40.0),       # Below the template's threshold
+            3: ("משה אחר", 95.0),       # Confident but not on the roster
+        })
+        crops = [(page, _crop(page)) for page in range(1, 4)]
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter(crops)), \
+             patch.object(self.service, "_extract_name_with_ai", return_value="דנה כהן") as extract:
+            results = await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert [r["source"] for r in results] == ["ocr", "vision", "vision"]
+        assert extract.call_count == 2
+        report = self.service.tier_report()
+        assert report["fake-ocr"]["pages"] == 3
+        assert report["fake-ocr"]["accepted"] == 1
+        assert report["fake-ocr"]["escalated"] == 2
+        assert report["openrouter"]["pages"] == 2
+
+    @pytest.mark.asyncio
+    async def test_local_reads_are_not_cached(self):
+        self._use_local({1: ("ישראל ישראלי", 99.0)})
+
+        with patch.object(self.service.pdf_service, "extract_region_text", return_value={}), \
+             patch.object(self.service.pdf_service, "iter_region", return_value=iter([(1, _crop(1))])):
+            await self.service.process_payslip_pdf("unused.pdf", _template())
+
+        assert self.service.name_cache.stats()["entries"] == 0
+
+    def test_incomplete_tier_fails_when_created(self):
+        class NoExtract(VisionBackend):
+            name = "broken"
+
+        with pytest.raises(TypeError):
+            NoExtract()
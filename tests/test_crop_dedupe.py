@@ -0,0 +1,44 @@
+import os
+import sys
+
+from PIL import Image, ImageDraw
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.crop_dedupe import CropClusters, dhash
+
+
+def _name_crop(bars, offset=0):
+    """A crop with "letters" as bars of the given heights, starting `offset` px in"""
+    image = Image.new("L", (300, 60), 255)
+    draw = ImageDraw.Draw(image)
+    for index, height in enumerate(bars):
+        x = 20 + offset + index * 14
+        draw.rectangle((x, 50 - height, x + 8, 50), fill=20)
+    return image
+
+
+class TestCropClusters:
+    """Test grouping of repeated name crops within a document"""
+
+    def test_identical_and_shifted_crops_join_the_first_page(self):
+        clusters = CropClusters()
+        name = [30, 20, 35, 25, 30]
+
+        assert clusters.assign(1, _name_crop(name)) is None
+        assert clusters.assign(2, _name_crop(name)) == 1
+        # Same name drawn a few pixels further along the name box
+        assert clusters.assign(3, _name_crop(name, offset=6)) == 1
+        assert clusters.duplicates == 2
+
+    def test_names_one_letter_apart_stay_separate(self):
+        clusters = CropClusters(max_distance=8)
+
+        assert clusters.assign(1, _name_crop([30, 20, 35, 25, 30])) is None
+        assert clusters.assign(2, _name_crop([30, 20, 35, 25, 15])) is None
+        assert clusters.duplicates == 0
+
+    def test_dhash_ignores_position(self):
+        name = [10, 40, 25]
+        assert dhash(_name_crop(name)) == dhash(_name_crop(name, offset=30))
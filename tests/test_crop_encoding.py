@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.crop_encoding import PROFILES, encode_crop, get_profile, prepare_crop, to_data_url
+
+
+def _name_crop():
+    """A 600x150 crop with a dark 200x60 'name' block and a light table rule under it"""
+    image = Image.new("RGB", (600, 150), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 40, 299, 99), fill=(30, 30, 30))
+    draw.line((0, 140, 600, 140), fill=(200, 200, 200), width=2)
+    return image
+
+
+class TestCropEncoding:
+    """Test crop preparation and compression profiles"""
+
+    def test_png_profile_keeps_crop_as_is(self):
+        assert prepare_crop(_name_crop(), PROFILES["png"]).size == (600, 150)
+        assert to_data_url(_name_crop(), PROFILES["png"]).startswith("data:image/png;base64,")
+
+    def test_trim_and_downscale(self):
+        image = prepare_crop(_name_crop(), PROFILES["gray"])
+        assert image.mode == "L"
+        # 200x60 of ink plus 4 px padding, scaled down to 64 px high
+        assert image.size == (round(208 * 64 / 68), 64)
+
+    def test_compact_profile_is_smaller_webp(self):
+        data, mime_type = encode_crop(_name_crop(), PROFILES["compact"])
+        assert mime_type == "image/webp"
+        assert len(data) < len(encode_crop(_name_crop(), PROFILES["png"])[0])
+
+    def test_unknown_profile_is_rejected(self):
+        with pytest.raises(ValueError):
+            get_profile("tiff")
@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.hebrew_text import is_usable_name, normalize_hebrew, normalize_name, reverse_visual
+
+
+class TestNormalizeHebrew:
+    """Test clean-up of names read from PDF text layers"""
+
+    def test_logical_order_is_kept(self):
+        assert normalize_hebrew("  דנה   כהן\n") == "דנה כהן"
+
+    def test_visual_order_is_reversed(self):
+        # Final forms at the start of words give reversed text away
+        assert normalize_hebrew("ןהכ הנד") == "דנה כהן"
+
+    def test_bidi_controls_are_stripped(self):
+        assert normalize_hebrew("\u200fישראל ישראלי\u200e") == "ישראל ישראלי"
+
+    def test_reverse_visual_round_trips(self):
+        assert reverse_visual(reverse_visual("ישראל ישראלי")) == "ישראל ישראלי"
+
+    def test_usable_name_needs_letters(self):
+        assert is_usable_name("דנה")
+        assert not is_usable_name("12/2024 :")
+
+
+class TestNormalizeName:
+    """Test folding names to the form they are compared in"""
+
+    def test_niqqud_geresh_and_final_forms_are_folded(self):
+        assert normalize_name("גִ'ורְג' כֹּהֵן") == normalize_name("ג׳ורג׳ כהן") == "גורג כהנ"
+
+    def test_maqaf_and_punctuation_split_words(self):
+        assert normalize_name("בן־גוריון") == "בנ גוריונ"
+        assert normalize_name("Dana  COHEN-Levi") == "dana cohen levi"
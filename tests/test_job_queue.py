@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobWorkerPool, job_status
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_running=1, stale_seconds=60, max_attempts=2)
+
+
+class TestJobQueue:
+    """Test claiming, limits and recovery of queued jobs"""
+
+    def test_jobs_are_claimed_oldest_first_within_the_running_limit(self, queue):
+        first = queue.enqueue("preview", "u1", {"n": 1}, pages_total=3)
+        second = queue.enqueue("preview", "u1", {"n": 2}, pages_total=5)
+
+        job = queue.claim()
+        assert job["id"] == first
+        assert job["payload"] == {"n": 1}
+        assert job["status"] == RUNNING
+        # max_running=1 - the second job waits until the first finishes
+        assert queue.claim() is None
+
+        queue.finish(first, 1, 3)
+        assert queue.claim()["id"] == second
+        assert queue.stats() == {QUEUED: 0, RUNNING: 1, DONE: 1, FAILED: 0}
+
+    def test_abandoned_jobs_are_claimed_again(self, queue):
+        job_id = queue.enqueue("preview", "u1", {})
+        queue.claim()
+        with queue._connect() as db:
+            db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 120, job_id))
+
+        job = queue.claim()
+        assert job["id"] == job_id
+        assert job["attempts"] == 2
+
+    def test_the_first_attempt_cannot_close_a_reclaimed_job(self, queue):
+        job_id = queue.enqueue("preview", "u1", {})
+        queue.claim()
+        with queue._connect() as db:
+            db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 120, job_id))
+        queue.claim()
+
+        assert not queue.update_progress(job_id, 1, 5)
+        assert not queue.fail(job_id, 1, "worker lost")
+        assert queue.get(job_id)["status"] == RUNNING
+        assert queue.finish(job_id, 2, 3)
+        assert queue.get(job_id)["status"] == DONE
+
+    def test_jobs_abandoned_max_attempts_times_are_failed(self, queue):
+        job_id = queue.enqueue("preview", "u1", {})
+        for _ in range(2):
+            assert queue.claim()["id"] == job_id
+            with queue._connect() as db:
+                db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - 120, job_id))
+
+        assert queue.claim() is None
+        job = queue.get(job_id)
+        assert job["status"] == FAILED
+        assert job["error"] == "Gave up after 2 attempts"
+
+    def test_status_reports_progress_and_eta(self, queue):
+        job_id = queue.enqueue("preview", "u1", {}, pages_total=10)
+        queue.claim()
+        with queue._connect() as db:
+            db.execute("UPDATE jobs SET started_at = ? WHERE id = ?", (time.time() - 8, job_id))
+        queue.update_progress(job_id, 1, 4)
+
+        status = job_status(queue.get(job_id))
+        assert status["pages_done"] == 4
+        assert status["eta_seconds"] == pytest.approx(12, abs=0.5)
+
+
+class TestJobWorkerPool:
+    """Test running claimed jobs through their handlers"""
+
+    @pytest.mark.asyncio
+    async def test_handler_result_and_failure_are_recorded(self, queue):
+        async def handler(job, progress):
+            if job["payload"].get("broken"):
+                raise ValueError("bad PDF")
+            for page in range(1, 4):
+                progress(page)
+            return 3
+
+        pool = JobWorkerPool(queue, {"preview": handler}, progress_interval=0)
+        good = queue.enqueue("preview", "u1", {}, pages_total=3)
+        await pool.run_job(queue.claim())
+        bad = queue.enqueue("preview", "u1", {"broken": True})
+        await pool.run_job(queue.claim())
+
+        assert queue.get(good)["status"] == DONE
+        assert queue.get(good)["pages_done"] == 3
+        assert queue.get(bad)["status"] == FAILED
+        assert queue.get(bad)["error"] == "bad PDF"
+
+    @pytest.mark.asyncio
+    async def test_slow_pages_keep_the_job_alive(self, tmp_path):
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_running=2, stale_seconds=0.2)
+
+        async def handler(job, progress):
+            # No progress for well over stale_seconds
+            await asyncio.sleep(0.6)
+            return 1
+
+        pool = JobWorkerPool(queue, {"preview": handler}, progress_interval=0.05)
+        job_id = queue.enqueue("preview", "u1", {}, pages_total=1)
+        running = asyncio.create_task(pool.run_job(queue.claim()))
+        await asyncio.sleep(0.4)
+        assert queue.claim() is None
+
+        await running
+        job = queue.get(job_id)
+        assert job["status"] == DONE
+        assert job["attempts"] == 1
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.name_cache import NameCache
+
+
+class TestNameCache:
+    """Test the memory and disk tiers of the extracted-name cache"""
+
+    def test_key_depends_on_model_and_prompt(self):
+        key = NameCache.make_key(b"pixels", "model-a", "1")
+        assert key == NameCache.make_key(b"pixels", "model-a", "1")
+        assert key != NameCache.make_key(b"pixels", "model-b", "1")
+        assert key != NameCache.make_key(b"pixels", "model-a", "2")
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        cache = NameCache(max_entries=2)
+        cache.put("a", "דנה כהן")
+        cache.put("b", "ישראל ישראלי")
+        cache.get("a")
+        cache.put("c", "משה לוי")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "דנה כהן"
+        assert cache.stats()["memory_hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+    def test_memory_tier_is_safe_across_threads(self):
+        cache = NameCache(max_entries=8)
+
+        def use(n):
+            key = str(n % 32)
+            cache.put(key, f"name {key}")
+            found = cache.get(key)
+            assert found in (None, f"name {key}")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(use, range(2000)))
+
+        stats = cache.stats()
+        assert stats["entries"] == 8
+        assert stats["memory_hits"] + stats["misses"] == 2000
+
+    def test_disk_tier_survives_restart_and_expires(self, tmp_path):
+        NameCache(disk_dir=str(tmp_path)).put("a", "דנה כהן")
+
+        restarted = NameCache(disk_dir=str(tmp_path))
+        assert restarted.get("a") == "דנה כהן"
+        assert restarted.stats()["disk_hits"] == 1
+
+        old = time.time() - 3600
+        os.utime(tmp_path / "a.txt", (old, old))
+        assert NameCache(disk_dir=str(tmp_path), ttl_seconds=60).get("a") is None
+        assert not (tmp_path / "a.txt").exists()
+
+    def test_disk_tier_drops_oldest_entries_over_size_limit(self, tmp_path):
+        cache = NameCache(disk_dir=str(tmp_path), max_disk_bytes=30)
+        now = time.time()
+        for index, key in enumerate(["a", "b", "c"]):
+            cache.put(key, "x" * 12)
+            os.utime(tmp_path / f"{key}.txt", (now - 10 + index, now - 10 + index))
+        cache._evict_disk()
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["b.txt", "c.txt"]
@@ -0,0 +1,84 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.page_assignment import assign_pages, solve_assignment
+from services.roster_matcher import RosterMatcher
+
+ROSTER = {
+    "דנה כהן": "dana@example.com",
+    "דנה כהנא": "dana.k@example.com",
+    "משה לוי": "moshe@example.com",
+}
+
+
+def _result(page, name, matcher, **extra):
+    """A preview result as the page-by-page matcher would build it"""
+    match = matcher.match(name)
+    return dict({
+        "page": page,
+        "found_match": match.found,
+        "extracted_name": name,
+        "employee_name": match.employee_name,
+        "employee_email": match.employee_email,
+        "match_score": match.score,
+        "candidates": [{"employee_name": n, "score": s} for n, s in match.candidates],
+    }, **extra)
+
+
+class TestSolveAssignment:
+    """Test the Hungarian solver against brute force"""
+
+    def test_matches_brute_force_on_small_matrices(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            rows = int(rng.integers(1, 5))
+            cols = int(rng.integers(rows, 6))
+            cost = rng.integers(0, 20, size=(rows, cols)).astype(float)
+            chosen = solve_assignment(cost)
+            best = min(sum(cost[r, p[r]] for r in range(rows)) for p in itertools.permutations(range(cols), rows))
+            assert len(set(chosen.tolist())) == rows
+            assert cost[np.arange(rows), chosen].sum() == best
+
+
+class TestAssignPages:
+    """Test document-level matching of pages to employees"""
+
+    def setup_method(self):
+        self.matcher = RosterMatcher(ROSTER)
+
+    def test_contested_employee_goes_to_the_better_page(self):
+        # Both pages match "דנה כהן" best on their own; page 2 is really "דנה כהנא"
+        results = [_result(1, "דנה כהן", self.matcher), _result(2, "דנה כהנ", self.matcher)]
+        assert results[1]["employee_name"] == "דנה כהן"
+
+        assign_pages(results, self.matcher)
+
+        assert results[0]["employee_name"] == "דנה כהן"
+        assert results[1]["employee_name"] == "דנה כהנא"
+        assert results[1]["assignment"] == "reassigned"
+        assert results[1]["conflict_pages"] == [1]
+
+    def test_employee_may_keep_several_pages_when_allowed(self):
+        results = [_result(1, "משה לוי", self.matcher), _result(2, "משה לוי", self.matcher)]
+        assign_pages(results, self.matcher, max_pages_per_employee=1)
+        assert [r["found_match"] for r in results].count(True) == 1
+        assert "unassigned" in [r["assignment"] for r in results]
+
+        results = [_result(1, "משה לוי", self.matcher), _result(2, "משה לוי", self.matcher)]
+        assign_pages(results, self.matcher, max_pages_per_employee=2)
+        assert all(r["employee_email"] == "moshe@example.com" for r in results)
+
+    def test_duplicate_pages_follow_their_original(self):
+        results = [
+            _result(1, "משה לוי", self.matcher),
+            _result(2, "משה לוי", self.matcher, duplicate_of=1),
+        ]
+        assign_pages(results, self.matcher)
+        assert results[1]["employee_email"] == "moshe@example.com"
+        assert results[1]["assignment"] == results[0]["assignment"] == "ok"
@@ -0,0 +1,45 @@
+import os
+import random
+import sys
+
+from PIL import Image, ImageDraw
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.page_filter import BlankPageFilter, ink_stats
+
+
+def _blank_scan(speckles=60, seed=1):
+    """An off-white crop with scanner dust, like the blank back of a duplex scan"""
+    image = Image.new("L", (700, 120), 245)
+    rng = random.Random(seed)
+    for _ in range(speckles):
+        image.putpixel((rng.randrange(700), rng.randrange(120)), 40)
+    return image
+
+
+def _short_name():
+    """A short dark word in a wide name box"""
+    image = Image.new("L", (700, 120), 255)
+    ImageDraw.Draw(image).rectangle((300, 40, 380, 75), fill=20)
+    return image
+
+
+class TestBlankPageFilter:
+    """Test spotting crops with nothing worth sending to the AI"""
+
+    def test_ink_stats(self):
+        stats = ink_stats(_short_name())
+        assert stats.coverage == (81 * 36) / (700 * 120)
+        assert stats.stddev > 20
+
+    def test_blank_and_speckled_crops_are_skipped(self):
+        page_filter = BlankPageFilter()
+        assert page_filter.skip_reason(Image.new("RGB", (700, 120), "white")) == "blank"
+        assert page_filter.skip_reason(_blank_scan()) == "blank"
+
+    def test_crops_with_a_name_are_kept(self):
+        page_filter = BlankPageFilter()
+        assert page_filter.skip_reason(_short_name()) is None
+        assert page_filter.skip_reason(_short_name().convert("RGB")) is None
@@ -0,0 +1,234 @@
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.config import CropArea
+from app.services.pdf_service import PageRenderer, PDFService, page_ranges, region_to_cropbox
+
+
+def _write_pdf(path, rotations):
+    """Write a PDF with a black 100x50 pt box at (100, 142) from each page's top-left"""
+    writer = PdfWriter()
+    for rotation in rotations:
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        content.set_data(b"0 g 100 600 100 50 re f")
+        page[NameObject("/Contents")] = writer._add_object(content)
+        if rotation:
+            page.rotate(rotation)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def _write_text_pdf(path, pages):
+    """Write a PDF with one Helvetica text run per (x, y, text) entry, y from the page bottom"""
+    writer = PdfWriter()
+    for runs in pages:
+        page = writer.add_blank_page(612, 792)
+        font = DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        })
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+        })
+        content = DecodedStreamObject()
+        content.set_data(b"".join(b"BT /F1 12 Tf %d %d Td (%s) Tj ET\n" % (x, y, text.encode()) for x, y, text in runs))
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def _blank_page(rotation: int = 0):
+    """Create a single US-letter page (612x792 pt) with the given rotation"""
+    writer = PdfWriter()
+    page = writer.add_blank_page(612, 792)
+    if rotation:
+        page.rotate(rotation)
+    return page
+
+
+class TestRegionCropBox:
+    """Test mapping of page crop areas to PDF crop boxes"""
+
+    def setup_method(self):
+        # 72x36 pt, starting 1 inch from the top-left
+        self.crop_area = CropArea(x=72, y=72, width=72, height=36)
+
+    def test_unrotated_page(self):
+        box = region_to_cropbox(_blank_page(), self.crop_area)
+        assert [float(v) for v in box] == pytest.approx([72, 684, 144, 720])
+
+    def test_rotated_page_maps_to_unrotated_user_space(self):
+        box = region_to_cropbox(_blank_page(90), self.crop_area)
+        # Displayed top-left runs along the unrotated bottom-left edge
+        assert [float(v) for v in box] == pytest.approx([72, 72, 108, 144])
+
+    def test_crop_box_is_clamped_to_media_box(self):
+        oversized = CropArea(x=576, y=-24, width=240, height=96)
+        box = region_to_cropbox(_blank_page(), oversized)
+        assert float(box.right) == pytest.approx(612)
+        assert float(box.top) == pytest.approx(792)
+
+
+class TestCropAreaUnits:
+    """Test page-relative crop areas and adaptive render resolution"""
+
+    def test_legacy_pixel_config_is_migrated_to_points(self):
+        crop_area = CropArea.from_dict({"x": 300, "y": 600, "width": 600, "height": 150})
+        assert crop_area.units == "pt"
+        assert (crop_area.x, crop_area.y, crop_area.width, crop_area.height) == pytest.approx((72, 144, 144, 36))
+
+    def test_point_config_is_loaded_as_is(self):
+        crop_area = CropArea.from_dict({"x": 72, "y": 144, "width": 144, "height": 36, "units": "pt"})
+        assert crop_area.to_pixels(150) == (150, 300, 450, 375)
+
+    def test_render_dpi_is_lowest_legible_resolution(self):
+        pdf_service = PDFService()
+        # 36 pt tall: 40 px needs 80 DPI, clamped up to the minimum
+        assert pdf_service.pick_render_dpi(CropArea(x=0, y=0, width=144, height=36), 40) == 100
+        # 18 pt tall: 40 px needs 160 DPI, rounded up to 175
+        assert pdf_service.pick_render_dpi(CropArea(x=0, y=0, width=144, height=18), 40) == 175
+        # Tiny crops never render above the default resolution
+        assert pdf_service.pick_render_dpi(CropArea(x=0, y=0, width=144, height=2), 40) == 300
+
+
+class TestSplitPages:
+    """Test splitting a document into single-page PDFs"""
+
+    def test_split_to_disk_and_memory(self, tmp_path):
+        pdf_path = str(tmp_path / "sample.pdf")
+        _write_pdf(pdf_path, [0, 90, 0])
+        pdf_service = PDFService()
+
+        on_disk = dict(pdf_service.split_pages(pdf_path, [3, 2], str(tmp_path)))
+        assert sorted(on_disk) == [2, 3]
+        assert len(PdfReader(on_disk[2]).pages) == 1
+        assert PdfReader(on_disk[2]).pages[0].rotation == 90
+
+        in_memory = dict(pdf_service.split_pages(pdf_path, [1]))
+        assert in_memory[1].startswith(b"%PDF")
+
+
+class TestInspect:
+    """Test reading document metadata without rendering"""
+
+    def test_page_geometry_and_text_layer(self, tmp_path):
+        scanned = str(tmp_path / "scanned.pdf")
+        _write_pdf(scanned, [0, 90])
+        info = PDFService().inspect(scanned)
+
+        assert info.page_count == 2 and not info.encrypted
+        assert (info.pages[1].width, info.pages[1].height, info.pages[1].rotation) == (792, 612, 90)
+        assert not info.has_text_layer
+        # Two letter pages at 72 DPI, then a 72x36 pt crop of each at 144 DPI
+        assert info.render_megapixels(72) == pytest.approx(2 * 612 * 792 / 1e6)
+        assert info.render_megapixels(144, CropArea(x=0, y=0, width=72, height=36)) == pytest.approx(2 * 144 * 72 / 1e6)
+
+        text = str(tmp_path / "text.pdf")
+        _write_text_pdf(text, [[(100, 700, "Dana Cohen")]])
+        assert PDFService().inspect(text).has_text_layer
+
+    def test_password_protected_document(self, tmp_path):
+        pdf_path = str(tmp_path / "locked.pdf")
+        writer = PdfWriter()
+        writer.add_blank_page(612, 792)
+        writer.encrypt("secret", algorithm="RC4-128")
+        with open(pdf_path, "wb") as f:
+            writer.write(f)
+
+        info = PDFService().inspect(pdf_path)
+        assert info.encrypted and info.needs_password
+        assert PDFService().get_page_count(pdf_path) == 0
+
+
+class TestStreamSources:
+    """Test reading PDFs from spooled upload buffers instead of paths"""
+
+    def test_spooled_buffer_is_inspected_split_and_rendered(self, tmp_path):
+        pdf_path = str(tmp_path / "sample.pdf")
+        _write_pdf(pdf_path, [0, 90])
+        pdf_service = PDFService()
+
+        with tempfile.SpooledTemporaryFile(max_size=1024) as buffer, open(pdf_path, "rb") as f:
+            buffer.write(f.read())
+            # Readers rewind the buffer themselves
+            assert pdf_service.inspect(buffer).page_count == 2
+            assert dict(pdf_service.split_pages(buffer, [2]))[2].startswith(b"%PDF")
+
+            pytest.importorskip("pypdfium2")
+            image = PDFService(renderer="pdfium").render_page(buffer, 2, dpi=72)
+            assert image.size == (792, 612)
+
+
+class TestPooledRendering:
+    """Test that pooled page ranges come back complete and in page order"""
+
+    def test_ranges_are_yielded_in_page_order(self):
+        def fake_convert(pdf_path, dpi, first_page, last_page, **kwargs):
+            # Later ranges finish first to prove results are re-ordered
+            time.sleep(0.001 * (20 - first_page))
+            return [Image.new("L", (1, 1), color=page) for page in range(first_page, last_page + 1)]
+
+        with patch("app.services.pdf_service.convert_from_path", side_effect=fake_convert), \
+             ThreadPoolExecutor(max_workers=3) as pool:
+            ranges = page_ranges(range(1, 21), 8)
+            pages = list(PDFService(renderer="poppler")._iter_pooled_ranges(pool, "unused.pdf", 150, ranges))
+
+        assert [page for page, _ in pages] == list(range(1, 21))
+        assert [image.getpixel((0, 0)) for _, image in pages] == list(range(1, 21))
+
+    def test_page_ranges_split_on_gaps(self):
+        assert page_ranges([1, 2, 3, 5, 6, 9], 2) == [(1, 2), (3, 3), (5, 6), (9, 9)]
+
+    def test_incomplete_renderer_fails_when_created(self):
+        class NoRendering(PageRenderer):
+            name = "broken"
+
+            def extract_region_text(self, pdf_path, crop_area):
+                return {}
+
+        with pytest.raises(TypeError):
+            NoRendering()
+
+
+class TestPdfiumRenderer:
+    """Test the in-process pdfium engine against full-page renders"""
+
+    def setup_method(self):
+        pytest.importorskip("pypdfium2")
+        self.pdf_service = PDFService(renderer="pdfium")
+
+    @pytest.mark.parametrize("rotation", [0, 90])
+    def test_region_matches_crop_of_full_page(self, tmp_path, rotation):
+        pdf_path = str(tmp_path / "sample.pdf")
+        _write_pdf(pdf_path, [rotation])
+        crop_area = CropArea(x=90, y=130, width=130, height=80)
+
+        full_page = self.pdf_service.render_page(pdf_path, 1, dpi=144, mode="L")
+        _, region = next(self.pdf_service.iter_region(pdf_path, crop_area, dpi=144, mode="L"))
+
+        expected = full_page.crop(crop_area.to_pixels(144))
+        assert region.size == expected.size
+        assert list(region.getdata()) == list(expected.getdata())
+
+    def test_one_bit_output(self, tmp_path):
+        pdf_path = str(tmp_path / "sample.pdf")
+        _write_pdf(pdf_path, [0, 0])
+        pages = list(self.pdf_service.iter_pages(pdf_path, dpi=72, mode="1"))
+        assert [image.mode for _, image in pages] == ["1", "1"]
+
+    def test_region_text_only_reads_inside_crop_area(self, tmp_path):
+        pdf_path = str(tmp_path / "text.pdf")
+        # Name on page 1 sits 92 pt from the top; page 2 has no text in the area
+        _write_text_pdf(pdf_path, [[(100, 700, "Dana Cohen"), (100, 400, "Salary")], [(100, 400, "Salary")]])
+        crop_area = CropArea(x=90, y=80, width=200, height=30)
+
+        assert self.pdf_service.extract_region_text(pdf_path, crop_area) == {1: "Dana Cohen"}
@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import asyncio
+import importlib
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+from pypdf import PdfReader
+from starlette.datastructures import Headers, UploadFile
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.job_queue import JobQueue
+from tests.test_pdf_service import _write_text_pdf
+
+CONFIG = {
+    "company_id": "acme",
+    "company_name": "Acme",
+    "name_crop_area": {"x": 90, "y": 80, "width": 200, "height": 30, "units": "pt"},
+    "employee_emails": {"Dana Cohen": "dana@example.com"},
+    "global_assignment": True,
+}
+
+
+@pytest.fixture(scope="module")
+def routes(tmp_path_factory):
+    """The routes module, imported with test settings and its databases in a temp dir"""
+    data_dir = tmp_path_factory.mktemp("data")
+    env = {
+        "MAILGUN_API_KEY": "test", "MAILGUN_DOMAIN": "example.com", "MAILGUN_FROM_NAME": "Test",
+        "MAILGUN_FROM_EMAIL": "payroll@example.com", "ENVIRONMENT": "test", "VISION_LOCAL_OCR": "false",
+        "JOB_DB_PATH": str(data_dir / "jobs.sqlite3"),
+        "TEMPLATE_DB_PATH": str(data_dir / "templates.sqlite3"),
+    }
+    cwd = os.getcwd()
+    # The upload directories are created relative to the working directory on import
+    os.chdir(data_dir)
+    try:
+        with patch.dict(os.environ, env):
+            return importlib.import_module("routes")
+    finally:
+        os.chdir(cwd)
+
+
+def _render_name_areas(pdf_path, crop_area, dpi=None, page_numbers=None, **kwargs):
+    """Stand-in for the renderer: a name-like blot per page"""
+    if page_numbers is None:
+        page_numbers = range(1, len(PdfReader(pdf_path).pages) + 1)
+    for page in page_numbers:
+        crop = Image.new("RGB", (100, 40), "white")
+        ImageDraw.Draw(crop).rectangle((10, 10, 60 + page, 30), fill="black")
+        yield page, crop
+
+
+@pytest.fixture
+def client(routes, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(routes.PROCESSING_DIR)
+    # A fresh job queue per test
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(routes, "job_queue", queue)
+    monkeypatch.setattr(routes.job_workers, "queue", queue)
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[routes.get_current_user] = lambda: {"google_user_id": "u1"}
+    with patch.object(routes.auth_service, "check_rate_limit", return_value=(True, 0, 10)), \
+         patch.object(routes.auth_service, "increment_usage"), \
+         patch.object(routes.ai_vision.pdf_service, "iter_region", side_effect=_render_name_areas):
+        yield TestClient(app)
+
+
+@pytest.fixture
+def payslips(tmp_path):
+    """Three pages: two with a text layer naming Dana, one only vision can read"""
+    path = tmp_path / "payslips.pdf"
+    _write_text_pdf(str(path), [[(100, 700, "Dana Cohen")], [(100, 700, "Nobody")], [(100, 700, "Dana Cohen")]])
+    return path.read_bytes()
+
+
+def _events(response):
+    """(event, data) pairs of an SSE response, keepalive comments left out"""
+    events = []
+    for block in response.text.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _saved_files(routes):
+    return sorted(os.listdir(routes.PROCESSING_DIR))
+
+
+class TestPreviewStream:
+    """Test the streamed preview endpoint end to end, with the AI call stubbed out"""
+
+    def _post(self, client, payslips):
+        return client.post("/api/process/acme/preview/stream",
+                           files={"file": ("payslips.pdf", payslips, "application/pdf")},
+                           data={"company_config": json.dumps(CONFIG)})
+
+    def test_events_arrive_in_order(self, routes, client, payslips):
+        with patch.object(routes.ai_vision, "_extract_name_with_ai", return_value="Dana Cohen"):
+            response = self._post(client, payslips)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _events(response)
+        assert [event for event, _ in events] == ["start", "page", "page", "page", "assignment", "summary"]
+        start, summary = events[0][1], events[-1][1]
+        assert start["page_count"] == 3
+        assert sorted(data["page"] for event, data in events if event == "page") == [1, 2, 3]
+        assert [result["page"] for result in events[-2][1]["preview"]] == [1, 2, 3]
+        assert summary["process_id"] == start["process_id"]
+        # Kept for the send step
+        assert _saved_files(routes) == [f"{start['process_id']}.json", f"{start['process_id']}.pdf"]
+
+    def test_a_failing_page_ends_with_an_error_event(self, routes, client, payslips):
+        # Page 2 has no text layer and can't be rendered either way
+        with patch.object(routes.ai_vision.pdf_service, "iter_region", side_effect=RuntimeError("render failed")), \
+             patch.object(routes.ai_vision.pdf_service, "iter_pages", side_effect=RuntimeError("render failed")):
+            response = self._post(client, payslips)
+
+        events = _events(response)
+        assert events[0][0] == "start"
+        assert events[-1] == ("error", {"detail": "Error during preview processing: render failed"})
+        assert _saved_files(routes) == []
+
+    @pytest.mark.asyncio
+    async def test_disconnect_removes_the_saved_pdf(self, routes, client, payslips, tmp_path):
+        never = asyncio.Event()
+
+        async def stuck(image):
+            await never.wait()
+
+        (tmp_path / "upload.pdf").write_bytes(payslips)
+        with patch.object(routes.ai_vision, "_extract_name_with_ai", side_effect=stuck), \
+             open(tmp_path / "upload.pdf", "rb") as upload:
+            file = UploadFile(upload, filename="payslips.pdf", headers=Headers({"content-type": "application/pdf"}))
+            response = await routes.process_payslip_preview_stream(
+                "acme", file, {"google_user_id": "u1"}, json.dumps(CONFIG), None
+            )
+            events = response.body_iterator
+            assert (await events.__anext__()).startswith("event: start")
+            assert len(_saved_files(routes)) == 1
+            # What Starlette does to the body iterator when the client goes away
+            await events.aclose()
+
+        assert _saved_files(routes) == []
+
+
+class TestPreviewJobs:
+    """Test queueing a preview job and polling it, with the worker run by hand"""
+
+    def _enqueue(self, client, payslips):
+        return client.post("/api/process/acme/preview/jobs",
+                           files={"file": ("payslips.pdf", payslips, "application/pdf")},
+                           data={"company_config": json.dumps(CONFIG)})
+
+    def test_job_is_queued_then_done_with_results(self, routes, client, payslips):
+        response = self._enqueue(client, payslips)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        assert response.json()["status_url"] == f"/api/jobs/{job_id}"
+        assert response.json()["pages_total"] == 3
+
+        status = client.get(f"/api/jobs/{job_id}").json()
+        assert (status["status"], status["pages_done"], status["filename"]) == ("queued", 0, "payslips.pdf")
+        assert "preview" not in status
+
+        job = routes.job_queue.claim()
+        assert job["id"] == job_id
+        with patch.object(routes.ai_vision, "_extract_name_with_ai", return_value="Dana Cohen"):
+            asyncio.run(routes.job_workers.run_job(job))
+
+        status = client.get(f"/api/jobs/{job_id}").json()
+        assert (status["status"], status["pages_done"]) == ("done", 3)
+        assert [result["page"] for result in status["preview"]] == [1, 2, 3]
+        assert all(result["employee_email"] == "dana@example.com" for result in status["preview"])
+
+    def test_other_users_and_unknown_ids_get_404(self, routes, client, payslips):
+        job_id = self._enqueue(client, payslips).json()["job_id"]
+
+        client.app.dependency_overrides[routes.get_current_user] = lambda: {"google_user_id": "u2"}
+        assert client.get(f"/api/jobs/{job_id}").status_code == 404
+        client.app.dependency_overrides[routes.get_current_user] = lambda: {"google_user_id": "u1"}
+        assert client.get(f"/api/jobs/{job_id}").status_code == 200
+        assert client.get("/api/jobs/no-such-job").status_code == 404
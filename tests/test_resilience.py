@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.resilience import AdaptiveLimiter, LatencyTracker, RetryPolicy, hedged, parse_retry_after
+
+
+class TestAdaptiveLimiter:
+    """Test the shared AIMD concurrency limit"""
+
+    def test_retry_after_formats(self):
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+        assert parse_retry_after("soon") is None
+
+    @pytest.mark.asyncio
+    async def test_concurrency_stays_within_limit(self):
+        limiter = AdaptiveLimiter(initial=2, max_limit=2)
+        state = {"active": 0, "peak": 0}
+
+        async def call():
+            async with limiter.slot() as slot:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                await asyncio.sleep(0.01)
+                state["active"] -= 1
+                slot.record(httpx.Response(200))
+
+        await asyncio.gather(*(call() for _ in range(8)))
+        assert state["peak"] == 2
+
+    @pytest.mark.asyncio
+    async def test_increases_on_success_and_halves_on_429(self):
+        limiter = AdaptiveLimiter(initial=4, max_limit=32)
+        for _ in range(8):
+            async with limiter.slot() as slot:
+                slot.record(httpx.Response(200))
+        assert limiter.limit > 5
+
+        async with limiter.slot() as slot:
+            slot.record(httpx.Response(429, headers={"Retry-After": "0.05"}))
+        assert int(limiter.limit) == 2
+        assert limiter.stats()["overloads"] == 1
+
+        # New calls wait out the Retry-After
+        started = time.monotonic()
+        async with limiter.slot():
+            pass
+        assert time.monotonic() - started >= 0.04
+
+
+    @pytest.mark.asyncio
+    async def test_burst_of_429s_halves_the_limit_once(self):
+        limiter = AdaptiveLimiter(initial=16, max_limit=32)
+        release = asyncio.Event()
+
+        async def call():
+            async with limiter.slot() as slot:
+                await release.wait()
+                slot.record(httpx.Response(429))
+
+        # Eight calls in flight all hit the same overload
+        calls = [asyncio.create_task(call()) for _ in range(8)]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*calls)
+        assert int(limiter.limit) == 8
+        assert limiter.stats()["overloads"] == 8
+
+        # A call started after the decrease counts as a new overload
+        async with limiter.slot() as slot:
+            slot.record(httpx.Response(429))
+        assert int(limiter.limit) == 4
+
+class TestRetriesAndHedging:
+    """Test backoff retries and hedged duplicate calls"""
+
+    @pytest.mark.asyncio
+    async def test_overload_is_retried_but_client_errors_are_not(self):
+        request = httpx.Request("POST", "https://example.com")
+        responses = iter([503, 429, 200])
+        calls = []
+
+        async def call():
+            status = next(responses)
+            calls.append(status)
+            httpx.Response(status, request=request).raise_for_status()
+            return status
+
+        policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+        assert await policy.run(call) == 200
+        assert calls == [503, 429, 200]
+
+        async def bad_request():
+            httpx.Response(400, request=request).raise_for_status()
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await RetryPolicy(max_attempts=3, base_delay=0.001).run(bad_request)
+
+    @pytest.mark.asyncio
+    async def test_slow_call_is_hedged(self):
+        delays = iter([1.0, 0.01])
+
+        async def call():
+            delay = next(delays)
+            await asyncio.sleep(delay)
+            return delay
+
+        started = time.monotonic()
+        assert await hedged(call, hedge_after=0.02) == 0.01
+        assert time.monotonic() - started < 0.5
+
+    def test_percentile_needs_enough_samples(self):
+        tracker = LatencyTracker(min_samples=20)
+        for latency in range(1, 20):
+            tracker.record(latency / 100)
+        assert tracker.percentile(0.95) is None
+        tracker.record(0.2)
+        assert tracker.percentile(0.95) == pytest.approx(0.2)
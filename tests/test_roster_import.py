@@ -0,0 +1,66 @@
+import io
+import os
+import sys
+
+import pytest
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.roster_import import RosterImportError, import_roster
+
+
+def _import(text: str, encoding: str = "utf-8"):
+    return import_roster(io.BytesIO(text.encode(encoding)))
+
+
+class TestImportRoster:
+    """Test reading employee CSVs into a name -> email roster"""
+
+    def test_bom_crlf_and_quoted_fields(self):
+        result = import_roster(io.BytesIO(
+            '\ufeffשם,אימייל\r\n"כהן, דנה",dana@example.com\r\n"משה ""מושיקו"" לוי",moshe@example.com\r\n'
+            .encode("utf-8")
+        ))
+        assert result.encoding == "utf-8-sig"
+        assert result.employee_emails == {
+            "כהן, דנה": "dana@example.com",
+            'משה "מושיקו" לוי': "moshe@example.com",
+        }
+
+    def test_windows_hebrew_encoding_and_semicolons(self):
+        result = _import("שם;אימייל\nדנה כהן;dana@example.com\n", encoding="cp1255")
+        assert result.encoding == "cp1255"
+        assert result.employee_emails == {"דנה כהן": "dana@example.com"}
+
+    def test_header_columns_are_found_by_name_and_optional(self):
+        result = _import("id,Email,Name\n7,dana@example.com,דנה כהן\n")
+        assert result.employee_emails == {"דנה כהן": "dana@example.com"}
+
+        # No header - the first row already holds an email address
+        result = _import("דנה כהן,dana@example.com\nמשה לוי,moshe@example.com\n")
+        assert len(result.employee_emails) == 2
+
+        # A quote inside a header label (דוא"ל) is just a character
+        result = _import('שם,דוא"ל\nדנה כהן,dana@example.com\nמשה לוי,moshe@example.com\n')
+        assert len(result.employee_emails) == 2
+
+    def test_bad_and_duplicate_rows_are_reported_per_line(self):
+        result = _import(
+            "name,email\n"
+            "דנה כהן,dana@example.com\n"
+            "דנה  כהן,DANA@example.com\n"   # Same person again
+            "משה לוי,not-an-email\n"
+            ",moshe@example.com\n"
+            "דנה כהן,other@example.com\n"   # Same name, another email
+            "רות לוי,dana@example.com\n"    # Someone else's email
+        )
+        assert result.employee_emails == {"דנה כהן": "dana@example.com"}
+        assert result.rows == 6
+        assert result.duplicates == 1
+        assert [error.line for error in result.errors] == [4, 5, 6, 7]
+        assert "employee_emails" not in result.summary()
+
+    def test_empty_file_is_rejected(self):
+        with pytest.raises(RosterImportError):
+            _import("  \n")
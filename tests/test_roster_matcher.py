@@ -0,0 +1,78 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.roster_matcher import BLOCKING_MIN_ROSTER, MatcherCache, RosterMatcher
+
+ROSTER = {
+    "ישראל ישראלי": "israel@example.com",
+    "דנה כהן": "dana@example.com",
+    "דנה כהנא": "dana.k@example.com",
+    "משה לוי": "moshe@example.com",
+}
+
+
+class TestRosterMatcher:
+    """Test batched roster matching"""
+
+    def test_matches_regardless_of_word_order(self):
+        match = RosterMatcher(ROSTER).match("כהן דנה")
+        assert match.found
+        assert (match.employee_name, match.employee_email) == ("דנה כהן", "dana@example.com")
+        assert match.score == 100
+
+    def test_candidates_are_ranked_best_first(self):
+        match = RosterMatcher(ROSTER, top_k=2).match("דנה כהן")
+        assert [name for name, _ in match.candidates] == ["דנה כהן", "דנה כהנא"]
+        assert match.candidates[0][1] > match.candidates[1][1]
+
+    def test_many_names_in_one_call(self):
+        matches = RosterMatcher(ROSTER).match_many(["משה לוי", "", "אדם אחר לגמרי"])
+        assert matches[0].employee_email == "moshe@example.com"
+        assert (matches[1].found, matches[1].employee_name) == (False, "No name provided")
+        # No match, but the closest names are still reported
+        assert not matches[2].found
+        assert matches[2].employee_email == ""
+        assert len(matches[2].candidates) == 3
+
+    def test_niqqud_and_reversed_output_still_match(self):
+        matcher = RosterMatcher(ROSTER)
+        assert matcher.match("דָּנָה כֹּהֵן").employee_email == "dana@example.com"
+        # Model output in visual order, given away by the final form at the front
+        assert matcher.match("ןהכ הנד").employee_email == "dana@example.com"
+
+    def test_index_ranks_like_scoring_the_whole_roster(self):
+        letters = "אבגדהוזחטיכלמנסעפצקרשת"
+        roster = {
+            f"{letters[i % 22]}{letters[i // 22 % 22]}{letters[i // 484]}ל {letters[(i * 7) % 22]}ון": f"e{i}@example.com"
+            for i in range(BLOCKING_MIN_ROSTER + 200)
+        }
+        matcher = RosterMatcher(roster)
+        assert matcher.index is not None
+
+        queries = [matcher.choices[i] for i in (5, 600, 1100)]
+        blocked, full = matcher._rank_blocked(queries), matcher._rank_all(queries)
+        # Same best match and the same scores (equal runners-up may come in another order)
+        assert [ranked[0] for ranked in blocked] == [ranked[0] for ranked in full]
+        assert [[score for _, score in ranked] for ranked in blocked] == [[score for _, score in ranked] for ranked in full]
+
+    def test_empty_roster_never_matches(self):
+        match = RosterMatcher({}).match("דנה כהן")
+        assert (match.found, match.employee_name, match.candidates) == (False, "No match found", [])
+
+    def test_cache_reuses_matchers_per_roster(self):
+        cache = MatcherCache()
+        assert cache.get(dict(ROSTER)) is cache.get(dict(ROSTER))
+        assert cache.get(ROSTER) is not cache.get({"משה לוי": "moshe@example.com"})
+
+    def test_cache_is_safe_across_threads(self):
+        cache = MatcherCache(max_entries=2)
+        rosters = [{f"עובד {n}": f"e{n}@example.com"} for n in range(4)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            matchers = list(pool.map(lambda n: cache.get(rosters[n % 4]), range(400)))
+
+        assert all(matcher.employee_map == rosters[n % 4] for n, matcher in enumerate(matchers))
+        assert len(cache.matchers) == 2
@@ -0,0 +1,79 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.roster_matcher import RosterMatcher
+from services.template_registry import TemplateError, TemplateRegistry, template_handle
+
+CONFIG = {
+    "company_id": "acme",
+    "company_name": "Acme",
+    "name_crop_area": {"x": 10, "y": 20, "width": 200, "height": 30, "units": "pt"},
+    "employee_emails": {"דנה כהן": "dana@example.com"},
+}
+
+
+@pytest.fixture
+def builds():
+    return []
+
+
+@pytest.fixture
+def registry(tmp_path, builds):
+    def matcher_factory(template):
+        builds.append(template.company_id)
+        return RosterMatcher(template.employee_emails)
+
+    return TemplateRegistry(str(tmp_path / "templates.sqlite3"), matcher_factory, lambda template: 200)
+
+
+class TestTemplateRegistry:
+    """Test registering company configs and resolving them by handle"""
+
+    def test_handle_ignores_key_order(self):
+        reordered = dict(reversed(list(CONFIG.items())))
+        assert template_handle(reordered) == template_handle(CONFIG)
+        assert template_handle(dict(CONFIG, company_name="Other")) != template_handle(CONFIG)
+
+    def test_registered_template_is_compiled_once(self, registry, builds):
+        compiled = registry.register(CONFIG)
+        assert registry.register(dict(CONFIG)) is compiled
+        assert registry.get(compiled.handle) is compiled
+        assert compiled.template.company_name == "Acme"
+        assert compiled.matcher.match("דנה כהן").employee_email == "dana@example.com"
+        assert builds == ["acme"]
+
+    def test_handle_resolves_in_another_process(self, tmp_path, registry):
+        handle = registry.register(CONFIG).handle
+        other = TemplateRegistry(registry.db_path, lambda t: RosterMatcher(t.employee_emails), lambda t: 200)
+        assert other.get(handle).template.employee_emails == CONFIG["employee_emails"]
+
+    def test_unknown_and_expired_handles_resolve_to_none(self, registry):
+        assert registry.get("0" * 32) is None
+        handle = registry.register(CONFIG).handle
+        registry.ttl_seconds = -1
+        assert registry.get(handle) is None
+
+    def test_compiled_cache_is_safe_across_threads(self, registry):
+        registry.max_compiled = 2
+        configs = [dict(CONFIG, company_id=f"acme-{n}") for n in range(4)]
+        handles = [registry.register(config).handle for config in configs]
+
+        def resolve(n):
+            compiled = registry.get(handles[n % 4])
+            assert compiled.template.company_id == f"acme-{n % 4}"
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(resolve, range(200)))
+        assert len(registry.compiled) == 2
+
+    def test_invalid_configs_are_rejected(self, registry):
+        with pytest.raises(TemplateError):
+            registry.register({"company_id": "acme"})
+        with pytest.raises(TemplateError):
+            registry.register(dict(CONFIG, name_crop_area={"x": 0, "y": 0, "width": 0, "height": 10, "units": "pt"}))
@@ -0,0 +1,63 @@
+import os
+import sys
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+# Services import their siblings app-relative (e.g. `from config import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from services.upload_limit import BodySizeLimit
+
+LIMIT = 64 * 1024
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(BodySizeLimit, max_body_size=LIMIT)
+    reads = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        reads.append(file.size)
+        return {"size": file.size}
+
+    return TestClient(app), reads
+
+
+def _multipart():
+    boundary = "xyz"
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n'
+            'Content-Type: application/pdf\r\n\r\n').encode()
+    return head, f"\r\n--{boundary}--\r\n".encode(), {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+
+class TestBodySizeLimit:
+    """Test cutting off request bodies over the limit"""
+
+    def test_small_uploads_pass(self):
+        client, reads = _client()
+        response = client.post("/upload", files={"file": ("a.pdf", b"x" * 1000, "application/pdf")})
+        assert response.status_code == 200
+        assert reads == [1000]
+
+    def test_declared_length_over_the_limit_is_refused_up_front(self):
+        client, reads = _client()
+        response = client.post("/upload", files={"file": ("a.pdf", b"x" * (2 * LIMIT), "application/pdf")})
+        assert response.status_code == 413
+        assert reads == []
+
+    def test_streamed_body_is_cut_off_while_reading(self):
+        client, reads = _client()
+        head, tail, headers = _multipart()
+
+        def chunks():
+            yield head
+            for _ in range(100):
+                yield b"x" * 8192
+            yield tail
+
+        # A generator body goes out chunked, without a Content-Length
+        response = client.post("/upload", content=chunks(), headers=headers)
+        assert response.status_code == 413
+        assert reads == []